@@ -1,3 +1,3 @@
-from .dependencies.db import db_dependency
+from .dependencies.db import db_dependency, read_db_dependency
 from .dependencies.auth import user_dependency
 from ..models import User, Album, Song
\ No newline at end of file
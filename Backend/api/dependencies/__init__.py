@@ -1,2 +1,5 @@
-from .db import get_db
-from .auth import get_current_user, authenticate_user, create_access_token
+from .db import get_db, get_read_db
+from .auth import get_current_user, authenticate_user, create_access_token, revoke_token, revoke_user_tokens, is_admin_authorization
+from .pagination import page_dependency, select_columns, paginate, stream_ndjson
+from .batch import ids_dependency, parse_ids, fetch_by_ids
+from .rate_limit import route_group_limit, check_login_attempt, record_login_failure
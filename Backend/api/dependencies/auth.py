@@ -1,14 +1,17 @@
 # app/api/dependencies/auth.py
 from typing import Annotated
 from datetime import datetime, timedelta, timezone
+from time import perf_counter
 from jose import JWTError, jwt
 from fastapi import HTTPException, status, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from ...models import User
 from ...core.config import settings
 from fastapi.security import OAuth2PasswordBearer
-from passlib.context import CryptContext
-from .db import get_db
+from ...core.hashing import password_hasher
+from ...core.tokens import token_key, token_cache, token_revocations
+from ...core.metrics import token_decode_duration
 
 # Settings and constants
 SECRET_KEY = settings.SECRET_KEY
@@ -16,34 +19,67 @@ ALGORITHM = settings.ALGORITHM
 ACCESS_TOKEN_EXPIRE_MINUTES = settings.ACCESS_TOKEN_EXPIRE_MINUTES
 
 oauth2_bearer = OAuth2PasswordBearer(tokenUrl="/auth/token")
-bcrypt_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-# Dependency to get the current user from the token
-def get_current_user(token: str = Depends(oauth2_bearer), db: Session = Depends(get_db)):
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get('sub')
-        user_id: int = payload.get('id')
-        is_admin: bool = payload.get('is_admin')
-        if username is None or user_id is None:
+# Verify the token signature and claims, already verified tokens are served from the cache
+async def decode_token(token: str) -> tuple[str, dict]:
+    key = token_key(token)
+    claims = token_cache.get(key)
+    if claims is None:
+        start = perf_counter()
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except JWTError:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Could not validate user')
+        finally:
+            token_decode_duration.observe(perf_counter() - start)
+        if payload.get('sub') is None or payload.get('id') is None or payload.get('exp') is None:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Could not validate user')
-        return {'username': username, 'id': user_id, 'is_admin': is_admin}
-    except JWTError:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Could not validate user')
+        claims = {'username': payload['sub'], 'id': payload['id'], 'is_admin': payload.get('is_admin'), 'exp': payload['exp'], 'iat': payload.get('iat', 0)}
+        token_cache.set(key, claims)
+    if await token_revocations.is_revoked(key, claims):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Token has been revoked')
+    return key, claims
+
+# Admin check on a raw Authorization header, for middlewares that run before the dependencies
+async def is_admin_authorization(authorization: str | None) -> bool:
+    if not authorization or not authorization.lower().startswith("bearer "):
+        return False
+    try:
+        _, claims = await decode_token(authorization[7:].strip())
+    except HTTPException:
+        return False
+    return bool(claims.get('is_admin'))
+
+# Dependency to get the current user from the token (no database session needed)
+async def get_current_user(token: str = Depends(oauth2_bearer)):
+    _, claims = await decode_token(token)
+    return {'username': claims['username'], 'id': claims['id'], 'is_admin': claims['is_admin']}
+
+# Logout: deny the token until it expires
+async def revoke_token(token: str):
+    key, claims = await decode_token(token)
+    await token_revocations.revoke_token(key, claims['exp'])
+    token_cache.discard(key)
+
+# Admin forced invalidation of every token issued to the user so far
+async def revoke_user_tokens(user_id: int):
+    await token_revocations.revoke_user(user_id)
+    token_cache.discard_user(user_id)
 
 # User authentication function
-def authenticate_user(username: str, password: str, db: Session):
-    user = db.query(User).filter(User.username == username).first()
+async def authenticate_user(username: str, password: str, db: AsyncSession):
+    user = await db.scalar(select(User).where(User.username == username))
     if user is None:
         return False
-    if not bcrypt_context.verify(password, user.password_hash):
+    if not await password_hasher.verify(password, user.password_hash):
         return False
     return user
 
 # Create JWT access token function
 def create_access_token(username: str, user_id: int, is_admin: bool, expires_delta: timedelta):
-    expires = datetime.now(timezone.utc) + expires_delta
-    encode = {'sub': username, 'id': user_id, 'is_admin': is_admin, 'exp': expires}
+    issued = datetime.now(timezone.utc)
+    expires = issued + expires_delta
+    encode = {'sub': username, 'id': user_id, 'is_admin': is_admin, 'exp': expires, 'iat': issued.timestamp()}
     return jwt.encode(encode, SECRET_KEY, algorithm=ALGORITHM)
 
 user_dependency = Annotated[dict, Depends(get_current_user)]
\ No newline at end of file
@@ -0,0 +1,31 @@
+from typing import Annotated
+from fastapi import Depends, HTTPException, Query, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from ...core.responses import ORJSONResponse
+from .pagination import rows_to_dicts
+
+MAX_BATCH_IDS = 1000
+
+# Comma separated ids, duplicates dropped while keeping the request order
+def parse_ids(ids: str) -> list[int]:
+    try:
+        parsed = list(dict.fromkeys(int(value) for value in ids.split(",") if value.strip()))
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="ids must be a comma separated list of integers")
+    if not parsed or len(parsed) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Between 1 and {MAX_BATCH_IDS} ids are allowed")
+    return parsed
+
+def get_batch_ids(ids: Annotated[str, Query(description=f"Comma separated list of up to {MAX_BATCH_IDS} ids")]) -> list[int]:
+    return parse_ids(ids)
+
+ids_dependency = Annotated[list[int], Depends(get_batch_ids)]
+
+# Multi-get with a single IN query: items follow the request order, ids without a row are
+# null in items and listed in missing. Only the given columns are selected, so redacted
+# fields never leave the database
+async def fetch_by_ids(db: AsyncSession, model, columns, ids: list[int]) -> ORJSONResponse:
+    rows = (await db.execute(select(*columns).where(model.id.in_(ids)))).all()
+    found = {row["id"]: row for row in rows_to_dicts(rows)}
+    return ORJSONResponse({"items": [found.get(row_id) for row_id in ids], "missing": [row_id for row_id in ids if row_id not in found]})
@@ -0,0 +1,43 @@
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from ...models import Album, Song, Genre
+from ...core.cache import catalogue_cache
+
+# Cache keys of catalogue rows, write handlers invalidate exactly these
+def album_key(album_id: int) -> str:
+    return f"album:{album_id}"
+
+def song_key(song_id: int) -> str:
+    return f"song:{song_id}"
+
+def genre_key(genre_id: int) -> str:
+    return f"genre:{genre_id}"
+
+# Which constraint a failed album or song write collided with: the genre foreign key or the unique title
+def catalogue_write_error(error: IntegrityError) -> HTTPException:
+    if "foreign key" in str(error.orig).lower():
+        return HTTPException(status_code=400, detail="Invalid genre type")
+    return HTTPException(status_code=409, detail="Title already exists")
+
+# Change stamps (updated_at) only track writes for the search snapshot, they are neither served nor cached
+def row_dict(row) -> dict | None:
+    if row is None:
+        return None
+    return {column.name: getattr(row, column.name) for column in row.__table__.columns if column.name != "updated_at"}
+
+async def get_album_row(db: AsyncSession, album_id: int) -> dict | None:
+    async def load():
+        return row_dict(await db.scalar(select(Album).where(Album.id == album_id)))
+    return await catalogue_cache.get_or_load(album_key(album_id), load)
+
+async def get_song_row(db: AsyncSession, song_id: int) -> dict | None:
+    async def load():
+        return row_dict(await db.scalar(select(Song).where(Song.id == song_id)))
+    return await catalogue_cache.get_or_load(song_key(song_id), load)
+
+async def get_genre_row(db: AsyncSession, genre_id: int) -> dict | None:
+    async def load():
+        return row_dict(await db.scalar(select(Genre).where(Genre.id == genre_id)))
+    return await catalogue_cache.get_or_load(genre_key(genre_id), load)
@@ -1,14 +1,17 @@
 from fastapi import Depends
 from typing import Annotated
-from sqlalchemy.orm import Session
-from ...db.db import SessionLocal
+from sqlalchemy.ext.asyncio import AsyncSession
+from ...db.db import AsyncSessionLocal, ReadAsyncSessionLocal
 
-# Create database session and safely close one 
-def get_db():
-    db = SessionLocal()
-    try:
+# Create async database session and safely close one 
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
-db_dependency = Annotated[Session, Depends(get_db)]
+# Read only session routed to the replica engine (primary when no replica is configured)
+async def get_read_db():
+    async with ReadAsyncSessionLocal() as db:
+        yield db
+
+db_dependency = Annotated[AsyncSession, Depends(get_db)]
+read_db_dependency = Annotated[AsyncSession, Depends(get_read_db)]
@@ -0,0 +1,71 @@
+from typing import Annotated, Literal
+from fastapi import Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from ...db.db import ReadAsyncSessionLocal
+from ...core.responses import ORJSONResponse, orjson_line
+
+# Rows fetched per round trip from the server-side cursor in NDJSON mode
+STREAM_CHUNK_SIZE = 1000
+
+# Query parameters shared by the keyset paginated list endpoints
+def get_page_params(
+    limit: Annotated[int, Query(ge=1, le=1000)] = 100,
+    after: Annotated[int | None, Query(ge=0)] = None,
+    fields: Annotated[str | None, Query(description="Comma separated list of columns to return")] = None,
+    format: Annotated[Literal["json", "ndjson"], Query()] = "json",
+):
+    return {"limit": limit, "after": after, "fields": fields, "format": format}
+
+page_dependency = Annotated[dict, Depends(get_page_params)]
+
+# Resolve the ?fields= projection to model columns, the id column is always selected (keyset cursor)
+def select_columns(model, fields: str | None, allowed: list[str], default: list[str]):
+    names = default if fields is None else [name.strip() for name in fields.split(",") if name.strip()]
+    invalid = [name for name in names if name not in allowed]
+    if invalid:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid fields: {', '.join(invalid)}")
+    if "id" not in names:
+        names = ["id", *names]
+    return [getattr(model, name) for name in names]
+
+# Plain column dicts, the column names are resolved once per result instead of per row.
+# orjson renders enums (gender) by value so no per value conversion is needed
+def rows_to_dicts(rows) -> list[dict]:
+    if not rows:
+        return []
+    keys = rows[0]._fields
+    return [dict(zip(keys, row)) for row in rows]
+
+# Optional criteria narrow the listing (e.g. one genre), an index on (criteria column, id) keeps it a range scan
+def keyset_query(model, columns, after: int | None, *criteria):
+    query = select(*columns).where(*criteria).order_by(model.id)
+    if after is not None:
+        query = query.where(model.id > after)
+    return query
+
+# Single keyset page: fetches limit + 1 rows to know whether there is a next page.
+# Rows go straight to dicts rendered by orjson, the Page response model only documents the shape
+async def paginate(db: AsyncSession, model, columns, page: dict, *criteria) -> ORJSONResponse:
+    query = keyset_query(model, columns, page["after"], *criteria).limit(page["limit"] + 1)
+    rows = (await db.execute(query)).all()
+    return page_response(rows, page["limit"])
+
+def page_response(rows, limit: int) -> ORJSONResponse:
+    items = rows_to_dicts(rows[:limit])
+    next_after = items[-1]["id"] if len(rows) > limit else None
+    return ORJSONResponse({"items": items, "next_after": next_after})
+
+# NDJSON stream of every row after the cursor, read from the server-side cursor in chunks
+def stream_ndjson(model, columns, page: dict, *criteria) -> StreamingResponse:
+    query = keyset_query(model, columns, page["after"], *criteria).execution_options(yield_per=STREAM_CHUNK_SIZE)
+
+    async def generate():
+        # Own session so the cursor outlives the request dependency scope
+        async with ReadAsyncSessionLocal() as db:
+            result = await db.stream(query)
+            async for rows in result.partitions():
+                yield b"".join(orjson_line(row) for row in rows_to_dicts(rows))
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
@@ -0,0 +1,37 @@
+from fastapi import Request
+from ...core.config import settings
+from ...core.rate_limit import route_group_buckets, login_ip_limiter, login_failure_limiter, login_account_limiter
+
+# Client address, X-Forwarded-For is only trusted behind a known proxy
+def client_ip(request: Request) -> str:
+    if settings.RATE_LIMIT_TRUST_FORWARDED:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+# Route dependency: per client token bucket of the route group, runs before the handler dependencies do any work
+def route_group_limit(group: str):
+    buckets = route_group_buckets.get(group)
+
+    async def limit(request: Request):
+        if settings.RATE_LIMIT_ENABLED and buckets is not None:
+            buckets.take(client_ip(request))
+    return limit
+
+# Login attempts per address and recent failures per (username, address), checked before the user lookup and bcrypt.
+# The (username, address) window is the tight one, so wrong passwords sent from elsewhere do not lock the owner out.
+# A much higher per username window still stops guessing spread over many addresses
+def login_failure_key(request: Request, username: str) -> str:
+    return f"{username.casefold()}|{client_ip(request)}"
+
+async def check_login_attempt(request: Request, username: str):
+    if settings.RATE_LIMIT_ENABLED:
+        await login_ip_limiter.hit(client_ip(request))
+        await login_failure_limiter.check(login_failure_key(request, username))
+        await login_account_limiter.check(username.casefold())
+
+async def record_login_failure(request: Request, username: str):
+    if settings.RATE_LIMIT_ENABLED:
+        await login_failure_limiter.record(login_failure_key(request, username))
+        await login_account_limiter.record(username.casefold())
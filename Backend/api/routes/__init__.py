@@ -1,4 +1,10 @@
 from .user import router as user_router
 from .album import router as album_router
 from .song import router as song_router
-from .auth import router as auth_router
\ No newline at end of file
+from .auth import router as auth_router
+from .catalogue_import import router as import_router
+from .search import router as search_router
+from .library import router as library_router
+from .metrics import router as metrics_router
+from .genre import router as genre_router
+from .profiling import router as profiling_router
@@ -1,39 +1,98 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, Query, Header, Request, Response
 from fastapi.responses import FileResponse
 from pathlib import Path
-from typing import List
-from sqlalchemy.orm import Session
+from typing import List, Annotated
+from collections import Counter
+from sqlalchemy import select, update, delete
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from ... import models, schemas, db
-from ...schemas import AlbumBase, UpdateAlbumBase, SuccessResponse
-from .. import db_dependency, user_dependency
+from ...schemas import AlbumBase, UpdateAlbumBase, AlbumRead, SuccessResponse, Page, Batch
+from .. import db_dependency, read_db_dependency, user_dependency
+from ..dependencies.pagination import page_dependency, select_columns, paginate, stream_ndjson
+from ..dependencies.batch import ids_dependency, fetch_by_ids
+from ..dependencies.catalogue import get_album_row, album_key, song_key, catalogue_write_error
+from ...core.cache import catalogue_cache
+from ...core.search import search_index
+from ...core.catalogue_sync import record_changes
+from ...core.genre_stats import apply_changes, genre_count_changes, genre_count_change_of
+from ...core.jobs import enqueue, job_handler, job_queue
+from ...core.images import IMAGES_DIR, save_image_upload, schedule_derivatives, resolve_image
+from ...core.storage import stat_cache
+from ...core.http_cache import row_etag, is_not_modified, not_modified_response, cached_file_response
+from ...core.config import settings
 
 router = APIRouter(prefix="/album")
 
-@router.delete("/{album_id}", tags=["Album"], status_code=status.HTTP_200_OK)
+ALBUM_FIELDS = ["id", "title", "description", "genre"]
+
+@router.delete("/{album_id}", tags=["Album"], status_code=status.HTTP_202_ACCEPTED, response_model=SuccessResponse)
 async def delete_album(album_id: int, db: db_dependency, user_auth: user_dependency):
     # Logged JWT Token validation and user permisions
     if user_auth is None or not user_auth.get('is_admin', False):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Authentication failed or insufficient premissions')
-    db_album = db.query(models.Album).filter(models.Album.id == album_id).first()
+    db_album = await get_album_row(db, album_id)
     if db_album is None:
         raise HTTPException(status_code=404, detail="Album not found")
-    db.query(models.Song).filter(models.Song.album_fk == album_id).update({models.Song.album_fk: None})
-    db.delete(db_album)
-    db.commit()
-    return {"detail": "Album and associated foreign keys successfully cleared"}
+    # Songs are detached and the album removed by a background job, repeated requests share the pending job
+    await enqueue(db, "delete_album", {"album_id": album_id}, f"delete_album:{album_id}")
+    await db.commit()
+    job_queue.notify()
+    return {"detail": "Album deletion queued"}
+
+# Detach the songs in batches of JOB_BATCH_SIZE (short transactions however large the album), then delete the album.
+# Songs created meanwhile make the final delete fail on foreign keys, the retry detaches them
+@job_handler("delete_album")
+async def delete_album_job(db: AsyncSession, payload: dict):
+    album_id = payload["album_id"]
+    while song_ids := (await db.scalars(select(models.Song.id).where(models.Song.album_fk == album_id).limit(settings.JOB_BATCH_SIZE))).all():
+        await db.execute(update(models.Song).where(models.Song.id.in_(song_ids), models.Song.album_fk == album_id).values(album_fk=None), execution_options={"synchronize_session": False})
+        await record_changes(db, "song", song_ids, "changed")
+        await db.commit()
+        await catalogue_cache.invalidate(*[song_key(song_id) for song_id in song_ids])
+    # RETURNING gives the genre of the deleted row (for the genre counts) where supported, otherwise the
+    # count of its genre is decremented by one UPDATE before the delete
+    statement = delete(models.Album).where(models.Album.id == album_id)
+    if db.bind.dialect.delete_returning:
+        deleted = (await db.execute(statement.returning(models.Album.genre), execution_options={"synchronize_session": False})).all()
+        if deleted:
+            await apply_changes(db, genre_count_changes("album_count", Counter({deleted[0].genre: -1})))
+    else:
+        await apply_changes(db, [genre_count_change_of("album_count", models.Album, album_id, -1)])
+        deleted = (await db.execute(statement, execution_options={"synchronize_session": False})).rowcount
+    if deleted:
+        await enqueue(db, "remove_images", {"directory": "albums", "name": str(album_id)}, f"remove_images:albums:{album_id}")
+    # Every API worker drops the album and the detached songs from its cache and search index (catalogue_sync),
+    # this process right away
+    await record_changes(db, "album", [album_id], "deleted")
+    await db.commit()
+    await catalogue_cache.invalidate(album_key(album_id))
+    search_index.remove("album", album_id)
 
 @router.patch("/{album_id}", tags=["Album"], status_code=status.HTTP_200_OK)
 async def update_user(album_id: int, album: UpdateAlbumBase, db: db_dependency, user_auth: user_dependency):
     # Logged JWT Token validation and user permisions
     if user_auth is None or not user_auth.get('is_admin', False):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Authentication failed or insufficient premissions')
-    db_album = db.query(models.Album).filter(models.Album.id == album_id).first()
-    if db_album is None: 
+    db_album = await get_album_row(db, album_id)
+    if db_album is None:
         raise HTTPException(status_code=404, detail="Album not found")
-    # For each patched (inserted) element set an attribute of selected record
-    for key, value in album.model_dump(exclude_unset=True).items():
-        setattr(db_album, key, value)
-    db.commit()
+    # Single UPDATE of the patched columns, the unique title and the genre are enforced by the database
+    values = album.model_dump(exclude_unset=True)
+    if values:
+        try:
+            result = await db.execute(update(models.Album).where(models.Album.id == album_id).values(**values), execution_options={"synchronize_session": False})
+            if values.get("genre", db_album["genre"]) != db_album["genre"]:
+                await apply_changes(db, genre_count_changes("album_count", Counter({db_album["genre"]: -1, values["genre"]: 1})))
+            await db.commit()
+        except IntegrityError as error:
+            await db.rollback()
+            raise catalogue_write_error(error)
+        if result.rowcount == 0:
+            raise HTTPException(status_code=404, detail="Album not found")
+    await catalogue_cache.invalidate(album_key(album_id))
+    patched = {**db_album, **values}
+    search_index.add("album", album_id, patched["title"], patched["description"])
     return {"detail": "Album successfully modified"}
 
 @router.post("/", tags=["Album"], status_code=status.HTTP_201_CREATED, response_model=SuccessResponse)
@@ -42,58 +101,71 @@ async def create_album(album: AlbumBase, db: db_dependency, user_auth: user_depe
     if user_auth is None or not user_auth.get('is_admin', False):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Authentication failed or insufficient premissions')
     db_album = models.Album(**album.model_dump())
-    check_genre = db.query(models.Genre).filter(models.Genre.id == db_album.genre).first()
-    check_title = db.query(models.Album).filter(models.Album.title == db_album.title).first()
-    if check_title is not None:
-        raise HTTPException(status_code=409, detail="Title already exists")
-    if check_genre is None:
-        raise HTTPException(status_code=409, detail="Invalid genre type")
+    # Duplicate titles and unknown genres are rejected by the constraints, no check-then-insert
     db.add(db_album)
-    db.commit()
+    try:
+        await apply_changes(db, genre_count_changes("album_count", Counter({db_album.genre: 1})))
+        await db.commit()
+    except IntegrityError as error:
+        await db.rollback()
+        raise catalogue_write_error(error)
+    search_index.add("album", db_album.id, db_album.title, db_album.description)
     return {"detail": "Album successfully created"}
 
-@router.get("/{album_id}", tags=["Album"], status_code=status.HTTP_200_OK, response_model=AlbumBase)
-async def get_album(album_id: int, db: db_dependency, user_auth: user_dependency):
+@router.get("/all", tags=["Album"], status_code=status.HTTP_200_OK, response_model=Page)
+async def get_albums(db: read_db_dependency, user_auth: user_dependency, page: page_dependency):
     # JWT Token Validation
     if user_auth is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Authentication failed')
-    album = db.query(models.Album).filter(models.Album.id == album_id).first()
-    if album is None:
-        raise HTTPException(status_code=404, detail="Album not found")
-    return album
+    # Keyset pagination on id with optional ?fields= projection
+    columns = select_columns(models.Album, page["fields"], ALBUM_FIELDS, ALBUM_FIELDS)
+    if page["format"] == "ndjson":
+        return stream_ndjson(models.Album, columns, page)
+    return await paginate(db, models.Album, columns, page)
 
-@router.get("/all", tags=["Album"], status_code=status.HTTP_200_OK, response_model=List[AlbumBase])
-async def get_albums(db: db_dependency, user_auth: user_dependency):
+@router.get("", tags=["Album"], status_code=status.HTTP_200_OK, response_model=Batch)
+async def get_albums_by_ids(ids: ids_dependency, db: read_db_dependency, user_auth: user_dependency):
     # JWT Token Validation
     if user_auth is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Authentication failed')
-    albums = db.query(models.Album).all()
-    if albums is None:
-        raise HTTPException(status_code=404, detail="Albums not found")
-    return albums
+    # One IN query for every requested album, in request order
+    return await fetch_by_ids(db, models.Album, [getattr(models.Album, name) for name in ALBUM_FIELDS], ids)
+
+@router.get("/{album_id}", tags=["Album"], status_code=status.HTTP_200_OK, response_model=AlbumRead)
+async def get_album(album_id: int, db: read_db_dependency, user_auth: user_dependency, request: Request, response: Response):
+    # JWT Token Validation
+    if user_auth is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Authentication failed')
+    album = await get_album_row(db, album_id)
+    if album is None:
+        raise HTTPException(status_code=404, detail="Album not found")
+    # Conditional GET, the unchanged row is not serialized again
+    headers = {"ETag": row_etag(album), "Cache-Control": settings.CACHE_CONTROL_CATALOGUE}
+    if is_not_modified(request, headers["ETag"]):
+        return not_modified_response(headers)
+    response.headers.update(headers)
+    return album
 
 @router.post("/{album_id}/album_image/", tags=["Album"], status_code=status.HTTP_200_OK, response_model=SuccessResponse)
-async def upload_album_thumbnail_image(album_id: int ,user_auth: user_dependency, file: UploadFile):
-    base_dir = Path(__file__).resolve().parent.parent.parent
+async def upload_album_thumbnail_image(album_id: int ,user_auth: user_dependency, db: db_dependency, file: UploadFile):
+    if user_auth is None or not user_auth.get('is_admin', False):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Authentication failed or insufficient premissions')
     file_extension = Path(file.filename).suffix.lower()
     if file_extension not in [".jpg", ".jpeg", ".png"]:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid file type. Only .jpg, .jpeg, .png are allowed.")
-    image_path = base_dir/"images"/"albums"/ f"{album_id}.jpg"
-    if user_auth is None or not user_auth.get('is_admin', False):
-        HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Authentication failed or insufficient premissions')
-    try:
-        with open(image_path, "wb") as f:
-            f.write(await file.read())
-    except:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="File failed to create")
-    return {"detail": "User profile image succesfuly created"}
+    # Streamed in chunks with size limit, type taken from the file content
+    image_path = await save_image_upload(file, IMAGES_DIR/"albums", str(album_id))
+    # Resized variants are rendered by a background job
+    await schedule_derivatives(db, image_path)
+    await db.commit()
+    job_queue.notify()
+    return {"detail": "Album thumbnail image succesfuly created"}
 
 @router.get("/{album_id}/album_image/", tags=["Album"], status_code=status.HTTP_200_OK, response_model=SuccessResponse)
-async def get_album_thumbnail_image(album_id: int, user_auth: user_dependency):
+async def get_album_thumbnail_image(album_id: int, user_auth: user_dependency, request: Request, size: Annotated[int | None, Query(ge=1)] = None, accept: Annotated[str | None, Header()] = None):
     if user_auth is None or not user_auth.get('is_admin', False):
         HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Authentication failed or insufficient premissions')
-    base_dir = Path(__file__).resolve().parent.parent.parent
-    image_path = base_dir/"images"/"albums"/f"{album_id}.jpg"
-    if not image_path.is_file():
-        image_path = base_dir/"images"/"albums"/"default.jpg"
-    return FileResponse(image_path)
\ No newline at end of file
+    # Closest precomputed variant for ?size=, WebP when the client accepts it
+    image_path = await resolve_image(IMAGES_DIR/"albums", str(album_id), size, accept)
+    # ETag/Last-Modified from the cached stat, 304 without opening the file
+    return cached_file_response(request, image_path, stat_cache.stat(image_path), settings.CACHE_CONTROL_IMAGES, {"Vary": "Accept"})
\ No newline at end of file
@@ -1,23 +1,41 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
 from typing import Annotated
 from ... import models, schemas, db
-from .. import db_dependency
-from ...schemas import Token
-from ..dependencies import authenticate_user, create_access_token
+from .. import db_dependency, user_dependency
+from ...schemas import Token, SuccessResponse
+from ..dependencies import authenticate_user, create_access_token, revoke_token, revoke_user_tokens, route_group_limit, check_login_attempt, record_login_failure
+from ..dependencies.auth import oauth2_bearer
+from ...core.config import settings
 from datetime import timedelta
 
 
 router = APIRouter(prefix="/auth")
 
-@router.post("/token", tags=["Auth"], status_code=status.HTTP_201_CREATED, response_model=Token)
-async def login_access_token(form_data: Annotated[OAuth2PasswordRequestForm, Depends()], db: db_dependency):
+@router.post("/token", tags=["Auth"], status_code=status.HTTP_201_CREATED, response_model=Token, dependencies=[Depends(route_group_limit("auth"))])
+async def login_access_token(request: Request, form_data: Annotated[OAuth2PasswordRequestForm, Depends()], db: db_dependency):
+    # Rate limits (per address and per username and address failures) before any DB lookup or bcrypt work
+    await check_login_attempt(request, form_data.username)
     # Verify via username and password
-    user = authenticate_user(form_data.username, form_data.password, db)
+    user = await authenticate_user(form_data.username, form_data.password, db)
     # Validation failed. Wrong password or username
     if not user:
+        await record_login_failure(request, form_data.username)
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unable to validate user")
     # Creates JWT token (stores: username, is_admin, user_id)
-    token = create_access_token(user.username, user.id, user.is_admin, timedelta(minutes=30))
-    return {'access_token': token, 'token_type':'bearer'}
\ No newline at end of file
+    token = create_access_token(user.username, user.id, user.is_admin, timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES))
+    return {'access_token': token, 'token_type':'bearer'}
+
+@router.post("/logout", tags=["Auth"], status_code=status.HTTP_200_OK, response_model=SuccessResponse)
+async def logout(token: Annotated[str, Depends(oauth2_bearer)]):
+    # Deny the current token until it expires
+    await revoke_token(token)
+    return {"detail": "Token successfully revoked"}
+
+@router.post("/revoke/{user_id}", tags=["Auth"], status_code=status.HTTP_200_OK, response_model=SuccessResponse)
+async def revoke_user_access_tokens(user_id: int, user_auth: user_dependency):
+    # Logged JWT Token validation and user permisions
+    if user_auth is None or not user_auth.get('is_admin', False):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Authentication failed or insufficient premissions')
+    await revoke_user_tokens(user_id)
+    return {"detail": "User tokens successfully revoked"}
\ No newline at end of file
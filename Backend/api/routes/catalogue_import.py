@@ -0,0 +1,22 @@
+from fastapi import APIRouter, HTTPException, status, UploadFile, Query
+from fastapi.concurrency import run_in_threadpool
+from typing import Annotated, Literal
+from .. import user_dependency
+from ...db.db import SessionLocal
+from ...core.catalogue_import import import_catalogue
+from ...core.config import settings
+
+router = APIRouter(prefix="/import")
+
+@router.post("/{kind}", tags=["Import"], status_code=status.HTTP_200_OK)
+async def import_catalogue_file(kind: Literal["genres", "albums", "songs"], user_auth: user_dependency, file: UploadFile, format: Literal["csv", "ndjson"] | None = None, batch_size: Annotated[int, Query(ge=1, le=50000)] = settings.IMPORT_BATCH_SIZE):
+    # Logged JWT Token validation and user permisions
+    if user_auth is None or not user_auth.get('is_admin', False):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Authentication failed or insufficient premissions')
+    if format is None:
+        format = "ndjson" if file.filename and file.filename.endswith((".ndjson", ".jsonl")) else "csv"
+    # Streamed from the spooled upload and inserted in batches on a worker thread
+    def run():
+        with SessionLocal() as session:
+            return import_catalogue(session, kind, file.file, format, batch_size)
+    return await run_in_threadpool(run)
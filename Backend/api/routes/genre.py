@@ -0,0 +1,78 @@
+from fastapi import APIRouter, HTTPException, status, Query
+from typing import Annotated
+from sqlalchemy import select, or_, and_
+from ... import models
+from .. import read_db_dependency, user_dependency
+from ...schemas import GenreRead, Page
+from ..dependencies.pagination import page_dependency, select_columns, paginate, stream_ndjson, page_response
+from ..dependencies.catalogue import get_genre_row
+from .album import ALBUM_FIELDS
+from .song import SONG_FIELDS
+
+router = APIRouter(prefix="/genre")
+
+GENRE_FIELDS = ["id", "genre", "song_count", "album_count"]
+
+async def existing_genre(db, genre_id: int):
+    if await get_genre_row(db, genre_id) is None:
+        raise HTTPException(status_code=404, detail="Genre not found")
+
+@router.get("/all", tags=["Genre"], status_code=status.HTTP_200_OK, response_model=Page)
+async def get_genres(db: read_db_dependency, user_auth: user_dependency, page: page_dependency):
+    if user_auth is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Authentication failed')
+    # Song and album counts are stored on the genre rows, no COUNT/GROUP BY per request
+    columns = select_columns(models.Genre, page["fields"], GENRE_FIELDS, GENRE_FIELDS)
+    if page["format"] == "ndjson":
+        return stream_ndjson(models.Genre, columns, page)
+    return await paginate(db, models.Genre, columns, page)
+
+@router.get("/{genre_id}", tags=["Genre"], status_code=status.HTTP_200_OK, response_model=GenreRead)
+async def get_genre(genre_id: int, db: read_db_dependency, user_auth: user_dependency):
+    if user_auth is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Authentication failed')
+    genre = await db.scalar(select(models.Genre).where(models.Genre.id == genre_id))
+    if genre is None:
+        raise HTTPException(status_code=404, detail="Genre not found")
+    return genre
+
+@router.get("/{genre_id}/songs", tags=["Genre"], status_code=status.HTTP_200_OK, response_model=Page)
+async def get_genre_songs(genre_id: int, db: read_db_dependency, user_auth: user_dependency, page: page_dependency):
+    if user_auth is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Authentication failed')
+    await existing_genre(db, genre_id)
+    # Keyset on id within the genre, served by the genre index
+    columns = select_columns(models.Song, page["fields"], SONG_FIELDS, SONG_FIELDS)
+    if page["format"] == "ndjson":
+        return stream_ndjson(models.Song, columns, page, models.Song.genre == genre_id)
+    return await paginate(db, models.Song, columns, page, models.Song.genre == genre_id)
+
+@router.get("/{genre_id}/albums", tags=["Genre"], status_code=status.HTTP_200_OK, response_model=Page)
+async def get_genre_albums(genre_id: int, db: read_db_dependency, user_auth: user_dependency, page: page_dependency):
+    if user_auth is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Authentication failed')
+    await existing_genre(db, genre_id)
+    columns = select_columns(models.Album, page["fields"], ALBUM_FIELDS, ALBUM_FIELDS)
+    if page["format"] == "ndjson":
+        return stream_ndjson(models.Album, columns, page, models.Album.genre == genre_id)
+    return await paginate(db, models.Album, columns, page, models.Album.genre == genre_id)
+
+@router.get("/{genre_id}/top-songs", tags=["Genre"], status_code=status.HTTP_200_OK, response_model=Page)
+async def get_genre_top_songs(genre_id: int, db: read_db_dependency, user_auth: user_dependency, limit: Annotated[int, Query(ge=1, le=1000)] = 100, after: Annotated[int | None, Query(ge=0, description="Song id of the last item of the previous page")] = None):
+    if user_auth is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Authentication failed')
+    await existing_genre(db, genre_id)
+    stats = models.Song_stats
+    # Most owned first, walked on ix_song_stats_genre_owners (genre, owner_count, song_fk)
+    query = (
+        select(stats.song_fk.label("id"), models.Song.title, models.Song.album_fk, stats.owner_count)
+        .join(models.Song, models.Song.id == stats.song_fk)
+        .where(stats.genre == genre_id, stats.owner_count > 0)
+        .order_by(stats.owner_count.desc(), stats.song_fk.desc())
+        .limit(limit + 1)
+    )
+    if after is not None:
+        cursor_count = select(stats.owner_count).where(stats.song_fk == after).scalar_subquery()
+        query = query.where(or_(stats.owner_count < cursor_count, and_(stats.owner_count == cursor_count, stats.song_fk < after)))
+    rows = (await db.execute(query)).all()
+    return page_response(rows, limit)
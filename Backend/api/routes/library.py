@@ -0,0 +1,94 @@
+from fastapi import APIRouter, HTTPException, status, Query
+from typing import Annotated
+from sqlalchemy import select, delete, literal, or_, and_
+from ... import models
+from .. import db_dependency, read_db_dependency, user_dependency
+from ...schemas import LibrarySongsBase, LibraryChangeResponse, OwnershipResponse, Page
+from ..dependencies.pagination import page_response
+from ..dependencies.batch import parse_ids
+from ...core.catalogue_import import insert_ignore
+from ...core.genre_stats import owner_count_change, owner_count_change_of
+
+router = APIRouter(prefix="/library")
+
+# check the {user_id} variable for str == me or int, only the owner or an admin can access a library
+def library_owner(user_id: str, user_auth: dict) -> int:
+    if user_auth is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Authentication failed')
+    if user_id == "me":
+        return user_auth["id"]
+    try:
+        user_id = int(user_id)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid user id")
+    if user_id != user_auth["id"] and not user_auth.get("is_admin", False):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied")
+    return user_id
+
+@router.get("/{user_id}/songs", tags=["Library"], status_code=status.HTTP_200_OK, response_model=Page)
+async def get_library(user_id: str, db: read_db_dependency, user_auth: user_dependency, limit: Annotated[int, Query(ge=1, le=1000)] = 100, after: Annotated[int | None, Query(ge=0, description="Library entry id of the last item of the previous page")] = None):
+    user_id = library_owner(user_id, user_auth)
+    owned = models.Songs_owned
+    # Newest first keyset on (create_date, id) served by ix_songs_owned_user_created,
+    # song and album columns come from the same joined query
+    query = (
+        select(owned.id, owned.create_date, models.Song.id.label("song_id"), models.Song.title, models.Song.description, models.Song.genre, models.Song.album_fk, models.Album.title.label("album_title"))
+        .join(models.Song, models.Song.id == owned.song_fk)
+        .outerjoin(models.Album, models.Album.id == models.Song.album_fk)
+        .where(owned.user_fk == user_id)
+        .order_by(owned.create_date.desc(), owned.id.desc())
+        .limit(limit + 1)
+    )
+    if after is not None:
+        # The cursor row date is compared in SQL, no timestamp round trip through the client
+        cursor_date = select(owned.create_date).where(owned.id == after, owned.user_fk == user_id).scalar_subquery()
+        query = query.where(or_(owned.create_date < cursor_date, and_(owned.create_date == cursor_date, owned.id < after)))
+    rows = (await db.execute(query)).all()
+    return page_response(rows, limit)
+
+@router.post("/{user_id}/songs", tags=["Library"], status_code=status.HTTP_200_OK, response_model=LibraryChangeResponse)
+async def add_library_songs(user_id: str, songs: LibrarySongsBase, db: db_dependency, user_auth: user_dependency):
+    user_id = library_owner(user_id, user_auth)
+    if user_id != user_auth["id"] and await db.scalar(select(models.User.id).where(models.User.id == user_id)) is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    # Single INSERT ... SELECT: unknown song ids are filtered by the select, already owned ones by the unique constraint
+    song_ids = set(songs.song_ids)
+    existing_songs = select(literal(user_id), models.Song.id).where(models.Song.id.in_(song_ids))
+    statement = insert_ignore(db, models.Songs_owned, "user_fk", "song_fk").from_select(["user_fk", "song_fk"], existing_songs)
+    # The songs actually added drive the owner counts: RETURNING where supported, otherwise one UPDATE of the
+    # requested songs not owned yet, before the insert
+    if db.bind.dialect.insert_returning:
+        added = (await db.scalars(statement.returning(models.Songs_owned.song_fk))).all()
+        if added:
+            await db.execute(owner_count_change(added, 1), execution_options={"synchronize_session": False})
+        count = len(added)
+    else:
+        owned = select(models.Songs_owned.song_fk).where(models.Songs_owned.user_fk == user_id)
+        await db.execute(owner_count_change(song_ids, 1).where(models.Song_stats.song_fk.not_in(owned)), execution_options={"synchronize_session": False})
+        count = (await db.execute(statement)).rowcount
+    await db.commit()
+    return {"detail": "Songs successfully added to the library", "count": count}
+
+@router.delete("/{user_id}/songs", tags=["Library"], status_code=status.HTTP_200_OK, response_model=LibraryChangeResponse)
+async def remove_library_songs(user_id: str, songs: LibrarySongsBase, db: db_dependency, user_auth: user_dependency):
+    user_id = library_owner(user_id, user_auth)
+    criteria = (models.Songs_owned.user_fk == user_id, models.Songs_owned.song_fk.in_(set(songs.song_ids)))
+    statement = delete(models.Songs_owned).where(*criteria)
+    if db.bind.dialect.delete_returning:
+        removed = (await db.scalars(statement.returning(models.Songs_owned.song_fk), execution_options={"synchronize_session": False})).all()
+        if removed:
+            await db.execute(owner_count_change(removed, -1), execution_options={"synchronize_session": False})
+        count = len(removed)
+    else:
+        await db.execute(owner_count_change_of(-1, *criteria), execution_options={"synchronize_session": False})
+        count = (await db.execute(statement, execution_options={"synchronize_session": False})).rowcount
+    await db.commit()
+    return {"detail": "Songs successfully removed from the library", "count": count}
+
+@router.get("/{user_id}/owned", tags=["Library"], status_code=status.HTTP_200_OK, response_model=OwnershipResponse)
+async def check_library_songs(user_id: str, ids: Annotated[str, Query(description="Comma separated list of song ids")], db: read_db_dependency, user_auth: user_dependency):
+    user_id = library_owner(user_id, user_auth)
+    song_ids = parse_ids(ids)
+    # One indexed lookup on (user_fk, song_fk) for the whole batch
+    owned = set((await db.scalars(select(models.Songs_owned.song_fk).where(models.Songs_owned.user_fk == user_id, models.Songs_owned.song_fk.in_(song_ids)))).all())
+    return {"owned": [song_id for song_id in song_ids if song_id in owned], "not_owned": [song_id for song_id in song_ids if song_id not in owned]}
@@ -0,0 +1,40 @@
+import hmac
+from fastapi import APIRouter, HTTPException, Request, status
+from fastapi.responses import PlainTextResponse
+from ...db.db import pool_metrics
+from ...core.config import settings
+from ...core.metrics import render_metrics, gauge_samples
+from ...core.hashing import password_hasher
+from ...core.cache import catalogue_cache
+from ...core.recommendations import recommendation_index
+from ...core.jobs import job_queue
+from ..dependencies import is_admin_authorization
+
+router = APIRouter()
+
+LOOPBACK_ADDRESSES = {"127.0.0.1", "::1"}
+FORWARDING_HEADERS = ("x-forwarded-for", "x-real-ip", "forwarded")
+
+# Scrapes authenticate with METRICS_TOKEN (Bearer) or an admin token. Without METRICS_TOKEN only direct connections
+# from this host are answered: anything that came through a proxy carries a forwarding header
+async def can_scrape(request: Request) -> bool:
+    authorization = request.headers.get("authorization")
+    if settings.METRICS_TOKEN:
+        if authorization and hmac.compare_digest(authorization.encode(), f"Bearer {settings.METRICS_TOKEN}".encode()):
+            return True
+    elif request.client is not None and request.client.host in LOOPBACK_ADDRESSES and not any(header in request.headers for header in FORWARDING_HEADERS):
+        return True
+    return await is_admin_authorization(authorization)
+
+# Prometheus scrape endpoint (text exposition format), only mounted when METRICS_ENABLED. Served from memory, the
+# job queue depth comes from the last background refresh (METRICS_REFRESH_SECONDS) and a scrape runs no query
+@router.get("/metrics", tags=["Metrics"], status_code=status.HTTP_200_OK, response_class=PlainTextResponse, include_in_schema=False)
+async def get_metrics(request: Request):
+    if not await can_scrape(request):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Authentication failed or insufficient premissions', headers={"WWW-Authenticate": "Bearer"})
+    collected = gauge_samples("password_hash", password_hasher.metrics()) + gauge_samples("catalogue_cache", catalogue_cache.metrics()) + gauge_samples("recommendations", recommendation_index.metrics())
+    # Queue depth of the jobs table, it covers the workers of every process
+    collected += gauge_samples("jobs", job_queue.depth)
+    for pool, metrics in pool_metrics().items():
+        collected += gauge_samples("db_pool", metrics, {"pool": pool})
+    return PlainTextResponse(render_metrics(collected), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,48 @@
+from fastapi import APIRouter, HTTPException, status, Query
+from fastapi.responses import PlainTextResponse
+from typing import Annotated
+from .. import user_dependency
+from ...core.profiling import profile_store, collapsed_stacks
+from ...core.responses import ORJSONResponse
+
+router = APIRouter(prefix="/profiling")
+
+# Slowest sampled requests of every route kept by this process, only mounted when PROFILING_ENABLED
+@router.get("/slowest", tags=["Profiling"], status_code=status.HTTP_200_OK)
+async def get_slowest_profiles(user_auth: user_dependency):
+    if user_auth is None or not user_auth.get('is_admin', False):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Authentication failed or insufficient premissions')
+    return ORJSONResponse({"routes": profile_store.slowest()})
+
+# Merged collapsed stacks of the kept slowest profiles, of one route template (?route=/song/{song_id}) or all
+@router.get("/flamegraph", tags=["Profiling"], status_code=status.HTTP_200_OK, response_class=PlainTextResponse)
+async def get_slowest_flamegraph(user_auth: user_dependency, route: Annotated[str | None, Query()] = None):
+    if user_auth is None or not user_auth.get('is_admin', False):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Authentication failed or insufficient premissions')
+    return PlainTextResponse(collapsed_stacks(profile_store.route_profiles(route)))
+
+@router.delete("/", tags=["Profiling"], status_code=status.HTTP_200_OK)
+async def clear_profiles(user_auth: user_dependency):
+    if user_auth is None or not user_auth.get('is_admin', False):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Authentication failed or insufficient premissions')
+    profile_store.clear()
+    return {"detail": "Profiles successfully cleared"}
+
+# Call tree and SQL statements of a kept profile (X-Profile-Id of a profiled request)
+@router.get("/{profile_id}", tags=["Profiling"], status_code=status.HTTP_200_OK)
+async def get_profile(profile_id: int, user_auth: user_dependency):
+    if user_auth is None or not user_auth.get('is_admin', False):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Authentication failed or insufficient premissions')
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return ORJSONResponse(profile.details())
+
+@router.get("/{profile_id}/flamegraph", tags=["Profiling"], status_code=status.HTTP_200_OK, response_class=PlainTextResponse)
+async def get_profile_flamegraph(profile_id: int, user_auth: user_dependency):
+    if user_auth is None or not user_auth.get('is_admin', False):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Authentication failed or insufficient premissions')
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(collapsed_stacks([profile]))
@@ -0,0 +1,17 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.concurrency import run_in_threadpool
+from typing import Annotated, Literal
+from .. import user_dependency
+from ..dependencies import route_group_limit
+from ...core.search import search_index
+
+router = APIRouter(prefix="/search")
+
+@router.get("", tags=["Search"], status_code=status.HTTP_200_OK, dependencies=[Depends(route_group_limit("search"))])
+async def search_catalogue(q: Annotated[str, Query(min_length=1, max_length=200)], user_auth: user_dependency, limit: Annotated[int, Query(ge=1, le=100)] = 20, type: Literal["song", "album"] | None = None):
+    # JWT Token Validation
+    if user_auth is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Authentication failed')
+    # Prefix and typo tolerant BM25 ranking over the in-process index, CPU bound: run in the threadpool so a
+    # search (or an import adding documents under the index lock) never blocks the event loop
+    return {"results": await run_in_threadpool(search_index.search, q, limit, type)}
@@ -1,36 +1,93 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response, UploadFile, Query
+from typing import List, Annotated
+from collections import Counter
+from sqlalchemy import select, update, delete
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from ... import models, schemas, db
-from .. import db_dependency, user_dependency
-from ...schemas import SongBase, UpdateSongBase, SuccessResponse
+from .. import db_dependency, read_db_dependency, user_dependency
+from ...schemas import SongBase, UpdateSongBase, SongRead, SuccessResponse, Page, Batch, SongRecommendations
+from ..dependencies.pagination import page_dependency, select_columns, paginate, stream_ndjson
+from ..dependencies.batch import ids_dependency, fetch_by_ids
+from ..dependencies.catalogue import get_album_row, get_song_row, song_key, catalogue_write_error
+from ...core.cache import catalogue_cache
+from ...core.search import search_index
+from ...core.catalogue_sync import record_changes
+from ...core.genre_stats import apply_changes, genre_count_changes, genre_count_change_of, song_stats_insert, song_stats_delete, song_genre_change
+from ...core.jobs import enqueue, job_handler, job_queue
+from ...core.recommendations import recommendation_index
+from ...core.responses import ORJSONResponse
+from ...core.http_cache import row_etag, is_not_modified, not_modified_response, range_file_response
+from ...core.audio import AUDIO_MEDIA_TYPES, find_audio, save_audio_upload, remove_audio
+from ...core.storage import stat_cache
+from ...core.config import settings
 
 router = APIRouter(prefix="/song")
 
-@router.delete("/{song_id}", tags=["Song"], status_code=status.HTTP_200_OK)
+SONG_FIELDS = ["id", "title", "description", "genre", "album_fk"]
+
+@router.delete("/{song_id}", tags=["Song"], status_code=status.HTTP_202_ACCEPTED, response_model=SuccessResponse)
 async def delete_song(song_id: int, db: db_dependency, user_auth: user_dependency):
     # Logged JWT Token validation and user permisions
     if user_auth is None or not user_auth.get('is_admin', False):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Authentication failed or insufficient premissions')
-    db_song = db.query(models.Song).filter(models.Song.id == song_id).first()
-    if db_song is None:
+    if await get_song_row(db, song_id) is None:
         raise HTTPException(status_code=404, detail="Song not found")
-    db.delete(db_song)
-    db.commit()
-    return {"detail": "Song successfully cleared"}
+    # Library rows, the song and its audio are removed by a background job, repeated requests share the pending job
+    await enqueue(db, "delete_song", {"song_id": song_id}, f"delete_song:{song_id}")
+    await db.commit()
+    job_queue.notify()
+    return {"detail": "Song deletion queued"}
+
+# Remove the song from every library in batches of JOB_BATCH_SIZE, then delete its stats row, the song and the audio file
+@job_handler("delete_song")
+async def delete_song_job(db: AsyncSession, payload: dict):
+    song_id = payload["song_id"]
+    while owned_ids := (await db.scalars(select(models.Songs_owned.id).where(models.Songs_owned.song_fk == song_id).limit(settings.JOB_BATCH_SIZE))).all():
+        await db.execute(delete(models.Songs_owned).where(models.Songs_owned.id.in_(owned_ids)), execution_options={"synchronize_session": False})
+        await db.commit()
+    await db.execute(song_stats_delete(song_id), execution_options={"synchronize_session": False})
+    # RETURNING gives the genre of the deleted row (for the genre counts) where supported, otherwise the
+    # count of its genre is decremented by one UPDATE before the delete
+    statement = delete(models.Song).where(models.Song.id == song_id)
+    if db.bind.dialect.delete_returning:
+        deleted = (await db.execute(statement.returning(models.Song.genre), execution_options={"synchronize_session": False})).all()
+        if deleted:
+            await apply_changes(db, genre_count_changes("song_count", Counter({deleted[0].genre: -1})))
+    else:
+        await apply_changes(db, [genre_count_change_of("song_count", models.Song, song_id, -1)])
+        await db.execute(statement, execution_options={"synchronize_session": False})
+    # Every API worker drops the song from its cache and search index (catalogue_sync), this process right away
+    await record_changes(db, "song", [song_id], "deleted")
+    await db.commit()
+    await catalogue_cache.invalidate(song_key(song_id))
+    search_index.remove("song", song_id)
+    await remove_audio(song_id)
 
 @router.patch("/{song_id}", tags=["Song"], status_code=status.HTTP_200_OK)
 async def update_user(song_id: int, song: UpdateSongBase, db: db_dependency, user_auth: user_dependency):
     # Logged JWT Token validation and user permisions
     if user_auth is None or not user_auth.get("is_admin", False):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Authentication failed or insufficient premissions')
-    db_song = db.query(models.Song).filter(models.Song.id == song_id).first()
-    if db_song is None: 
+    db_song = await get_song_row(db, song_id)
+    if db_song is None:
         raise HTTPException(status_code=404, detail="Song not found")
-    # For each patched (inserted) element set an attribute of selected record
-    for key, value in song.model_dump(exclude_unset=True).items():
-        setattr(db_song, key, value)
-    db.commit()
+    # Single UPDATE of the patched columns, the unique title and the genre are enforced by the database
+    values = song.model_dump(exclude_unset=True)
+    if values:
+        try:
+            result = await db.execute(update(models.Song).where(models.Song.id == song_id).values(**values), execution_options={"synchronize_session": False})
+            if values.get("genre", db_song["genre"]) != db_song["genre"]:
+                await apply_changes(db, [song_genre_change(song_id, values["genre"]), *genre_count_changes("song_count", Counter({db_song["genre"]: -1, values["genre"]: 1}))])
+            await db.commit()
+        except IntegrityError as error:
+            await db.rollback()
+            raise catalogue_write_error(error)
+        if result.rowcount == 0:
+            raise HTTPException(status_code=404, detail="Song not found")
+    await catalogue_cache.invalidate(song_key(song_id))
+    patched = {**db_song, **values}
+    search_index.add("song", song_id, patched["title"], patched["description"])
     return {"detail": "Song successfully modified"}
 
 @router.post("/api/album/{album_id}/song", tags=["Song"], status_code=status.HTTP_201_CREATED, response_model=SuccessResponse)
@@ -39,30 +96,77 @@ async def create_song(album_id: int, song: SongBase, db: db_dependency, user_aut
     if user_auth is None or not user_auth.get('is_admin', False):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Authentication failed or insufficient premissions')
     db_song = models.Song(**song.model_dump(), album_fk=album_id)
-    check_album_id = db.query(models.Album).filter(models.Album.id == album_id).first()
-    check_title = db.query(models.Song).filter(models.Song.title == db_song.title).first()
+    check_album_id = await get_album_row(db, album_id)
     if check_album_id is None:
         raise HTTPException(status_code=404, detail="Album id not found")
-    if check_title is not None:
-        raise HTTPException(status_code=409, detail="Title already exists")
+    # Duplicate titles and unknown genres are rejected by the constraints, no check-then-insert.
+    # The song_stats row and the genre count are written in the same transaction
     db.add(db_song)
-    db.commit()
+    try:
+        await db.flush()
+        await apply_changes(db, [song_stats_insert(models.Song.id == db_song.id), *genre_count_changes("song_count", Counter({db_song.genre: 1}))])
+        await db.commit()
+    except IntegrityError as error:
+        await db.rollback()
+        raise catalogue_write_error(error)
+    search_index.add("song", db_song.id, db_song.title, db_song.description)
     return {"detail": "Song and associated foreign key successfully created"}
 
-@router.get("/{song_id}", tags=["Song"], status_code=status.HTTP_200_OK)
-async def get_song(song_id: int, db: db_dependency, user_auth: user_dependency):
+@router.get("/all", tags=["Song"], status_code=status.HTTP_200_OK, response_model=Page)
+async def get_songs(db: read_db_dependency, user_auth: user_dependency, page: page_dependency):
+    if user_auth is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Authentication failed')
+    # Keyset pagination on id with optional ?fields= projection
+    columns = select_columns(models.Song, page["fields"], SONG_FIELDS, SONG_FIELDS)
+    if page["format"] == "ndjson":
+        return stream_ndjson(models.Song, columns, page)
+    return await paginate(db, models.Song, columns, page)
+
+@router.get("", tags=["Song"], status_code=status.HTTP_200_OK, response_model=Batch)
+async def get_songs_by_ids(ids: ids_dependency, db: read_db_dependency, user_auth: user_dependency):
+    if user_auth is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Authentication failed')
+    # One IN query for a whole playlist page instead of a request per track
+    return await fetch_by_ids(db, models.Song, [getattr(models.Song, name) for name in SONG_FIELDS], ids)
+
+@router.get("/{song_id}", tags=["Song"], status_code=status.HTTP_200_OK, response_model=SongRead)
+async def get_song(song_id: int, db: read_db_dependency, user_auth: user_dependency, request: Request, response: Response):
     if user_auth is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Authentication failed')
-    song = db.query(models.Song).filter(models.Song.id == song_id).first()
+    song = await get_song_row(db, song_id)
     if song is None:
         raise HTTPException(status_code=404, detail="Song not found")
+    # Conditional GET, the unchanged row is not serialized again
+    headers = {"ETag": row_etag(song), "Cache-Control": settings.CACHE_CONTROL_CATALOGUE}
+    if is_not_modified(request, headers["ETag"]):
+        return not_modified_response(headers)
+    response.headers.update(headers)
     return song
 
-@router.get("/all", tags=["Song"], status_code=status.HTTP_200_OK, response_model=List[SongBase])
-async def get_song(db: db_dependency, user_auth: user_dependency):
+@router.get("/{song_id}/similar", tags=["Song"], status_code=status.HTTP_200_OK, response_model=SongRecommendations)
+async def get_similar_songs(song_id: int, user_auth: user_dependency, limit: Annotated[int, Query(ge=1, le=100)] = 20):
+    if user_auth is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Authentication failed')
+    # Songs owned by the users who own this one, from the memory mapped neighbour index (no database access)
+    return ORJSONResponse({"items": recommendation_index.similar(song_id, limit)})
+
+@router.post("/{song_id}/audio", tags=["Song"], status_code=status.HTTP_200_OK, response_model=SuccessResponse)
+async def upload_song_audio(song_id: int, db: db_dependency, user_auth: user_dependency, file: UploadFile):
+    # Logged JWT Token validation and user permisions
+    if user_auth is None or not user_auth.get('is_admin', False):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Authentication failed or insufficient premissions')
+    if await get_song_row(db, song_id) is None:
+        raise HTTPException(status_code=404, detail="Song not found")
+    # Streamed in chunks with size limit, format taken from the file content
+    await save_audio_upload(file, song_id)
+    return {"detail": "Song audio successfully uploaded"}
+
+@router.get("/{song_id}/stream", tags=["Song"], status_code=status.HTTP_200_OK)
+async def stream_song_audio(song_id: int, user_auth: user_dependency, request: Request):
     if user_auth is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Authentication failed')
-    songs = db.query(models.Song).all()
-    if songs is None:
-        raise HTTPException(status_code=404, detail="Songs not found")
-    return songs
\ No newline at end of file
+    audio_path = find_audio(song_id)
+    if audio_path is None:
+        raise HTTPException(status_code=404, detail="Song audio not found")
+    # Byte range requests (206) for seeking, read in AUDIO_STREAM_CHUNK_SIZE chunks off the event loop
+    return range_file_response(request, audio_path, stat_cache.stat(audio_path), AUDIO_MEDIA_TYPES[audio_path.suffix], settings.CACHE_CONTROL_AUDIO, settings.AUDIO_STREAM_CHUNK_SIZE)
\ No newline at end of file
@@ -1,28 +1,75 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, Query, Header, Request
 from fastapi.responses import FileResponse
 from pathlib import Path
-from typing import List
+from typing import List, Annotated
+from sqlalchemy import select, update, delete
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from ... import models, schemas, db
-from ...api.dependencies.auth import user_dependency
-from ... api.dependencies.db import db_dependency
-from ...schemas.user import UpdateUserBase, CreateUserBase
-from ...schemas.response import SuccessResponse
-from ...core.security import bcrypt_context
+from ...api.dependencies.auth import user_dependency, revoke_user_tokens
+from ... api.dependencies.db import db_dependency, read_db_dependency
+from ...schemas.user import UpdateUserBase, CreateUserBase, UserRead
+from ...schemas.response import SuccessResponse, Page, Batch
+from ...schemas.recommendation import SongRecommendations
+from ...api.dependencies.pagination import page_dependency, select_columns, paginate, stream_ndjson
+from ...api.dependencies.batch import ids_dependency, fetch_by_ids
+from ...core.hashing import password_hasher
+from ...core.genre_stats import owner_count_change, owner_count_change_of
+from ...core.jobs import enqueue, job_handler, job_queue
+from ...core.images import IMAGES_DIR, save_image_upload, schedule_derivatives, resolve_image
+from ...core.storage import stat_cache
+from ...core.http_cache import cached_file_response
+from ...core.recommendations import recommendation_index
+from ...core.responses import ORJSONResponse
+from ...core.config import settings
 
 router = APIRouter(prefix="/user")
 
-@router.delete("/{user_id}", tags=["User"], status_code=status.HTTP_200_OK)
+USER_FIELDS = ["id", "username", "first_name", "last_name", "email", "gender"]
+USER_PRIVATE_FIELDS = ["password_hash", "is_admin", "wallet"]
+
+# Which unique column (username or email) the failed write collided with
+def duplicate_user_detail(error: IntegrityError) -> str:
+    if "email" in str(error.orig).lower():
+        return "Email already exists"
+    return "Username already exists"
+
+@router.delete("/{user_id}", tags=["User"], status_code=status.HTTP_202_ACCEPTED, response_model=SuccessResponse)
 async def delete_user(user_id: int, db: db_dependency, user_auth: user_dependency):
     # Check for JWT token and user permissions (is_admin == 1)
     if user_auth is None or not user_auth.get('is_admin', False):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Authentication failed or insufficient premissions')
-    db_user = db.query(models.User).filter(models.User.id == user_id).first()
     # User does not exists in database
-    if db_user is None:
+    if await db.scalar(select(models.User.id).where(models.User.id == user_id)) is None:
         raise HTTPException(status_code=404, detail="User not found")
-    db.delete(db_user)
-    db.commit()
-    return {"detail": "User successfully deleted"}
+    # Library, user row and profile images are removed by a background job, repeated requests share the pending job
+    await enqueue(db, "delete_user", {"user_id": user_id}, f"delete_user:{user_id}")
+    await db.commit()
+    job_queue.notify()
+    # Sessions of the account end now, not when the job runs
+    await revoke_user_tokens(user_id)
+    return {"detail": "User deletion queued"}
+
+# Empty the library in batches of JOB_BATCH_SIZE, each batch decrements the owner counts of the rows it actually
+# deleted in the same transaction: a retried job, or a second worker running the same batch, never counts a
+# removal twice. Then delete the user and queue the image cleanup
+@job_handler("delete_user")
+async def delete_user_job(db: AsyncSession, payload: dict):
+    user_id = payload["user_id"]
+    while owned_ids := (await db.scalars(select(models.Songs_owned.id).where(models.Songs_owned.user_fk == user_id).limit(settings.JOB_BATCH_SIZE))).all():
+        statement = delete(models.Songs_owned).where(models.Songs_owned.id.in_(owned_ids))
+        if db.bind.dialect.delete_returning:
+            removed = (await db.scalars(statement.returning(models.Songs_owned.song_fk), execution_options={"synchronize_session": False})).all()
+            if removed:
+                await db.execute(owner_count_change(removed, -1), execution_options={"synchronize_session": False})
+        else:
+            await db.execute(owner_count_change_of(-1, models.Songs_owned.id.in_(owned_ids)), execution_options={"synchronize_session": False})
+            await db.execute(statement, execution_options={"synchronize_session": False})
+        await db.commit()
+    result = await db.execute(delete(models.User).where(models.User.id == user_id), execution_options={"synchronize_session": False})
+    if result.rowcount:
+        await enqueue(db, "remove_images", {"directory": "users", "name": str(user_id)}, f"remove_images:users:{user_id}")
+    await db.commit()
 
 @router.patch("/{user_id}", tags=["User"], status_code=status.HTTP_200_OK)
 async def update_user(user_id: str, user: UpdateUserBase, db: db_dependency, user_auth: user_dependency):
@@ -32,52 +79,66 @@ async def update_user(user_id: str, user: UpdateUserBase, db: db_dependency, use
     else:
         user_id = int(user_id)
     # Check for JWT token stored user_id or user permissions (is_admin == 1)
-    if user_id is not user_auth["id"] and not user_auth.get("is_admin", False):
+    if user_id != user_auth["id"] and not user_auth.get("is_admin", False):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied")
-    db_user = db.query(models.User).filter(models.User.id == user_id).first()
+    values = user.model_dump(exclude_unset=True)
+    if "is_admin" in values and not user_auth.get("is_admin", False):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You must be an admin to change the is_admin field")
+    if "password_hash" in values:
+        values["password_hash"] = await password_hasher.hash(user.password_hash)
+    if not values:
+        if await db.scalar(select(models.User.id).where(models.User.id == user_id)) is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        return {"detail": "User successfully modified"}
+    # Single UPDATE of the patched columns, unique username/email are enforced by the database
+    try:
+        result = await db.execute(update(models.User).where(models.User.id == user_id).values(**values), execution_options={"synchronize_session": False})
+        await db.commit()
+    except IntegrityError as error:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail=duplicate_user_detail(error))
     # User does not exists in database
-    if db_user is None: 
+    if result.rowcount == 0:
         raise HTTPException(status_code=404, detail="User not found")
-    # For each patched (inserted) element set an attribute of selected record
-    for key, value in user.model_dump(exclude_unset=True).items():
-        if key == "password_hash":
-            value = bcrypt_context.hash(user.password_hash)
-        if key == "is_admin" and user_auth.get("is_admin", False) is False:
-            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You must be an admin to change the is_admin field")
-        setattr(db_user, key, value)
-    db.commit()
+    # A new password or admin flag ends the sessions opened with the old one, on every worker
+    if "password_hash" in values or "is_admin" in values:
+        await revoke_user_tokens(user_id)
     return {"detail": "User successfully modified"}
 
 @router.post("/", tags=["User"], status_code=status.HTTP_201_CREATED, response_model=SuccessResponse)
 async def create_user(user: CreateUserBase, db: db_dependency):
-    password_bcrypt_hash = bcrypt_context.hash(user.password_hash)
+    password_bcrypt_hash = await password_hasher.hash(user.password_hash)
     db_user =  models.User(**{**user.model_dump(), "password_hash": password_bcrypt_hash})
-    check_username = db.query(models.User).filter(models.User.username == db_user.username).first()
-    check_email = db.query(models.User).filter(models.User.email == db_user.email).first()
-    if check_username is not None:
-        raise HTTPException(status_code=409, detail="Username already exists")
-    if check_email is not None:
-        raise HTTPException(status_code=409, detail="Email already exists")
+    # Single INSERT, duplicates are reported by the unique constraints
     db.add(db_user)
-    db.commit()
+    try:
+        await db.commit()
+    except IntegrityError as error:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail=duplicate_user_detail(error))
     return {"detail": "User successfully created"}
 
-@router.get("/all", tags=["User"], status_code=status.HTTP_200_OK, response_model=List[UpdateUserBase])
-async def get_users(db: db_dependency, user_auth: user_dependency):
-    users = db.query(models.User).all()
-    # User does not exists in database
-    if users is None:
-        HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="There are no users in database")
-    # Clear extra info if user does not have admin permisions | TODO: zmiana z usuwania wartości do usunięcia argumentów ze słownika
-    if not user_auth.get("is_admin", False):
-        for user in users:
-            user.password_hash = None
-            user.is_admin = False
-            user.wallet = None
-    return users
+@router.get("/all", tags=["User"], status_code=status.HTTP_200_OK, response_model=Page)
+async def get_users(db: read_db_dependency, user_auth: user_dependency, page: page_dependency):
+    # Private columns are never selected for users without admin permisions
+    if user_auth.get("is_admin", False):
+        columns = select_columns(models.User, page["fields"], USER_FIELDS + USER_PRIVATE_FIELDS, USER_FIELDS + ["is_admin"])
+    else:
+        columns = select_columns(models.User, page["fields"], USER_FIELDS, USER_FIELDS)
+    if page["format"] == "ndjson":
+        return stream_ndjson(models.User, columns, page)
+    return await paginate(db, models.User, columns, page)
+
+@router.get("", tags=["User"], status_code=status.HTTP_200_OK, response_model=Batch)
+async def get_users_by_ids(ids: ids_dependency, db: read_db_dependency, user_auth: user_dependency):
+    if user_auth is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Authentication failed')
+    # Redaction by projection as in /user/all: private columns are only selected for admins
+    names = USER_FIELDS + ["is_admin"] if user_auth.get("is_admin", False) else USER_FIELDS
+    return await fetch_by_ids(db, models.User, [getattr(models.User, name) for name in names], ids)
 
-@router.get("/{user_id}", tags=["User"], status_code=status.HTTP_200_OK, response_model=UpdateUserBase)
-async def get_user(user_id: str, db: db_dependency, user_auth: user_dependency):
+@router.get("/{user_id}", tags=["User"], status_code=status.HTTP_200_OK, response_model=UserRead)
+async def get_user(user_id: str, db: read_db_dependency, user_auth: user_dependency):
     # check the {user_id} variable for str == me or int
     if user_id == "me":
         user_id = user_auth["id"]
@@ -86,43 +147,47 @@ async def get_user(user_id: str, db: db_dependency, user_auth: user_dependency):
     # Check for JWT token whether user logged
     if user_auth is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Authentication failed')
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+    user = await db.scalar(select(models.User).where(models.User.id == user_id))
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
-    # Clear extra info if user does not have admin permisions | TODO: zmiana z usuwania wartości do usunięcia argumentów ze słownika
+    # Clear extra info if user does not have admin permisions, on the read schema rather than the ORM object
+    user = UserRead.model_validate(user)
     if not user_auth.get("is_admin", False) and user_id != user_auth["id"]:
-        user.password_hash = None
-        user.is_admin = False
-        user.wallet = None
+        user = user.model_copy(update={"password_hash": None, "is_admin": False})
     return user
 
+@router.get("/me/recommendations", tags=["User"], status_code=status.HTTP_200_OK, response_model=SongRecommendations)
+async def get_user_recommendations(user_auth: user_dependency, limit: Annotated[int, Query(ge=1, le=100)] = 20):
+    if user_auth is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Authentication failed')
+    # Neighbours of the most recently owned songs, answered from the memory mapped index (no database access)
+    return ORJSONResponse({"items": recommendation_index.recommend(user_auth["id"], limit)})
+
 @router.post("/me/profile-image/",  tags=["User"], status_code=status.HTTP_200_OK, response_model=SuccessResponse)
-async def upload_user_profile_image(user_auth: user_dependency, file: UploadFile):
-    base_dir = Path(__file__).resolve().parent.parent.parent
+async def upload_user_profile_image(user_auth: user_dependency, db: db_dependency, file: UploadFile):
+    if user_auth is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Authentication failed')
     # Check for file extention
     file_extension = Path(file.filename).suffix.lower()
     if file_extension not in [".jpg", ".jpeg", ".png"]:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid file type. Only .jpg, .jpeg, .png are allowed.")
-    image_path = base_dir/"images"/"users"/ f"{user_auth["id"]}.jpg"
-    if user_auth is None:
-        HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Authentication failed')
-    try:
-        with open(image_path, "wb") as f:
-            f.write(await file.read())
-    except:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="File failed to create")
+    # Streamed in chunks with size limit, type taken from the file content
+    image_path = await save_image_upload(file, IMAGES_DIR/"users", str(user_auth["id"]))
+    # Resized variants are rendered by a background job
+    await schedule_derivatives(db, image_path)
+    await db.commit()
+    job_queue.notify()
     return {"detail": "User profile image succesfuly created"}
 
 @router.get("/{user_id}/profile-image", tags=["User"], status_code=status.HTTP_200_OK)
-async def get_user_profile_image(user_id: str, user_auth: user_dependency):
+async def get_user_profile_image(user_id: str, user_auth: user_dependency, request: Request, size: Annotated[int | None, Query(ge=1)] = None, accept: Annotated[str | None, Header()] = None):
     if user_id == "me":
         user_id = user_auth["id"]
     else:
         user_id = int(user_id)
     if user_auth is None:
         HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Authentication failed')
-    base_dir = Path(__file__).resolve().parent.parent.parent
-    image_path = base_dir/"images"/"users"/f"{user_id}.jpg"
-    if not image_path.is_file():
-        image_path = base_dir/"images"/"users"/"default.jpg"
-    return FileResponse(image_path)
\ No newline at end of file
+    # Closest precomputed variant for ?size=, WebP when the client accepts it
+    image_path = await resolve_image(IMAGES_DIR/"users", str(user_id), size, accept)
+    # ETag/Last-Modified from the cached stat, 304 without opening the file
+    return cached_file_response(request, image_path, stat_cache.stat(image_path), settings.CACHE_CONTROL_IMAGES, {"Vary": "Accept"})
\ No newline at end of file
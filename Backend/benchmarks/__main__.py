@@ -0,0 +1,334 @@
+import os
+import sys
+import json
+import socket
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+from datetime import datetime, timezone
+
+REPO_ROOT = Path(__file__).resolve().parent.parent.parent
+DEFAULT_DB_PATH = Path(tempfile.gettempdir()) / "betterspotify_benchmark.db"
+
+# Settings are read from the environment at import, so the benchmark database is selected
+# before any Backend module is imported
+def configure_environment(args) -> dict:
+    if not args.configured_db:
+        os.environ["SELECTED_DB"] = "SQLite"
+        os.environ["DB_SQLITE_PATH"] = str(args.db_path)
+    os.environ.setdefault("SEARCH_SNAPSHOT_PATH", str(Path(tempfile.gettempdir()) / "betterspotify_benchmark.snapshot"))
+    os.environ.setdefault("RECOMMEND_SNAPSHOT_PATH", str(Path(tempfile.gettempdir()) / "betterspotify_benchmark.recommendations"))
+    os.environ["METRICS_ENABLED"] = "true"
+    # Scenarios present simulated client addresses to the per address rate limits
+    os.environ["RATE_LIMIT_TRUST_FORWARDED"] = "true"
+    return dict(os.environ)
+
+def resolve_scale(args) -> dict:
+    from .seed import SCALES
+    scale = dict(SCALES[args.scale])
+    for name in scale:
+        value = getattr(args, name, None)
+        if value is not None:
+            scale[name] = value
+    return scale
+
+def prepare_database(args, scale: dict):
+    from .seed import seed_database, read_marker, write_marker
+    from ..db import engine
+    if args.configured_db:
+        if not args.reuse:
+            seed_database(engine, scale, args.seed)
+        return
+    marker = read_marker(args.db_path)
+    if args.reuse and marker == {"scale": scale, "seed": args.seed}:
+        # Tables added since the database was seeded
+        from ..db import Base
+        from .. import models
+        Base.metadata.create_all(bind=engine)
+        return
+    for suffix in ("", "-wal", "-shm", ".scale.json"):
+        Path(f"{args.db_path}{suffix}").unlink(missing_ok=True)
+    Path(os.environ["SEARCH_SNAPSHOT_PATH"]).unlink(missing_ok=True)
+    Path(os.environ["RECOMMEND_SNAPSHOT_PATH"]).unlink(missing_ok=True)
+    seed_database(engine, scale, args.seed)
+    engine.dispose()
+    write_marker(args.db_path, scale, args.seed)
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# Accept-Encoding of the simulated clients, httpx advertises every coding it can decode by default
+def client_headers(args) -> dict:
+    return {"Accept-Encoding": args.accept_encoding} if args.accept_encoding else {}
+
+# In-process run: httpx drives the ASGI app directly, no sockets involved
+async def run_asgi(args, scale: dict) -> dict:
+    import httpx
+    from ..main import app
+    from .runner import prepare_context, drive
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", headers=client_headers(args)) as client:
+            context = await prepare_context(client, scale, args.seed, args.mix)
+            return await drive(client, context, args.mix, args.concurrency, args.duration, args.warmup, args.seed, os.getpid())
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+# Real server run: uvicorn in a subprocess, requests over loopback HTTP
+async def run_uvicorn(args, scale: dict, environment: dict) -> dict:
+    import httpx
+    from .runner import prepare_context, drive
+    port = free_port()
+    command = [sys.executable, "-m", "uvicorn", "Backend.main:app", "--host", "127.0.0.1", "--port", str(port), "--workers", str(args.workers), "--log-level", "warning", "--no-access-log"]
+    server = subprocess.Popen(command, cwd=REPO_ROOT, env=environment)
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=30, headers=client_headers(args)) as client:
+            for _ in range(600):
+                if server.poll() is not None:
+                    raise SystemExit("uvicorn exited during startup")
+                try:
+                    await client.get("/")
+                    break
+                except httpx.TransportError:
+                    await asyncio.sleep(0.1)
+            else:
+                raise SystemExit("uvicorn did not start within 60 seconds")
+            context = await prepare_context(client, scale, args.seed, args.mix)
+            return await drive(client, context, args.mix, args.concurrency, args.duration, args.warmup, args.seed, server.pid)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+def run_command(args):
+    environment = configure_environment(args)
+    scale = resolve_scale(args)
+    prepare_database(args, scale)
+    results = []
+    for mix in args.mix:
+        for mode in args.mode:
+            run_args = argparse.Namespace(**{**vars(args), "mix": mix})
+            if mode == "asgi":
+                result = asyncio.run(run_asgi(run_args, scale))
+            else:
+                result = asyncio.run(run_uvicorn(run_args, scale, environment))
+            results.append({"mix": mix, "mode": mode, **result})
+            print(f"{mix:>14} {mode:>7}: {result['throughput_rps']:>9} req/s  p50 {result['latency_ms']['p50']} ms  p95 {result['latency_ms']['p95']} ms  p99 {result['latency_ms']['p99']} ms  errors {result['errors']}  peak rss {result['rss_mb']['peak']} MB (+{result['rss_mb']['growth']})", file=sys.stderr)
+    report = {
+        "commit": git_commit(),
+        "created": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "database": "configured" if args.configured_db else "sqlite",
+        "scale": scale,
+        "seed": args.seed,
+        "concurrency": args.concurrency,
+        "accept_encoding": args.accept_encoding,
+        "duration_seconds": args.duration,
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output)
+    else:
+        print(output)
+    # Latency targets per scenario, e.g. --assert-p95 login=1500 for legitimate logins during a flood
+    failed = []
+    for target in args.assert_p95:
+        scenario, budget = target.split("=")
+        for result in results:
+            measured = result["scenarios"].get(scenario)
+            if measured is not None and measured["latency_ms"]["p95"] > float(budget):
+                failed.append(f"{result['mix']}/{result['mode']} {scenario} p95 {measured['latency_ms']['p95']} ms > {budget} ms")
+    # Expected outcomes per scenario, e.g. --assert-status login=201 flood_login=429:0.9 (every legitimate login
+    # succeeds, at least 90% of the flood is rejected by the limits)
+    for target in args.assert_status:
+        scenario, expected = target.split("=")
+        codes, _, share = expected.partition(":")
+        codes = codes.split(",")
+        for result in results:
+            measured = result["scenarios"].get(scenario)
+            if measured is None:
+                continue
+            matching = sum(count for status, count in measured["statuses"].items() if status in codes)
+            if matching < float(share or 1) * measured["requests"]:
+                failed.append(f"{result['mix']}/{result['mode']} {scenario} statuses {measured['statuses']}, expected {expected}")
+    # Memory budget, e.g. --assert-rss-growth-mb 64 for concurrent multi-MB uploads that must stream to disk
+    if args.assert_rss_growth_mb is not None:
+        failed += [f"{result['mix']}/{result['mode']} rss growth {result['rss_mb']['growth']} MB > {args.assert_rss_growth_mb} MB" for result in results if result["rss_mb"]["growth"] > args.assert_rss_growth_mb]
+    for failure in failed:
+        print(failure, file=sys.stderr)
+    sys.exit(1 if failed else 0)
+
+# Serialization only benchmark of the list response paths (no server, in-memory SQLite)
+def serialization_command(args):
+    os.environ.setdefault("SELECTED_DB", "SQLite")
+    os.environ.setdefault("DB_SQLITE_PATH", str(DEFAULT_DB_PATH))
+    from .serialization import serialization_benchmark
+    report = {"commit": git_commit(), "python": sys.version.split()[0], "results": [serialization_benchmark(rows, args.repeat) for rows in args.rows]}
+    print(json.dumps(report, indent=2))
+
+# Cold start import time of the app with a budget, non-zero exit when the median exceeds it
+def startup_command(args):
+    from .startup import startup_benchmark
+    environment = {**os.environ, "SELECTED_DB": os.environ.get("SELECTED_DB", "SQLite"), "DB_SQLITE_PATH": os.environ.get("DB_SQLITE_PATH", str(DEFAULT_DB_PATH))}
+    result = startup_benchmark(args.module, args.runs, environment, args.top)
+    result["budget_ms"] = args.budget_ms
+    result["within_budget"] = result["import_ms"]["median"] <= args.budget_ms
+    print(json.dumps({"commit": git_commit(), "python": sys.version.split()[0], **result}, indent=2))
+    sys.exit(0 if result["within_budget"] else 1)
+
+# Recommendation index build at a synthetic scale (default 1M users x 1M songs), no database involved
+def recommendations_command(args):
+    os.environ.setdefault("SELECTED_DB", "SQLite")
+    os.environ.setdefault("DB_SQLITE_PATH", str(DEFAULT_DB_PATH))
+    from .recommendations import recommendations_benchmark
+    result = recommendations_benchmark(args.users, args.songs, args.songs_per_user, args.neighbors, args.max_user_songs, args.block_size, args.lookups, args.seed)
+    print(json.dumps({"commit": git_commit(), "python": sys.version.split()[0], **result}, indent=2))
+
+# Search index at a synthetic catalogue size (default 1M documents), no database involved
+def search_command(args):
+    os.environ.setdefault("SELECTED_DB", "SQLite")
+    os.environ.setdefault("DB_SQLITE_PATH", str(DEFAULT_DB_PATH))
+    from .search import search_benchmark
+    result = search_benchmark(args.documents, args.queries, args.limit, args.seed)
+    print(json.dumps({"commit": git_commit(), "python": sys.version.split()[0], **result}, indent=2))
+
+# Bytes and CPU time per response body for each compression coding and level, no server involved
+def compression_command(args):
+    os.environ.setdefault("SELECTED_DB", "SQLite")
+    os.environ.setdefault("DB_SQLITE_PATH", str(DEFAULT_DB_PATH))
+    from .compression import compression_benchmark
+    levels = {"gzip": args.gzip_levels, "br": args.brotli_qualities, "zstd": args.zstd_levels}
+    print(json.dumps({"commit": git_commit(), "python": sys.version.split()[0], "rows": args.rows, "results": compression_benchmark(args.rows, levels, args.repeat, args.seed)}, indent=2))
+
+# Crash recovery of the job queue: a worker process is killed mid-run and a second one must finish every job exactly
+def jobs_command(args):
+    for suffix in ("", "-wal", "-shm"):
+        Path(f"{args.db_path}{suffix}").unlink(missing_ok=True)
+    args.configured_db = False
+    environment = configure_environment(args)
+    environment.update({"JOB_LEASE_SECONDS": str(args.lease), "JOB_BATCH_SIZE": str(args.batch_size), "JOB_POLL_SECONDS": "1"})
+    from .seed import seed_database
+    from .jobs import jobs_benchmark
+    from ..db import engine
+    scale = resolve_scale(args)
+    seed_database(engine, scale, args.seed)
+    result = jobs_benchmark(engine, list(range(2, scale["users"] + 1)), args.workers, args.kill_after, args.timeout, environment)
+    print(json.dumps({"commit": git_commit(), "python": sys.version.split()[0], "scale": scale, **result}, indent=2))
+    sys.exit(0 if result["passed"] else 1)
+
+# Regression check between two reports: throughput drop or p95/p99 growth above the tolerance fails
+def compare_command(args):
+    baseline = {(result["mix"], result["mode"]): result for result in json.loads(Path(args.baseline).read_text())["results"]}
+    current = {(result["mix"], result["mode"]): result for result in json.loads(Path(args.current).read_text())["results"]}
+    regressions = []
+    for key in sorted(baseline.keys() & current.keys()):
+        before, after = baseline[key], current[key]
+        checks = [("throughput_rps", before["throughput_rps"], after["throughput_rps"], True)]
+        checks += [(f"latency_ms.{name}", before["latency_ms"][name], after["latency_ms"][name], False) for name in ("p95", "p99")]
+        for name, old, new, higher_is_better in checks:
+            change = (new - old) / old if old else 0.0
+            regressed = change < -args.tolerance if higher_is_better else change > args.tolerance
+            print(f"{key[0]:>14} {key[1]:>7} {name:<16} {old:>10} -> {new:>10} ({change:+.1%}){'  REGRESSION' if regressed else ''}")
+            if regressed:
+                regressions.append((key, name))
+    sys.exit(1 if regressions else 0)
+
+def main(argv=None):
+    from .seed import SCALES
+    from .scenarios import MIXES
+    parser = argparse.ArgumentParser(prog="python -m Backend.benchmarks", description="BetterSpotify load and benchmark harness")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Seed a database, drive request mixes and report throughput and latency percentiles as JSON")
+    run_parser.add_argument("--mix", nargs="+", choices=list(MIXES), default=["browse"])
+    run_parser.add_argument("--mode", nargs="+", choices=["asgi", "uvicorn"], default=["asgi"])
+    run_parser.add_argument("--scale", choices=list(SCALES), default="small")
+    for name in SCALES["small"]:
+        run_parser.add_argument(f"--{name.replace('_', '-')}", dest=name, type=int, help=f"override the scale {name}")
+    run_parser.add_argument("--seed", type=int, default=1)
+    run_parser.add_argument("--concurrency", type=int, default=32)
+    run_parser.add_argument("--duration", type=float, default=10.0, help="measured seconds per mix and mode")
+    run_parser.add_argument("--warmup", type=float, default=2.0)
+    run_parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    run_parser.add_argument("--db-path", type=Path, default=DEFAULT_DB_PATH)
+    run_parser.add_argument("--reuse", action="store_true", help="keep an already seeded database of the same scale and seed")
+    run_parser.add_argument("--configured-db", action="store_true", help="use the database configured through the DB_* environment (must be empty unless --reuse)")
+    run_parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    run_parser.add_argument("--accept-encoding", help="Accept-Encoding sent by the clients, e.g. identity, gzip or zstd (default: every coding httpx decodes)")
+    run_parser.add_argument("--assert-p95", nargs="*", default=[], metavar="SCENARIO=MS", help="exit non-zero when a scenario p95 latency exceeds the target")
+    run_parser.add_argument("--assert-status", nargs="*", default=[], metavar="SCENARIO=CODES[:SHARE]", help="exit non-zero when less than SHARE (default all) of a scenario responses have one of the comma separated status codes")
+    run_parser.add_argument("--assert-rss-growth-mb", type=float, metavar="MB", help="exit non-zero when the app processes grow more than this during a measured run")
+    run_parser.set_defaults(handler=run_command)
+
+    serialization_parser = commands.add_parser("serialization", help="Time the list response serialization paths at the given row counts")
+    serialization_parser.add_argument("--rows", nargs="+", type=int, default=[10000, 100000])
+    serialization_parser.add_argument("--repeat", type=int, default=5)
+    serialization_parser.set_defaults(handler=serialization_command)
+
+    startup_parser = commands.add_parser("startup", help="Measure the cold import time of the app (python -X importtime) against a budget")
+    startup_parser.add_argument("--module", default="Backend.main")
+    startup_parser.add_argument("--runs", type=int, default=5)
+    startup_parser.add_argument("--budget-ms", type=float, default=1000.0)
+    startup_parser.add_argument("--top", type=int, default=15, help="number of slowest modules (self time) to report")
+    startup_parser.set_defaults(handler=startup_command)
+
+    recommendations_parser = commands.add_parser("recommendations", help="Time the recommendation index build on synthetic ownership data and the lookups on its snapshot")
+    recommendations_parser.add_argument("--users", type=int, default=1_000_000)
+    recommendations_parser.add_argument("--songs", type=int, default=1_000_000)
+    recommendations_parser.add_argument("--songs-per-user", type=int, default=20)
+    recommendations_parser.add_argument("--neighbors", type=int, default=50)
+    recommendations_parser.add_argument("--max-user-songs", type=int, default=500)
+    recommendations_parser.add_argument("--block-size", type=int, default=20000)
+    recommendations_parser.add_argument("--lookups", type=int, default=10000)
+    recommendations_parser.add_argument("--seed", type=int, default=1)
+    recommendations_parser.set_defaults(handler=recommendations_command)
+
+    search_parser = commands.add_parser("search", help="Build the search index over synthetic documents and time snapshot save/load and queries per query kind")
+    search_parser.add_argument("--documents", type=int, default=1_000_000)
+    search_parser.add_argument("--queries", type=int, default=200, help="queries per kind (term, two_terms, prefix, typo)")
+    search_parser.add_argument("--limit", type=int, default=20)
+    search_parser.add_argument("--seed", type=int, default=1)
+    search_parser.set_defaults(handler=search_command)
+
+    compression_parser = commands.add_parser("compression", help="Compare bytes on the wire and CPU time of the response compression codings and levels")
+    compression_parser.add_argument("--rows", type=int, default=10000)
+    compression_parser.add_argument("--gzip-levels", nargs="+", type=int, default=[1, 6, 9])
+    compression_parser.add_argument("--brotli-qualities", nargs="+", type=int, default=[1, 4, 11])
+    compression_parser.add_argument("--zstd-levels", nargs="+", type=int, default=[1, 3, 19])
+    compression_parser.add_argument("--repeat", type=int, default=5)
+    compression_parser.add_argument("--seed", type=int, default=1)
+    compression_parser.set_defaults(handler=compression_command)
+
+    jobs_parser = commands.add_parser("jobs", help="Queue user deletions, kill the job worker process mid-run and check that a restarted worker completes them exactly")
+    jobs_parser.add_argument("--scale", choices=list(SCALES), default="small")
+    for name in SCALES["small"]:
+        jobs_parser.add_argument(f"--{name.replace('_', '-')}", dest=name, type=int, help=f"override the scale {name}")
+    jobs_parser.add_argument("--workers", type=int, default=4, help="worker tasks per process")
+    jobs_parser.add_argument("--kill-after", type=float, default=1.0, help="seconds before the first worker process is killed")
+    jobs_parser.add_argument("--lease", type=int, default=3, help="job lease seconds, the restarted worker waits this long for the orphaned jobs")
+    jobs_parser.add_argument("--batch-size", type=int, default=50, help="library rows deleted per transaction")
+    jobs_parser.add_argument("--timeout", type=float, default=300.0)
+    jobs_parser.add_argument("--seed", type=int, default=1)
+    jobs_parser.add_argument("--db-path", type=Path, default=Path(tempfile.gettempdir()) / "betterspotify_jobs.db")
+    jobs_parser.set_defaults(handler=jobs_command)
+
+    compare_parser = commands.add_parser("compare", help="Compare two JSON reports and exit non-zero on regressions")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--tolerance", type=float, default=0.15)
+    compare_parser.set_defaults(handler=compare_command)
+
+    args = parser.parse_args(argv)
+    args.handler(args)
+
+if __name__ == "__main__":
+    main()
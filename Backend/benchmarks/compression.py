@@ -0,0 +1,48 @@
+import random
+from time import process_time
+import orjson
+from ..core.compression import GzipEncoder, BrotliEncoder, ZstdEncoder
+from ..core.responses import orjson_line
+
+WORDS = "love night heart dance fire rain summer road dream blue city light gold wild river ghost echo radio velvet storm".split()
+
+ENCODERS = {"gzip": GzipEncoder, "br": BrotliEncoder, "zstd": ZstdEncoder}
+
+def sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+# Bodies as the list routes render them: a page of albums, a page of songs and an NDJSON export in chunks
+def representative_bodies(rows: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    albums = [{"id": row_id, "title": f"{sentence(rng, 3)} {row_id}", "description": sentence(rng, 12), "genre": rng.randint(1, 40)} for row_id in range(1, rows + 1)]
+    songs = [{"id": row_id, "title": f"{sentence(rng, 3)} {row_id}", "description": sentence(rng, 12), "genre": rng.randint(1, 40), "album_fk": rng.randint(1, rows)} for row_id in range(1, rows + 1)]
+    ndjson = [b"".join(orjson_line(song) for song in songs[offset:offset + 1000]) for offset in range(0, rows, 1000)]
+    return {
+        "album_page": [orjson.dumps({"items": albums[:100], "next_after": 100})],
+        "album_all": [orjson.dumps({"items": albums, "next_after": None})],
+        "song_all": [orjson.dumps({"items": songs, "next_after": None})],
+        "song_ndjson": ndjson,
+    }
+
+# Bytes on the wire and compression CPU time per response, for each coding and level the middleware can use.
+# Streamed bodies are flushed per chunk exactly like the middleware does
+def compression_benchmark(rows: int, levels: dict, repeat: int, seed: int) -> dict:
+    results = {}
+    for body_name, chunks in representative_bodies(rows, seed).items():
+        identity = sum(len(chunk) for chunk in chunks)
+        body_results = {"identity_bytes": identity, "codecs": {}}
+        for encoding, encoding_levels in levels.items():
+            for level in encoding_levels:
+                try:
+                    ENCODERS[encoding](level)
+                except ImportError:
+                    continue
+                timings = []
+                for _ in range(repeat):
+                    start = process_time()
+                    encoder = ENCODERS[encoding](level)
+                    size = sum(len(encoder.compress(chunk, len(chunks) > 1)) for chunk in chunks) + len(encoder.finish())
+                    timings.append(process_time() - start)
+                body_results["codecs"][f"{encoding}-{level}"] = {"bytes": size, "ratio": round(size / identity, 4), "cpu_ms": round(min(timings) * 1000, 3)}
+        results[body_name] = body_results
+    return results
@@ -0,0 +1,81 @@
+import sys
+import time
+import signal
+import asyncio
+import subprocess
+from pathlib import Path
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session
+from .runner import percentile
+
+REPO_ROOT = Path(__file__).resolve().parent.parent.parent
+
+def start_workers(workers: int, environment: dict) -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, "-m", "Backend.cli", "run-jobs", "--workers", str(workers)], cwd=REPO_ROOT, env=environment)
+
+async def enqueue_user_deletions(user_ids: list):
+    from ..db.db import AsyncSessionLocal, async_engine
+    from ..core.jobs import enqueue
+    async with AsyncSessionLocal() as db:
+        for user_id in user_ids:
+            await enqueue(db, "delete_user", {"user_id": user_id}, f"delete_user:{user_id}")
+        await db.commit()
+    await async_engine.dispose()
+
+def pending_jobs(session: Session) -> dict:
+    from ..models import Job
+    return dict(session.execute(select(Job.status, func.count(Job.id)).where(Job.status.in_(["queued", "running"])).group_by(Job.status)).all())
+
+# Crash recovery check: user deletions (the largest cascade, with owner count decrements) are queued, the worker
+# process is killed with SIGKILL while it holds jobs, a second worker process takes the expired leases over.
+# Every job must end done, no library row of a deleted user may remain and every owner count must match a recount
+def jobs_benchmark(engine, user_ids: list, workers: int, kill_after: float, timeout: float, environment: dict) -> dict:
+    from ..models import Job, User, Songs_owned, Song_stats
+    start = time.perf_counter()
+    asyncio.run(enqueue_user_deletions(user_ids))
+    first = start_workers(workers, environment)
+    time.sleep(kill_after)
+    first.send_signal(signal.SIGKILL)
+    first.wait()
+    with Session(engine) as session:
+        orphaned = pending_jobs(session).get("running", 0)
+    second = start_workers(workers, environment)
+    deadline = time.perf_counter() + timeout
+    try:
+        while time.perf_counter() < deadline:
+            with Session(engine) as session:
+                if not pending_jobs(session):
+                    break
+            time.sleep(0.2)
+    finally:
+        second.send_signal(signal.SIGTERM)
+        second.wait(timeout=60)
+    elapsed = time.perf_counter() - start
+    with Session(engine) as session:
+        jobs = session.execute(select(Job.status, Job.attempts, Job.created_at, Job.finished_at).where(Job.kind == "delete_user")).all()
+        remaining_users = session.scalar(select(func.count(User.id)).where(User.id.in_(user_ids)))
+        remaining_owned = session.scalar(select(func.count(Songs_owned.id)).where(Songs_owned.user_fk.in_(user_ids)))
+        owners = select(Songs_owned.song_fk, func.count(Songs_owned.id).label("owners")).group_by(Songs_owned.song_fk).subquery()
+        drifted = session.scalar(select(func.count()).select_from(Song_stats).outerjoin(owners, owners.c.song_fk == Song_stats.song_fk).where(Song_stats.owner_count != func.coalesce(owners.c.owners, 0)))
+    latencies = sorted((finished - created).total_seconds() for status, _, created, finished in jobs if finished is not None)
+    checks = {
+        "all_jobs_done": all(status == "done" for status, _, _, _ in jobs),
+        "users_deleted": remaining_users == 0,
+        "libraries_emptied": remaining_owned == 0,
+        "owner_counts_exact": drifted == 0,
+        "crash_left_running_jobs": orphaned > 0,
+    }
+    return {
+        "jobs": len(jobs),
+        "workers": workers,
+        "kill_after_seconds": kill_after,
+        "running_at_crash": orphaned,
+        "retried_jobs": sum(1 for _, attempts, _, _ in jobs if attempts > 1),
+        "statuses": {status: sum(1 for job in jobs if job[0] == status) for status in {job[0] for job in jobs}},
+        "elapsed_seconds": round(elapsed, 2),
+        "jobs_per_second": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "job_latency_seconds": {"p50": round(percentile(latencies, 0.50), 3), "p95": round(percentile(latencies, 0.95), 3), "max": round(latencies[-1], 3) if latencies else 0.0},
+        "drifted_owner_counts": drifted,
+        "checks": checks,
+        "passed": all(checks.values()),
+    }
@@ -0,0 +1,56 @@
+import tempfile
+from pathlib import Path
+from time import perf_counter
+import numpy as np
+from ..core.recommendations import build_arrays, write_snapshot, RecommendationIndex
+
+# Synthetic ownership: library sizes are geometric around songs_per_user, songs follow a Zipf like
+# popularity so a few hits co-occur with most of the catalogue, (user, song) duplicates are dropped
+def synthetic_ownership(users: int, songs: int, songs_per_user: int, seed: int) -> tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    sizes = rng.geometric(1 / songs_per_user, size=users)
+    owned_user = np.repeat(np.arange(1, users + 1, dtype=np.int64), sizes)
+    ranks = np.minimum(rng.zipf(1.3, size=len(owned_user)), songs)
+    # Popular ranks are scattered over the song ids
+    owned_song = rng.permutation(songs).astype(np.int64)[ranks - 1] + 1
+    pairs = np.unique(owned_user * (songs + 1) + owned_song)
+    return pairs // (songs + 1), pairs % (songs + 1)
+
+# Full index build (arrays and snapshot) and lookup latency against the memory mapped snapshot
+def recommendations_benchmark(users: int, songs: int, songs_per_user: int, neighbors: int, max_user_songs: int, block_size: int, lookups: int, seed: int) -> dict:
+    start = perf_counter()
+    owned_user, owned_song = synthetic_ownership(users, songs, songs_per_user, seed)
+    generate_seconds = perf_counter() - start
+    start = perf_counter()
+    arrays = build_arrays(owned_user, owned_song, neighbors, max_user_songs, block_size)
+    build_seconds = perf_counter() - start
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "recommendations.snapshot"
+        start = perf_counter()
+        write_snapshot(path, arrays, {"max_owned_id": len(owned_user), "rows": len(owned_user), "built_at": 0})
+        write_seconds = perf_counter() - start
+        index = RecommendationIndex(seed_songs=200, max_user_songs=max_user_songs)
+        index.load(path)
+        rng = np.random.default_rng(seed + 1)
+        timings = {}
+        for name, lookup, keys in [("similar", index.similar, arrays["song_ids"]), ("recommend", index.recommend, arrays["user_ids"])]:
+            samples = []
+            for key in rng.choice(keys, size=lookups):
+                lookup_start = perf_counter()
+                lookup(int(key), 20)
+                samples.append(perf_counter() - lookup_start)
+            samples = np.array(samples) * 1e6
+            timings[name] = {"p50": round(float(np.percentile(samples, 50)), 1), "p99": round(float(np.percentile(samples, 99)), 1)}
+        snapshot_bytes = path.stat().st_size
+    return {
+        "users": users,
+        "songs": songs,
+        "ownership_rows": len(owned_user),
+        "songs_owned": len(arrays["song_ids"]),
+        "neighbors": neighbors,
+        "generate_seconds": round(generate_seconds, 2),
+        "build_seconds": round(build_seconds, 2),
+        "snapshot_write_seconds": round(write_seconds, 2),
+        "snapshot_megabytes": round(snapshot_bytes / 2**20, 1),
+        "lookup_microseconds": timings,
+    }
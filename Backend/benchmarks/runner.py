@@ -0,0 +1,179 @@
+import os
+import re
+import random
+import asyncio
+import threading
+from time import perf_counter, process_time
+from collections import defaultdict
+from .seed import PASSWORD, ADMIN_USERNAME, HEAVY_USERNAME, username
+from .scenarios import Context, MIXES, MIX_CLIENTS, MIX_PAUSE_SECONDS, MIX_SETUP, client_address
+
+# Users logged in during setup whose tokens the browse scenarios rotate through
+SETUP_USERS = 20
+
+METRICS_LINE = re.compile(r'^db_queries_per_request_(sum|count)\{route="(.*)"\} (\S+)$')
+
+# Every setup user logs in and keeps sending requests from its own address
+async def token_headers(client, name: str, rng: random.Random) -> dict:
+    address = client_address(rng)
+    response = await client.post("/auth/token", data={"username": name, "password": PASSWORD}, headers=address)
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}", **address}
+
+async def prepare_context(client, scale: dict, seed: int, mix: str) -> Context:
+    context = Context(scale, seed)
+    rng = random.Random(seed)
+    context.admin_headers = await token_headers(client, ADMIN_USERNAME, rng)
+    context.heavy_headers = await token_headers(client, HEAVY_USERNAME, rng)
+    user_ids = rng.sample(range(3, scale["users"] + 1), min(SETUP_USERS, scale["users"] - 2))
+    context.user_headers = [await token_headers(client, username(user_id), rng) for user_id in user_ids]
+    if mix in MIX_SETUP:
+        await MIX_SETUP[mix](client, context)
+    return context
+
+# Per route statement totals from /metrics, the difference across a run gives queries per request
+async def query_totals(client) -> dict:
+    response = await client.get("/metrics")
+    if response.status_code != 200:
+        return {}
+    totals = defaultdict(lambda: [0.0, 0.0])
+    for line in response.text.splitlines():
+        match = METRICS_LINE.match(line)
+        if match:
+            kind, route, value = match.groups()
+            totals[route][0 if kind == "sum" else 1] = float(value)
+    return totals
+
+def queries_per_request(before: dict, after: dict) -> dict:
+    result = {}
+    for route, (total, count) in after.items():
+        if route == "/metrics":
+            continue
+        previous_total, previous_count = before.get(route, (0.0, 0.0))
+        if count > previous_count:
+            result[route] = round((total - previous_total) / (count - previous_count), 2)
+    return dict(sorted(result.items()))
+
+# Resident set size of a process and its children (uvicorn workers), from /proc on Linux
+def process_rss(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/statm") as statm:
+            rss = int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        with open(f"/proc/{pid}/task/{pid}/children") as children:
+            return rss + sum(process_rss(int(child)) for child in children.read().split())
+    except (OSError, ValueError):
+        return 0
+
+# Peak RSS of the app processes during the measured phase, sampled from a thread so a busy event loop
+# (asgi mode, where the app runs in this process) does not delay the samples
+class RssSampler:
+    def __init__(self, pid: int, interval: float = 0.02):
+        self.pid = pid
+        self.interval = interval
+        self.start_bytes = 0
+        self.peak_bytes = 0
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.peak_bytes = max(self.peak_bytes, process_rss(self.pid))
+
+    def start(self):
+        self.start_bytes = self.peak_bytes = process_rss(self.pid)
+        self._thread.start()
+
+    def stop(self) -> dict:
+        self._stopped.set()
+        self._thread.join()
+        self.peak_bytes = max(self.peak_bytes, process_rss(self.pid))
+        megabytes = 1024 * 1024
+        return {"start": round(self.start_bytes / megabytes, 1), "peak": round(self.peak_bytes / megabytes, 1), "growth": round((self.peak_bytes - self.start_bytes) / megabytes, 1)}
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+def latency_summary(latencies: list) -> dict:
+    values = sorted(latencies)
+    return {
+        "p50": round(percentile(values, 0.50) * 1000, 3),
+        "p95": round(percentile(values, 0.95) * 1000, 3),
+        "p99": round(percentile(values, 0.99) * 1000, 3),
+        "mean": round(sum(values) / len(values) * 1000, 3) if values else 0.0,
+        "max": round(values[-1] * 1000, 3) if values else 0.0,
+    }
+
+# Closed loop workers: each picks a weighted scenario (or runs its dedicated one), waits for the response and repeats
+# until the deadline
+async def drive(client, context: Context, mix: str, concurrency: int, duration: float, warmup: float, seed: int, server_pid: int) -> dict:
+    scenarios = list(MIXES[mix])
+    weights = list(MIXES[mix].values())
+    dedicated = [scenario for scenario, clients in MIX_CLIENTS.get(mix, {}).items() for _ in range(clients)]
+    pause = MIX_PAUSE_SECONDS.get(mix, 0.0)
+    latencies = defaultdict(list)
+    statuses = defaultdict(lambda: defaultdict(int))
+    errors = defaultdict(int)
+    # Bytes received as sent on the wire (before content decoding)
+    downloaded = defaultdict(int)
+    measuring = False
+
+    async def worker(number: int, deadline: float):
+        rng = random.Random(seed * 1000 + number)
+        while perf_counter() < deadline:
+            scenario = dedicated[number] if number < len(dedicated) else rng.choices(scenarios, weights)[0]
+            start = perf_counter()
+            try:
+                response = await scenario(client, context, rng)
+                status = response.status_code
+                size = response.num_bytes_downloaded
+            except Exception as error:
+                status = type(error).__name__
+                size = 0
+            elapsed = perf_counter() - start
+            if measuring:
+                latencies[scenario.__name__].append(elapsed)
+                statuses[scenario.__name__][str(status)] += 1
+                downloaded[scenario.__name__] += size
+                if not isinstance(status, int) or status >= 500:
+                    errors[scenario.__name__] += 1
+            if pause and number >= len(dedicated):
+                await asyncio.sleep(pause)
+
+    if warmup > 0:
+        deadline = perf_counter() + warmup
+        await asyncio.gather(*(worker(number, deadline) for number in range(concurrency)))
+    before = await query_totals(client)
+    rss = RssSampler(server_pid)
+    rss.start()
+    measuring = True
+    start = perf_counter()
+    cpu_start = process_time()
+    deadline = start + duration
+    await asyncio.gather(*(worker(number, deadline) for number in range(concurrency)))
+    elapsed = perf_counter() - start
+    cpu_seconds = process_time() - cpu_start
+    measuring = False
+    rss_mb = rss.stop()
+    after = await query_totals(client)
+
+    every = [latency for values in latencies.values() for latency in values]
+    return {
+        "requests": len(every),
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_rps": round(len(every) / elapsed, 2) if elapsed else 0.0,
+        "errors": sum(errors.values()),
+        "latency_ms": latency_summary(every),
+        "bytes_per_request": round(sum(downloaded.values()) / len(every)) if every else 0,
+        # Process CPU of this benchmark process: client and app in asgi mode, client only in uvicorn mode
+        "cpu_ms_per_request": round(cpu_seconds * 1000 / len(every), 3) if every else 0.0,
+        # Resident memory of the app processes (this process in asgi mode, uvicorn and its workers otherwise)
+        "rss_mb": rss_mb,
+        "scenarios": {
+            name: {"requests": len(values), "latency_ms": latency_summary(values), "bytes_per_request": round(downloaded[name] / len(values)), "statuses": dict(statuses[name]), "errors": errors[name]}
+            for name, values in sorted(latencies.items())
+        },
+        "queries_per_request": queries_per_request(before, after),
+    }
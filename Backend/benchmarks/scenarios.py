@@ -0,0 +1,187 @@
+import io
+import random
+import itertools
+from .seed import PASSWORD, WORDS, username
+
+# Shared state of a run: seeded sizes, tokens obtained during setup and revalidation ETags
+class Context:
+    def __init__(self, scale: dict, seed: int = 1):
+        self.scale = scale
+        self.seed = seed
+        self.admin_headers: dict = {}
+        self.heavy_headers: dict = {}
+        self.user_headers: list[dict] = []
+        self.etags: dict[str, str] = {}
+        self.sequence = itertools.count()
+
+    def user(self, rng: random.Random) -> dict:
+        return rng.choice(self.user_headers)
+
+# Multi-MB JPEG of random noise (compresses poorly, about 4 MB), built once per run
+UPLOAD_IMAGE_SIZE = (2400, 1800)
+_upload_images: dict[int, bytes] = {}
+
+def upload_image(seed: int) -> bytes:
+    if seed not in _upload_images:
+        from PIL import Image
+        width, height = UPLOAD_IMAGE_SIZE
+        buffer = io.BytesIO()
+        Image.frombytes("RGB", UPLOAD_IMAGE_SIZE, random.Random(seed).randbytes(width * height * 3)).save(buffer, "JPEG", quality=90)
+        _upload_images[seed] = buffer.getvalue()
+    return _upload_images[seed]
+
+# Simulated client addresses (X-Forwarded-For, trusted in benchmark runs) so per address rate limits apply per client
+def client_address(rng: random.Random) -> dict:
+    return {"X-Forwarded-For": f"10.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(1, 255)}"}
+
+# A handful of addresses hammering the login endpoint with wrong passwords (credential stuffing)
+ATTACKER_ADDRESSES = [{"X-Forwarded-For": f"203.0.113.{number}"} for number in range(1, 3)]
+
+# Scenarios issue one request each and return the response, the runner times them
+async def login(client, context: Context, rng: random.Random):
+    user_id = rng.randint(3, context.scale["users"])
+    return await client.post("/auth/token", data={"username": username(user_id), "password": PASSWORD}, headers=client_address(rng))
+
+async def flood_login(client, context: Context, rng: random.Random, address: dict | None = None):
+    user_id = rng.randint(3, context.scale["users"])
+    return await client.post("/auth/token", data={"username": username(user_id), "password": f"guess{rng.randrange(10**6)}"}, headers=address or rng.choice(ATTACKER_ADDRESSES))
+
+# The flood has been going on before the measured run: every attacker address has used up its login allowance
+# (bcrypt attempts of the LOGIN_IP_LIMIT window), the run measures logins while the limits reject the flood
+async def exhaust_attackers(client, context: Context):
+    rng = random.Random(context.seed)
+    for address in ATTACKER_ADDRESSES:
+        while (await flood_login(client, context, rng, address)).status_code != 429:
+            pass
+
+async def browse_albums(client, context: Context, rng: random.Random):
+    return await client.get("/album/all", params={"limit": 50, "after": rng.randrange(context.scale["albums"])}, headers=context.user(rng))
+
+async def browse_songs(client, context: Context, rng: random.Random):
+    return await client.get("/song/all", params={"limit": 100, "after": rng.randrange(context.scale["songs"])}, headers=context.user(rng))
+
+async def get_song(client, context: Context, rng: random.Random):
+    return await client.get(f"/song/{rng.randint(1, context.scale['songs'])}", headers=context.user(rng))
+
+async def get_album(client, context: Context, rng: random.Random):
+    return await client.get(f"/album/{rng.randint(1, context.scale['albums'])}", headers=context.user(rng))
+
+# A 200 track playlist page resolved with one multi-get
+async def playlist(client, context: Context, rng: random.Random):
+    ids = ",".join(str(rng.randint(1, context.scale["songs"])) for _ in range(200))
+    return await client.get("/song", params={"ids": ids}, headers=context.user(rng))
+
+async def similar_songs(client, context: Context, rng: random.Random):
+    return await client.get(f"/song/{rng.randint(1, context.scale['songs'])}/similar", headers=context.user(rng))
+
+async def recommendations(client, context: Context, rng: random.Random):
+    return await client.get("/user/me/recommendations", headers=context.user(rng))
+
+async def genre_songs(client, context: Context, rng: random.Random):
+    return await client.get(f"/genre/{rng.randint(1, context.scale['genres'])}/songs", params={"limit": 50}, headers=context.user(rng))
+
+async def genre_top_songs(client, context: Context, rng: random.Random):
+    return await client.get(f"/genre/{rng.randint(1, context.scale['genres'])}/top-songs", params={"limit": 50}, headers=context.user(rng))
+
+async def search(client, context: Context, rng: random.Random):
+    return await client.get("/search", params={"q": rng.choice(WORDS)[:rng.randint(3, 6)]}, headers=context.user(rng))
+
+async def library(client, context: Context, rng: random.Random):
+    return await client.get("/library/me/songs", params={"limit": 50}, headers=context.user(rng))
+
+async def owned_check(client, context: Context, rng: random.Random):
+    ids = ",".join(str(rng.randint(1, context.scale["songs"])) for _ in range(50))
+    return await client.get("/library/me/owned", params={"ids": ids}, headers=context.user(rng))
+
+async def heavy_library(client, context: Context, rng: random.Random):
+    return await client.get("/library/me/songs", params={"limit": 100}, headers=context.heavy_headers)
+
+async def heavy_owned_check(client, context: Context, rng: random.Random):
+    ids = ",".join(str(rng.randint(1, context.scale["songs"])) for _ in range(1000))
+    return await client.get("/library/me/owned", params={"ids": ids}, headers=context.heavy_headers)
+
+async def user_image(client, context: Context, rng: random.Random):
+    return await client.get(f"/user/{rng.randint(1, context.scale['users'])}/profile-image", params={"size": rng.choice([64, 256, 512])}, headers={**context.user(rng), "Accept": "image/webp"})
+
+async def album_image(client, context: Context, rng: random.Random):
+    return await client.get(f"/album/{rng.randint(1, context.scale['albums'])}/album_image/", params={"size": 256}, headers=context.user(rng))
+
+# Conditional GET with the last seen ETag, mostly answered with 304
+async def image_revalidate(client, context: Context, rng: random.Random):
+    url = f"/album/{rng.randint(1, min(context.scale['albums'], 50))}/album_image/"
+    headers = dict(context.user(rng))
+    if url in context.etags:
+        headers["If-None-Match"] = context.etags[url]
+    response = await client.get(url, headers=headers)
+    if "etag" in response.headers:
+        context.etags[url] = response.headers["etag"]
+    return response
+
+# Synthetic MP3 (ID3 header and noise) of the first AUDIO_SONGS songs, uploaded during setup of the mixes that seek in it
+AUDIO_SONGS = 8
+AUDIO_BYTES = 8 * 1024 * 1024
+SEEK_BYTES = 256 * 1024
+
+async def upload_audio(client, context: Context):
+    body = b"ID3" + random.Random(context.seed).randbytes(AUDIO_BYTES - 3)
+    for song_id in range(1, AUDIO_SONGS + 1):
+        response = await client.post(f"/song/{song_id}/audio", files={"file": ("seek.mp3", body, "audio/mpeg")}, headers=context.admin_headers)
+        response.raise_for_status()
+
+# Player seeking: a 256 KB range at a random offset
+async def audio_seek(client, context: Context, rng: random.Random):
+    start = rng.randrange(AUDIO_BYTES - SEEK_BYTES)
+    return await client.get(f"/song/{rng.randint(1, AUDIO_SONGS)}/stream", headers={**context.user(rng), "Range": f"bytes={start}-{start + SEEK_BYTES - 1}"})
+
+# Resumed download: open ended range from a random offset to the end of the file
+async def audio_resume(client, context: Context, rng: random.Random):
+    return await client.get(f"/song/{rng.randint(1, AUDIO_SONGS)}/stream", headers={**context.user(rng), "Range": f"bytes={rng.randrange(AUDIO_BYTES)}-"})
+
+# Concurrent profile image uploads of the heavy user, all streamed to the same name (temp file and atomic rename)
+async def upload_profile_image(client, context: Context, rng: random.Random):
+    return await client.post("/user/me/profile-image/", files={"file": ("upload.jpg", upload_image(context.seed), "image/jpeg")}, headers=context.heavy_headers)
+
+async def create_album(client, context: Context, rng: random.Random):
+    number = next(context.sequence)
+    return await client.post("/album/", json={"title": f"bench {rng.randrange(10**9)} {number}", "description": "benchmark", "genre": rng.randint(1, context.scale["genres"])}, headers=context.admin_headers)
+
+async def patch_song(client, context: Context, rng: random.Random):
+    return await client.patch(f"/song/{rng.randint(1, context.scale['songs'])}", json={"description": f"patched {rng.randrange(10**9)}"}, headers=context.admin_headers)
+
+async def add_library(client, context: Context, rng: random.Random):
+    return await client.post("/library/me/songs", json={"song_ids": [rng.randint(1, context.scale["songs"]) for _ in range(20)]}, headers=context.user(rng))
+
+async def remove_library(client, context: Context, rng: random.Random):
+    return await client.request("DELETE", "/library/me/songs", json={"song_ids": [rng.randint(1, context.scale["songs"]) for _ in range(20)]}, headers=context.user(rng))
+
+# Weighted request mixes
+MIXES = {
+    "login_storm": {login: 1},
+    "login_flood": {flood_login: 1},
+    "browse": {browse_albums: 2, browse_songs: 2, get_song: 4, get_album: 2, search: 2, library: 2, owned_check: 1, playlist: 1, similar_songs: 1, recommendations: 1, genre_songs: 1, genre_top_songs: 1},
+    "images": {user_image: 2, album_image: 2, image_revalidate: 2},
+    "admin_writes": {create_album: 1, patch_song: 2, add_library: 2, remove_library: 1},
+    "uploads": {upload_profile_image: 1},
+    "ranges": {audio_seek: 9, audio_resume: 1},
+    "library_heavy": {heavy_library: 3, heavy_owned_check: 1},
+    "mixed": {login: 1, get_song: 8, get_album: 3, browse_albums: 2, search: 3, library: 3, user_image: 3, image_revalidate: 2, patch_song: 1, add_library: 1},
+}
+
+# Clients of a mix bound to one scenario instead of the weighted pick. Legitimate users log in at their own pace
+# while every other client floods: with weights alone the closed loop clients would pile up on the slow bcrypt
+# logins (the rejected attempts return at once) and measure the queue instead of the flood
+MIX_CLIENTS = {
+    "login_flood": {login: 2},
+}
+
+# Pause of the weighted clients between requests: the flood arrives at a bounded rate (about 10 attempts per second
+# and client) as over a network, instead of the benchmark client itself saturating the CPU the app runs on
+MIX_PAUSE_SECONDS = {
+    "login_flood": 0.1,
+}
+
+# Setup a mix needs before its measured run
+MIX_SETUP = {
+    "login_flood": exhaust_attackers,
+    "ranges": upload_audio,
+}
@@ -0,0 +1,61 @@
+import random
+import tempfile
+from pathlib import Path
+from time import perf_counter
+from ..core.search import SearchIndex
+from .runner import percentile
+from .seed import WORDS
+
+# Query kinds the search box sends: whole words, several words, a prefix while typing and a word with a typo
+def query_mix(rng: random.Random, count: int) -> dict:
+    def typo(word: str) -> str:
+        position = rng.randrange(1, len(word) - 1)
+        return word[:position] + word[position + 1] + word[position] + word[position + 2:]
+    return {
+        "term": [rng.choice(WORDS) for _ in range(count)],
+        "two_terms": [f"{rng.choice(WORDS)} {rng.choice(WORDS)}" for _ in range(count)],
+        "prefix": [rng.choice(WORDS)[:rng.randint(2, 4)] for _ in range(count)],
+        "typo": [typo(rng.choice([word for word in WORDS if len(word) >= 5])) for _ in range(count)],
+    }
+
+# Synthetic catalogue documents (title from the seed vocabulary plus a unique word, description of six words),
+# index build, snapshot save/load and query latency per query kind
+def search_benchmark(documents: int, queries: int, limit: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    index = SearchIndex()
+    start = perf_counter()
+    for doc_id in range(1, documents + 1):
+        title = f"{rng.choice(WORDS)} {rng.choice(WORDS)} track{doc_id}"
+        description = " ".join(rng.choice(WORDS) for _ in range(6))
+        index.add("song" if doc_id % 10 else "album", doc_id, title, description)
+    build_seconds = perf_counter() - start
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "search.snapshot"
+        index.signature = ("benchmark", documents)
+        start = perf_counter()
+        index.save(path)
+        save_seconds = perf_counter() - start
+        snapshot_bytes = path.stat().st_size
+        loaded = SearchIndex()
+        start = perf_counter()
+        loaded.load(path, index.signature)
+        load_seconds = perf_counter() - start
+    timings = {}
+    for kind, kind_queries in query_mix(rng, queries).items():
+        samples = []
+        for query in kind_queries:
+            query_start = perf_counter()
+            loaded.search(query, limit)
+            samples.append(perf_counter() - query_start)
+        samples.sort()
+        timings[kind] = {"p50": round(percentile(samples, 0.50) * 1000, 2), "p95": round(percentile(samples, 0.95) * 1000, 2), "p99": round(percentile(samples, 0.99) * 1000, 2)}
+    return {
+        "documents": documents,
+        "terms": len(loaded._postings),
+        "queries_per_kind": queries,
+        "build_seconds": round(build_seconds, 2),
+        "snapshot_save_seconds": round(save_seconds, 2),
+        "snapshot_load_seconds": round(load_seconds, 2),
+        "snapshot_megabytes": round(snapshot_bytes / 2**20, 1),
+        "query_latency_ms": timings,
+    }
@@ -0,0 +1,83 @@
+import json
+import random
+from pathlib import Path
+from sqlalchemy import insert, func, select
+from sqlalchemy.orm import Session
+
+# Synthetic catalogue sizes, every value can be overridden from the command line
+SCALES = {
+    "small": {"users": 200, "genres": 20, "albums": 200, "songs": 5000, "owned_per_user": 20, "heavy_user_songs": 5000},
+    "medium": {"users": 2000, "genres": 50, "albums": 2000, "songs": 50000, "owned_per_user": 50, "heavy_user_songs": 50000},
+    "large": {"users": 10000, "genres": 100, "albums": 10000, "songs": 100000, "owned_per_user": 100, "heavy_user_songs": 100000},
+}
+
+PASSWORD = "benchmark"
+ADMIN_USERNAME = "admin"
+HEAVY_USERNAME = "heavy"
+INSERT_CHUNK_SIZE = 10000
+
+# Title vocabulary, the search mix queries the same words
+WORDS = [
+    "midnight", "summer", "electric", "river", "golden", "shadow", "ocean", "neon", "velvet", "thunder",
+    "silver", "dream", "fire", "winter", "echo", "wild", "broken", "crystal", "desert", "city",
+    "heart", "storm", "paper", "moon", "highway", "garden", "signal", "glass", "lonely", "northern",
+]
+
+def username(user_id: int) -> str:
+    if user_id == 1:
+        return ADMIN_USERNAME
+    if user_id == 2:
+        return HEAVY_USERNAME
+    return f"user{user_id}"
+
+def title(rng: random.Random, number: int) -> str:
+    return f"{rng.choice(WORDS)} {rng.choice(WORDS)} {number}"
+
+def insert_chunked(connection, table, rows):
+    for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+        connection.execute(insert(table), rows[start:start + INSERT_CHUNK_SIZE])
+
+# Deterministic data set for a scale and seed: user 1 is the admin, user 2 owns heavy_user_songs songs
+def seed_database(engine, scale: dict, seed: int):
+    from ..db import Base
+    from .. import models
+    from ..models.user import Gender
+    from ..core.hashing import bcrypt_context
+    from ..core.genre_stats import recount_genre_stats
+    rng = random.Random(seed)
+    Base.metadata.create_all(bind=engine)
+    # One bcrypt hash shared by every user, hashing per user would dominate the seeding time
+    password_hash = bcrypt_context.hash(PASSWORD)
+    with engine.begin() as connection:
+        if connection.scalar(select(func.count()).select_from(models.User)):
+            raise SystemExit("Benchmark database is not empty, remove it or pass --reuse")
+        insert_chunked(connection, models.Genre.__table__, [{"id": genre_id, "genre": f"genre {genre_id}"} for genre_id in range(1, scale["genres"] + 1)])
+        insert_chunked(connection, models.User.__table__, [
+            {"id": user_id, "username": username(user_id), "first_name": "Bench", "last_name": f"User{user_id}", "email": f"{username(user_id)}@example.com", "gender": Gender.Other, "password_hash": password_hash, "wallet": None, "is_admin": user_id == 1}
+            for user_id in range(1, scale["users"] + 1)
+        ])
+        insert_chunked(connection, models.Album.__table__, [
+            {"id": album_id, "title": title(rng, album_id), "description": f"Synthetic album {album_id}", "genre": rng.randint(1, scale["genres"])}
+            for album_id in range(1, scale["albums"] + 1)
+        ])
+        insert_chunked(connection, models.Song.__table__, [
+            {"id": song_id, "title": title(rng, song_id), "description": f"Synthetic song {song_id}", "genre": rng.randint(1, scale["genres"]), "album_fk": rng.randint(1, scale["albums"])}
+            for song_id in range(1, scale["songs"] + 1)
+        ])
+        owned = [{"user_fk": 2, "song_fk": song_id} for song_id in range(1, min(scale["heavy_user_songs"], scale["songs"]) + 1)]
+        for user_id in range(3, scale["users"] + 1):
+            owned += [{"user_fk": user_id, "song_fk": song_id} for song_id in rng.sample(range(1, scale["songs"] + 1), min(scale["owned_per_user"], scale["songs"]))]
+        insert_chunked(connection, models.Songs_owned.__table__, owned)
+    with Session(engine) as session:
+        recount_genre_stats(session)
+
+# The scale is stored next to a seeded SQLite file so --reuse can check it matches
+def scale_marker(db_path: Path) -> Path:
+    return db_path.with_name(db_path.name + ".scale.json")
+
+def read_marker(db_path: Path) -> dict | None:
+    marker = scale_marker(db_path)
+    return json.loads(marker.read_text()) if marker.exists() and db_path.exists() else None
+
+def write_marker(db_path: Path, scale: dict, seed: int):
+    scale_marker(db_path).write_text(json.dumps({"scale": scale, "seed": seed}))
@@ -0,0 +1,40 @@
+import re
+import sys
+import subprocess
+from statistics import median
+from time import perf_counter
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)$")
+
+def parse_importtime(stderr: str) -> list[tuple[str, int, int]]:
+    modules = []
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, _, name = match.groups()
+            modules.append((name, int(self_us), int(cumulative_us)))
+    return modules
+
+# Cold import of the app module in fresh interpreters (python -X importtime), as every uvicorn worker does at boot
+def startup_benchmark(module: str, runs: int, environment: dict, top: int) -> dict:
+    samples = []
+    for _ in range(runs):
+        start = perf_counter()
+        completed = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], env=environment, capture_output=True, text=True)
+        wall = perf_counter() - start
+        if completed.returncode != 0:
+            raise SystemExit(completed.stderr[-2000:])
+        modules = parse_importtime(completed.stderr)
+        import_us = next(cumulative for name, _, cumulative in modules if name == module)
+        samples.append((import_us, wall, modules))
+    samples.sort(key=lambda sample: sample[0])
+    import_us, wall, modules = samples[len(samples) // 2]
+    slowest = sorted(modules, key=lambda module_time: module_time[1], reverse=True)[:top]
+    return {
+        "module": module,
+        "runs": runs,
+        "import_ms": {"median": round(median(sample[0] for sample in samples) / 1000, 2), "min": round(samples[0][0] / 1000, 2), "max": round(samples[-1][0] / 1000, 2)},
+        "process_wall_ms_median": round(median(sample[1] for sample in samples) * 1000, 2),
+        "modules_imported": len(modules),
+        "slowest_self_ms": {name: round(self_us / 1000, 2) for name, self_us, _ in slowest},
+    }
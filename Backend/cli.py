@@ -0,0 +1,106 @@
+import json
+import argparse
+from pathlib import Path
+from .core.config import settings
+
+ALEMBIC_INI = Path(__file__).resolve().parent / "alembic.ini"
+
+# Schema creation and upgrades: python -m Backend.cli init-db
+def init_db_command(args):
+    from alembic import command
+    from alembic.config import Config
+    from sqlalchemy import inspect
+    from .db import engine
+    config = Config(str(ALEMBIC_INI))
+    tables = inspect(engine).get_table_names()
+    if "alembic_version" not in tables and "users" in tables:
+        # Database created by the app at startup before migrations existed, it matches the initial revision
+        command.stamp(config, "0001")
+    command.upgrade(config, args.revision)
+
+# Bulk catalogue import: python -m Backend.cli import-catalogue albums albums.csv
+def import_catalogue_command(args):
+    from .db.db import SessionLocal
+    from .core.catalogue_import import import_catalogue
+    format = args.format or ("ndjson" if args.path.endswith((".ndjson", ".jsonl")) else "csv")
+    with open(args.path, "rb") as stream, SessionLocal() as session:
+        report = import_catalogue(session, args.kind, stream, format, args.batch_size)
+    print(json.dumps(report, indent=2))
+
+# Rebuild of the recommendation snapshot (e.g. from cron), running workers pick it up at their next rebuild check
+def build_recommendations_command(args):
+    from .db.db import SessionLocal
+    from .core.recommendations import build_snapshot, build_lock, SNAPSHOT_PATH
+    output = Path(args.output) if args.output else SNAPSHOT_PATH
+    with build_lock(output), SessionLocal() as session:
+        metadata = build_snapshot(session, output)
+    print(json.dumps(metadata, indent=2))
+
+# Recount of the genre browse aggregates from the tables, after manual data changes
+def recount_genre_stats_command(args):
+    from .db.db import SessionLocal
+    from .core.genre_stats import recount_genre_stats
+    with SessionLocal() as session:
+        recount_genre_stats(session)
+
+# Precompressed .zst/.br/.gz variants of the static files under images/, served instead of compressing per request
+def precompress_static_command(args):
+    from .core.images import IMAGES_DIR
+    from .core.compression import precompress_directory
+    print(json.dumps(precompress_directory(Path(args.directory) if args.directory else IMAGES_DIR), indent=2))
+
+# Background job workers without the API (run the API with JOB_WORKERS=0), stopped by SIGINT or SIGTERM
+def run_jobs_command(args):
+    import signal
+    import asyncio
+    # Importing the routes registers the job handlers
+    from .api import routes
+    from .core.jobs import job_queue
+    from .db.db import async_engine
+
+    async def run():
+        stop = asyncio.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            asyncio.get_running_loop().add_signal_handler(signum, stop.set)
+        job_queue.start(args.workers)
+        await stop.wait()
+        await job_queue.stop(settings.JOB_SHUTDOWN_SECONDS)
+        await async_engine.dispose()
+
+    asyncio.run(run())
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m Backend.cli", description="BetterSpotify management commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    init_parser = commands.add_parser("init-db", help="Create or upgrade the database schema (Alembic migrations)")
+    init_parser.add_argument("--revision", default="head")
+    init_parser.set_defaults(handler=init_db_command)
+
+    import_parser = commands.add_parser("import-catalogue", help="Bulk import genres, albums or songs from CSV/NDJSON")
+    import_parser.add_argument("kind", choices=["genres", "albums", "songs"])
+    import_parser.add_argument("path")
+    import_parser.add_argument("--format", choices=["csv", "ndjson"])
+    import_parser.add_argument("--batch-size", type=int, default=settings.IMPORT_BATCH_SIZE)
+    import_parser.set_defaults(handler=import_catalogue_command)
+
+    recommendations_parser = commands.add_parser("build-recommendations", help="Rebuild the song recommendation snapshot from songs_owned")
+    recommendations_parser.add_argument("--output", help=f"snapshot path (default {settings.RECOMMEND_SNAPSHOT_PATH})")
+    recommendations_parser.set_defaults(handler=build_recommendations_command)
+
+    recount_parser = commands.add_parser("recount-genre-stats", help="Recompute the genre song/album counts and per song owner counts")
+    recount_parser.set_defaults(handler=recount_genre_stats_command)
+
+    precompress_parser = commands.add_parser("precompress-static", help="Write precompressed variants of the compressible static files")
+    precompress_parser.add_argument("--directory", help="directory to walk (default Backend/images)")
+    precompress_parser.set_defaults(handler=precompress_static_command)
+
+    jobs_parser = commands.add_parser("run-jobs", help="Run background job workers (cascading deletes, image work) until interrupted")
+    jobs_parser.add_argument("--workers", type=int, default=max(settings.JOB_WORKERS, 1))
+    jobs_parser.set_defaults(handler=run_jobs_command)
+
+    args = parser.parse_args(argv)
+    args.handler(args)
+
+if __name__ == "__main__":
+    main()
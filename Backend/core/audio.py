@@ -0,0 +1,42 @@
+from pathlib import Path
+from fastapi import UploadFile
+from .config import settings
+from .storage import find_file, save_upload, remove_files
+
+AUDIO_DIR = Path(__file__).resolve().parent.parent / "audio" / "songs"
+
+def is_mpeg_frame(head: bytes) -> bool:
+    return len(head) > 1 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0
+
+def is_wave(head: bytes) -> bool:
+    return head[:4] == b"RIFF" and head[8:12] == b"WAVE"
+
+def is_mp4(head: bytes) -> bool:
+    return head[4:8] == b"ftyp"
+
+# Audio formats accepted on upload, detected from the file magic bytes
+AUDIO_SIGNATURES = {
+    b"ID3": ".mp3",
+    is_mpeg_frame: ".mp3",
+    b"fLaC": ".flac",
+    b"OggS": ".ogg",
+    is_wave: ".wav",
+    is_mp4: ".m4a",
+}
+AUDIO_EXTENSIONS = list(dict.fromkeys(AUDIO_SIGNATURES.values()))
+AUDIO_MEDIA_TYPES = {
+    ".mp3": "audio/mpeg",
+    ".flac": "audio/flac",
+    ".ogg": "audio/ogg",
+    ".wav": "audio/wav",
+    ".m4a": "audio/mp4",
+}
+
+def find_audio(song_id: int) -> Path | None:
+    return find_file(AUDIO_DIR, str(song_id), AUDIO_EXTENSIONS)
+
+async def save_audio_upload(file: UploadFile, song_id: int) -> Path:
+    return await save_upload(file, AUDIO_DIR, str(song_id), AUDIO_SIGNATURES, settings.AUDIO_UPLOAD_MAX_BYTES, "Invalid file content. Only MP3, FLAC, OGG, WAV and M4A audio is allowed.")
+
+async def remove_audio(song_id: int):
+    await remove_files(AUDIO_DIR, str(song_id), AUDIO_EXTENSIONS)
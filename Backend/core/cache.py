@@ -0,0 +1,83 @@
+import json
+from time import monotonic
+from collections import OrderedDict
+from .config import settings
+
+# In-process LRU backend with a per entry time to live
+class MemoryCacheBackend:
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+
+    async def get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires <= monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value):
+        self._entries[key] = (monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            self._entries.pop(key, None)
+
+# Redis compatible backend, works with redis.asyncio.Redis or any client exposing async get/set/delete
+class RedisCacheBackend:
+    def __init__(self, client, ttl: float, prefix: str = "catalogue:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    async def get(self, key: str):
+        value = await self.client.get(self.prefix + key)
+        return None if value is None else json.loads(value)
+
+    async def set(self, key: str, value):
+        await self.client.set(self.prefix + key, json.dumps(value), ex=int(self.ttl))
+
+    async def delete(self, *keys: str):
+        if keys:
+            await self.client.delete(*[self.prefix + key for key in keys])
+
+# Read-through cache, only found rows are stored so a miss always falls back to the database
+class ReadThroughCache:
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    async def get_or_load(self, key: str, loader):
+        value = await self.backend.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = await loader()
+        if value is not None:
+            await self.backend.set(key, value)
+        return value
+
+    async def invalidate(self, *keys: str):
+        await self.backend.delete(*keys)
+
+    def metrics(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses}
+
+def create_cache_backend():
+    if settings.CACHE_BACKEND == "redis":
+        # Optional dependency, only needed when the redis backend is selected
+        from redis.asyncio import Redis
+        return RedisCacheBackend(Redis.from_url(settings.CACHE_REDIS_URL), settings.CACHE_TTL_SECONDS)
+    return MemoryCacheBackend(settings.CACHE_SIZE, settings.CACHE_TTL_SECONDS)
+
+catalogue_cache = ReadThroughCache(create_cache_backend())
@@ -0,0 +1,175 @@
+import io
+import re
+import csv
+import json
+from time import perf_counter
+from itertools import islice, count
+from collections import Counter
+from sqlalchemy import select, insert
+from sqlalchemy.orm import Session
+from ..models import Album, Song, Genre, Song_stats
+from .search import search_index
+from .genre_stats import genre_count_changes, genre_count_recount, song_stats_insert
+
+# Columns read from every record of an import, per catalogue kind
+IMPORT_FIELDS = {
+    "genres": {"genre": str},
+    "albums": {"title": str, "description": str, "genre": int},
+    "songs": {"title": str, "description": str, "genre": int, "album_fk": int},
+}
+IMPORT_MODELS = {"genres": Genre, "albums": Album, "songs": Song}
+# Unique column used for duplicate detection and the insert conflict target
+IMPORT_UNIQUE = {"genres": "genre", "albums": "title", "songs": "title"}
+SEARCH_KINDS = {"albums": "album", "songs": "song"}
+GENRE_COUNT_COLUMNS = {"albums": "album_count", "songs": "song_count"}
+MAX_REPORTED_ERRORS = 1000
+# Undecodable bytes survive decoding as lone surrogates (surrogateescape), rejected per record
+INVALID_UTF8 = re.compile("[\udc80-\udcff]")
+
+class ImportReport:
+    def __init__(self):
+        self.rows = 0
+        self.inserted = 0
+        self.errors: list[dict] = []
+        self.error_count = 0
+        self.started = perf_counter()
+
+    def error(self, row: int, message: str):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row, "error": message})
+
+    def as_dict(self) -> dict:
+        elapsed = perf_counter() - self.started
+        return {
+            "rows": self.rows,
+            "inserted": self.inserted,
+            "failed": self.error_count,
+            "seconds": round(elapsed, 3),
+            "rows_per_second": round(self.rows / elapsed, 1) if elapsed else 0.0,
+            "errors": sorted(self.errors, key=lambda error: error["row"]),
+        }
+
+# Stream (row number, record) pairs from a binary file object without reading it whole. Bad bytes and
+# malformed CSV rows become errors of their own row, they never end the import halfway through
+def iter_records(stream, format: str):
+    text = io.TextIOWrapper(stream, encoding="utf-8", errors="surrogateescape", newline="")
+    if format == "csv":
+        reader = csv.DictReader(text)
+        for number in count(1):
+            try:
+                record = next(reader)
+            except StopIteration:
+                return
+            except csv.Error as error:
+                record = error
+            yield number, record
+    else:
+        for number, line in enumerate(text, start=1):
+            if line.strip():
+                try:
+                    yield number, json.loads(line)
+                except ValueError:
+                    yield number, None
+
+def coerce_record(kind: str, record) -> dict:
+    if isinstance(record, csv.Error):
+        raise ValueError(f"Malformed CSV row: {record}")
+    if not isinstance(record, dict):
+        raise ValueError("Malformed record")
+    values = {}
+    for name, cast in IMPORT_FIELDS[kind].items():
+        value = record.get(name)
+        if value is None or value == "":
+            raise ValueError(f"Missing field '{name}'")
+        if isinstance(value, str) and INVALID_UTF8.search(value):
+            raise ValueError(f"Invalid UTF-8 in '{name}'")
+        try:
+            values[name] = cast(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid value for '{name}'")
+    return values
+
+# INSERT that skips rows hitting a unique constraint (rows raced in by another writer)
+def insert_ignore(session: Session, model, *unique: str):
+    dialect = session.get_bind().dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        return dialect_insert(model).on_conflict_do_nothing(index_elements=list(unique))
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        return dialect_insert(model).on_conflict_do_nothing(index_elements=list(unique))
+    if dialect == "mysql":
+        return insert(model).prefix_with("IGNORE")
+    return insert(model)
+
+# Validate one batch with set based lookups and insert the valid rows with a single executemany
+def import_batch(session: Session, kind: str, batch: list, report: ImportReport):
+    model = IMPORT_MODELS[kind]
+    unique = IMPORT_UNIQUE[kind]
+    rows = []
+    for number, record in batch:
+        try:
+            rows.append((number, coerce_record(kind, record)))
+        except ValueError as error:
+            report.error(number, str(error))
+    keys = {values[unique] for _, values in rows}
+    existing = set(session.scalars(select(getattr(model, unique)).where(getattr(model, unique).in_(keys)))) if keys else set()
+    genres = {values["genre"] for _, values in rows if "genre" in IMPORT_FIELDS[kind] and kind != "genres"}
+    known_genres = set(session.scalars(select(Genre.id).where(Genre.id.in_(genres)))) if genres else set()
+    albums = {values["album_fk"] for _, values in rows if kind == "songs"}
+    known_albums = set(session.scalars(select(Album.id).where(Album.id.in_(albums)))) if albums else set()
+    valid = []
+    for number, values in rows:
+        if values[unique] in existing:
+            report.error(number, f"{unique.capitalize()} already exists")
+        elif kind != "genres" and values["genre"] not in known_genres:
+            report.error(number, "Invalid genre type")
+        elif kind == "songs" and values["album_fk"] not in known_albums:
+            report.error(number, "Album id not found")
+        else:
+            existing.add(values[unique])
+            valid.append(values)
+    if not valid:
+        return
+    statement = insert_ignore(session, model, unique)
+    inserted = None
+    if kind in SEARCH_KINDS and session.get_bind().dialect.insert_executemany_returning:
+        # Rows skipped by a conflict are not returned, counts and the search index see exactly the inserted ones
+        inserted = session.connection().execute(statement.returning(model.id, model.genre, model.title, model.description), valid).all()
+        report.inserted += len(inserted)
+    else:
+        # Core level executemany on the session connection (no ORM object per row)
+        result = session.connection().execute(statement, valid)
+        rowcount = result.rowcount if result.rowcount is not None and result.rowcount >= 0 else len(valid)
+        report.inserted += rowcount
+    # Browse aggregates of the imported rows, committed with them
+    if kind in GENRE_COUNT_COLUMNS:
+        column = GENRE_COUNT_COLUMNS[kind]
+        if inserted is not None:
+            statements = genre_count_changes(column, Counter(row.genre for row in inserted))
+        elif rowcount == len(valid):
+            statements = genre_count_changes(column, Counter(values["genre"] for values in valid))
+        else:
+            # Some rows lost a race to another writer and it is not known which, recount their genres
+            statements = [genre_count_recount(column, model, {values["genre"] for values in valid})]
+        for statement in statements:
+            session.execute(statement, execution_options={"synchronize_session": False})
+    if kind == "songs":
+        session.execute(song_stats_insert(Song.title.in_([values["title"] for values in valid]), Song.id.not_in(select(Song_stats.song_fk))))
+    session.commit()
+    if kind in SEARCH_KINDS:
+        if inserted is None:
+            # Inserted ids are not returned by this executemany, fetch them back by title for the search index
+            titles = [values["title"] for values in valid]
+            inserted = session.execute(select(model.id, model.title, model.description).where(model.title.in_(titles))).all()
+        for row in inserted:
+            search_index.add(SEARCH_KINDS[kind], row.id, row.title, row.description)
+
+def import_catalogue(session: Session, kind: str, stream, format: str, batch_size: int) -> dict:
+    report = ImportReport()
+    records = iter_records(stream, format)
+    while batch := list(islice(records, batch_size)):
+        report.rows += len(batch)
+        import_batch(session, kind, batch, report)
+    return report.as_dict()
@@ -0,0 +1,68 @@
+import asyncio
+import logging
+from datetime import timedelta
+from time import monotonic
+from sqlalchemy import select, insert, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..models import CatalogueEvent
+from ..db.db import AsyncSessionLocal
+from .cache import catalogue_cache
+from .search import search_index
+from .config import settings
+from .jobs import utcnow
+
+logger = logging.getLogger(__name__)
+
+SYNC_BATCH_SIZE = 1000
+
+# Songs and albums deleted (or detached from a deleted album) by background jobs, which run in whichever process
+# claimed the job (often python -m Backend.cli run-jobs). The job records the rows in catalogue_events in its
+# transaction, every API worker polls the table and drops them from its in-process cache (and deleted ones from its
+# search index), so no worker keeps serving them
+async def record_changes(db: AsyncSession, kind: str, row_ids, action: str):
+    now = utcnow()
+    rows = [{"kind": kind, "row_id": row_id, "action": action, "created_at": now} for row_id in row_ids]
+    if rows:
+        await db.execute(insert(CatalogueEvent), rows)
+
+class CatalogueSync:
+    def __init__(self, session_factory, poll_seconds: float, retention_hours: int):
+        self.session_factory = session_factory
+        self.poll_seconds = poll_seconds
+        self.retention_hours = retention_hours
+        self.last_id = 0
+        self._next_prune = 0.0
+
+    # Taken before the search index is loaded: deletions until then are in the tables the index comes from,
+    # the ones after are applied by poll() (removing a row twice is harmless)
+    async def start_position(self):
+        async with self.session_factory() as db:
+            self.last_id = await db.scalar(select(func.max(CatalogueEvent.id))) or 0
+
+    async def poll(self) -> int:
+        async with self.session_factory() as db:
+            events = (await db.execute(select(CatalogueEvent.id, CatalogueEvent.kind, CatalogueEvent.row_id, CatalogueEvent.action).where(CatalogueEvent.id > self.last_id).order_by(CatalogueEvent.id).limit(SYNC_BATCH_SIZE))).all()
+            if events:
+                # Cache keys are the kind and id (song_key, album_key)
+                await catalogue_cache.invalidate(*{f"{event.kind}:{event.row_id}" for event in events})
+                for event in events:
+                    if event.action == "deleted":
+                        search_index.remove(event.kind, event.row_id)
+                self.last_id = events[-1].id
+            # Events older than the retention are pruned by any worker, at most once a minute
+            if monotonic() >= self._next_prune:
+                self._next_prune = monotonic() + 60
+                await db.execute(delete(CatalogueEvent).where(CatalogueEvent.created_at < utcnow() - timedelta(hours=self.retention_hours)), execution_options={"synchronize_session": False})
+                await db.commit()
+        return len(events)
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            try:
+                while await self.poll() == SYNC_BATCH_SIZE:
+                    pass
+            except Exception:
+                logger.exception("Catalogue sync failed")
+
+catalogue_sync = CatalogueSync(AsyncSessionLocal, settings.CATALOGUE_SYNC_SECONDS, settings.CATALOGUE_EVENT_RETENTION_HOURS)
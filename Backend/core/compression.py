@@ -0,0 +1,202 @@
+import zlib
+from pathlib import Path
+from .config import settings
+
+# File suffix of the precompressed variant written next to a static file, per content coding
+ENCODING_SUFFIXES = {"zstd": ".zst", "br": ".br", "gzip": ".gz"}
+# Variants that do not save at least this fraction (JPEG, PNG, WebP) are not kept
+MIN_PRECOMPRESSED_SAVING = 0.05
+# Already compressed media, never compressed again
+INCOMPRESSIBLE_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp", ".gif", ".mp3", ".ogg", ".flac", ".wav", ".m4a"}
+
+# Streaming compressor of one response: compress() returns the bytes ready for this chunk,
+# finish() the trailer. Chunks are flushed so streamed lines reach the client without waiting
+class GzipEncoder:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, flush: bool) -> bytes:
+        chunk = self._compressor.compress(data)
+        return chunk + self._compressor.flush(zlib.Z_SYNC_FLUSH) if flush else chunk
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zlib.Z_FINISH)
+
+class BrotliEncoder:
+    def __init__(self, quality: int):
+        import brotli
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes, flush: bool) -> bytes:
+        chunk = self._compressor.process(data)
+        return chunk + self._compressor.flush() if flush else chunk
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+class ZstdEncoder:
+    def __init__(self, level: int):
+        import zstandard
+        self._zstandard = zstandard
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes, flush: bool) -> bytes:
+        chunk = self._compressor.compress(data)
+        return chunk + self._compressor.flush(self._zstandard.COMPRESSOBJ_FLUSH_BLOCK) if flush else chunk
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+# Content codings this process can produce, in server preference order. brotli and zstandard are
+# optional dependencies, their codings are only offered when the package is installed
+def available_encoders(names: str) -> dict:
+    factories = {
+        "gzip": lambda: GzipEncoder(settings.COMPRESSION_GZIP_LEVEL),
+        "br": lambda: BrotliEncoder(settings.COMPRESSION_BROTLI_QUALITY),
+        "zstd": lambda: ZstdEncoder(settings.COMPRESSION_ZSTD_LEVEL),
+    }
+    encoders = {}
+    for name in filter(None, (part.strip() for part in names.split(","))):
+        try:
+            factories[name]()
+        except (KeyError, ImportError):
+            continue
+        encoders[name] = factories[name]
+    return encoders
+
+# Accept-Encoding with q-values: the first server preferred coding the client accepts, None for identity
+def negotiate_encoding(accept_encoding: str | None, supported) -> str | None:
+    if not accept_encoding:
+        return None
+    weights = {}
+    for part in accept_encoding.split(","):
+        name, _, parameters = part.strip().partition(";")
+        weight = 1.0
+        parameters = parameters.strip()
+        if parameters.startswith("q="):
+            try:
+                weight = float(parameters[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name.strip().lower()] = weight
+    for name in supported:
+        if weights.get(name, weights.get("*", 0.0)) > 0:
+            return name
+    return None
+
+def is_compressible(content_type: str, allowed: tuple[str, ...]) -> bool:
+    return content_type.split(";")[0].strip().lower().startswith(allowed)
+
+# Pure ASGI middleware: negotiated compression of allowlisted content types above the size threshold.
+# Whole bodies are compressed at once, streamed bodies (NDJSON) chunk by chunk. Responses that are already
+# encoded, ranges, 204/304 and file sends (pathsend) pass through untouched
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = settings.COMPRESSION_MIN_SIZE, content_types: str = settings.COMPRESSION_TYPES, encodings: str = settings.COMPRESSION_ENCODINGS):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.content_types = tuple(filter(None, (part.strip().lower() for part in content_types.split(","))))
+        self.encoders = available_encoders(encodings)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            return await self.app(scope, receive, send)
+        accept_encoding = next((value.decode("latin-1") for key, value in scope["headers"] if key == b"accept-encoding"), None)
+        encoding = negotiate_encoding(accept_encoding, self.encoders)
+        if encoding is None:
+            return await self.app(scope, receive, send)
+        start_message = None
+        encoder = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, encoder, passthrough
+            if passthrough:
+                return await send(message)
+            if message["type"] == "http.response.start":
+                headers = {key.lower(): value for key, value in message.get("headers", [])}
+                content_type = headers.get(b"content-type", b"").decode("latin-1")
+                if (message["status"] in (204, 206, 304) or b"content-encoding" in headers or b"content-range" in headers
+                        or not is_compressible(content_type, self.content_types)
+                        or int(headers.get(b"content-length", self.minimum_size)) < self.minimum_size):
+                    passthrough = True
+                    return await send(message)
+                # Held until the first body message tells whether the body is complete or streamed
+                start_message = message
+                return
+            if message["type"] != "http.response.body":
+                # pathsend and other extensions: the file goes out as is
+                passthrough = True
+                await send(start_message)
+                return await send(message)
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if encoder is None:
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start_message)
+                    return await send(message)
+                encoder = self.encoders[encoding]()
+                headers = [(key, value) for key, value in start_message.get("headers", []) if key.lower() not in (b"content-length", b"etag", b"vary")]
+                etag = next((value for key, value in start_message.get("headers", []) if key.lower() == b"etag"), None)
+                if etag is not None:
+                    # The encoded body is a different representation, a strong validator becomes weak
+                    headers.append((b"etag", etag if etag.startswith(b"W/") else b"W/" + etag))
+                vary = next((value for key, value in start_message.get("headers", []) if key.lower() == b"vary"), None)
+                headers.append((b"vary", vary + b", Accept-Encoding" if vary else b"Accept-Encoding"))
+                headers.append((b"content-encoding", encoding.encode()))
+                if not more_body:
+                    compressed = encoder.compress(body, False) + encoder.finish()
+                    headers.append((b"content-length", str(len(compressed)).encode()))
+                    await send({**start_message, "headers": headers})
+                    return await send({"type": "http.response.body", "body": compressed, "more_body": False})
+                await send({**start_message, "headers": headers})
+            if more_body:
+                chunk = encoder.compress(body, True)
+                if chunk:
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            else:
+                await send({"type": "http.response.body", "body": encoder.compress(body, False) + encoder.finish(), "more_body": False})
+
+        await self.app(scope, receive, send_compressed)
+
+# Precompressed variant of a static file (written by python -m Backend.cli precompress-static) for the
+# negotiated coding, only when it is at least as new as the file itself
+def precompressed_variant(path: Path, stat_result, accept_encoding: str | None, stat) -> tuple[Path, object, str] | None:
+    if path.suffix.lower() in INCOMPRESSIBLE_SUFFIXES or not accept_encoding:
+        return None
+    candidates = {}
+    for encoding, suffix in ENCODING_SUFFIXES.items():
+        variant = path.with_name(path.name + suffix)
+        variant_stat = stat(variant)
+        if variant_stat is not None and variant_stat.st_mtime_ns >= stat_result.st_mtime_ns:
+            candidates[encoding] = (variant, variant_stat)
+    encoding = negotiate_encoding(accept_encoding, candidates)
+    if encoding is None:
+        return None
+    return (*candidates[encoding], encoding)
+
+# Writes the .zst/.br/.gz variants of the compressible static files under the directory at maximum levels
+# (done once, served many times), variants that do not save enough are removed
+def precompress_directory(directory: Path) -> dict:
+    report = {"files": 0, "variants": 0, "skipped": 0}
+    writers = {
+        "gzip": lambda data: zlib.compress(data, 9, 31),
+        "br": lambda data: __import__("brotli").compress(data, quality=11),
+        "zstd": lambda data: __import__("zstandard").ZstdCompressor(level=19).compress(data),
+    }
+    encoders = available_encoders(settings.COMPRESSION_ENCODINGS)
+    for path in sorted(directory.rglob("*")):
+        if not path.is_file() or path.suffix in ENCODING_SUFFIXES.values() or path.suffix.lower() in INCOMPRESSIBLE_SUFFIXES or path.name.startswith("."):
+            continue
+        report["files"] += 1
+        data = path.read_bytes()
+        for encoding, suffix in ENCODING_SUFFIXES.items():
+            variant = path.with_name(path.name + suffix)
+            compressed = writers[encoding](data) if encoding in encoders else None
+            if compressed is None or len(compressed) > len(data) * (1 - MIN_PRECOMPRESSED_SAVING):
+                variant.unlink(missing_ok=True)
+                report["skipped"] += 1
+                continue
+            variant.write_bytes(compressed)
+            report["variants"] += 1
+    return report
@@ -1,25 +1,137 @@
+import os
+
 DATABASES = {
     "MySQL": "mysql+pymysql",
-    "SQLite": "SQLite",
+    "SQLite": "sqlite",
     "Postgresql": "postgresql",
     "Oracle": "oracle+oracledb",
     "Microsoft SQL": "mssql+pyodbc"
 }
 
-SELECTED_DB = "MySQL"
-DB_USER = "API_ADMIN"
-DB_PASSWORD = "password123"
-DB_HOST = "localhost"
-DB_PORT = "3306"
-DB_NAME = "TEST_API"
+# Async drivers used by the AsyncSession engine
+ASYNC_DATABASES = {
+    "MySQL": "mysql+aiomysql",
+    "SQLite": "sqlite+aiosqlite",
+    "Postgresql": "postgresql+asyncpg",
+    "Oracle": "oracle+oracledb_async",
+    "Microsoft SQL": "mssql+aioodbc"
+}
+
+# Every setting can be overridden with an environment variable of the same name
+def env_str(name: str, default: str) -> str:
+    return os.getenv(name, default)
+
+def env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, default))
+
+def env_bool(name: str, default: bool) -> bool:
+    return os.getenv(name, str(default)).lower() in ("1", "true", "yes", "on")
+
+SELECTED_DB = env_str("SELECTED_DB", "MySQL")
+DB_USER = env_str("DB_USER", "API_ADMIN")
+DB_PASSWORD = env_str("DB_PASSWORD", "password123")
+DB_HOST = env_str("DB_HOST", "localhost")
+DB_PORT = env_str("DB_PORT", "3306")
+DB_NAME = env_str("DB_NAME", "TEST_API")
+DB_SQLITE_PATH = env_str("DB_SQLITE_PATH", "database.db")
+# Optional read replica host (same credentials and database name), empty disables routing
+DB_REPLICA_HOST = env_str("DB_REPLICA_HOST", "")
+DB_REPLICA_PORT = env_str("DB_REPLICA_PORT", DB_PORT)
+
+def database_url(drivers: dict, host: str, port: str) -> str:
+    if SELECTED_DB == "SQLite":
+        return f"{drivers['SQLite']}:///{DB_SQLITE_PATH}"
+    return f"{drivers.get(SELECTED_DB)}://{DB_USER}:{DB_PASSWORD}@{host}:{port}/{DB_NAME}"
 
 class Settings:
-    if DATABASES == "SQLite":
-        DATABASE_URL: str = "sqlite:///database.db"
+    DATABASE_URL: str = database_url(DATABASES, DB_HOST, DB_PORT)
+    ASYNC_DATABASE_URL: str = database_url(ASYNC_DATABASES, DB_HOST, DB_PORT)
+    # SQLite has no replicas, reads stay on the primary file
+    if DB_REPLICA_HOST and SELECTED_DB != "SQLite":
+        ASYNC_READ_DATABASE_URL: str = database_url(ASYNC_DATABASES, DB_REPLICA_HOST, DB_REPLICA_PORT)
     else:
-        DATABASE_URL: str = f"{DATABASES.get(SELECTED_DB)}://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-    SECRET_KEY: str = "default_secret_key"
-    ALGORITHM: str = "HS256"
-    ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+        ASYNC_READ_DATABASE_URL: str = ""
+    DB_POOL_SIZE: int = env_int("DB_POOL_SIZE", 5)
+    DB_MAX_OVERFLOW: int = env_int("DB_MAX_OVERFLOW", 10)
+    DB_POOL_TIMEOUT: int = env_int("DB_POOL_TIMEOUT", 30)
+    DB_POOL_RECYCLE: int = env_int("DB_POOL_RECYCLE", 3600)
+    DB_POOL_PRE_PING: bool = env_bool("DB_POOL_PRE_PING", True)
+    DB_STATEMENT_TIMEOUT_MS: int = env_int("DB_STATEMENT_TIMEOUT_MS", 0)
+    DB_POOL_WARMUP: int = env_int("DB_POOL_WARMUP", 2)
+    SECRET_KEY: str = env_str("SECRET_KEY", "default_secret_key")
+    ALGORITHM: str = env_str("ALGORITHM", "HS256")
+    ACCESS_TOKEN_EXPIRE_MINUTES: int = env_int("ACCESS_TOKEN_EXPIRE_MINUTES", 30)
+    PASSWORD_HASH_WORKERS: int = env_int("PASSWORD_HASH_WORKERS", 4)
+    PASSWORD_HASH_QUEUE_LIMIT: int = env_int("PASSWORD_HASH_QUEUE_LIMIT", 64)
+    TOKEN_CACHE_SIZE: int = env_int("TOKEN_CACHE_SIZE", 10000)
+    CACHE_BACKEND: str = env_str("CACHE_BACKEND", "memory")
+    CACHE_REDIS_URL: str = env_str("CACHE_REDIS_URL", "redis://localhost:6379/0")
+    CACHE_SIZE: int = env_int("CACHE_SIZE", 50000)
+    CACHE_TTL_SECONDS: int = env_int("CACHE_TTL_SECONDS", 300)
+    UPLOAD_CHUNK_SIZE: int = env_int("UPLOAD_CHUNK_SIZE", 64 * 1024)
+    IMAGE_UPLOAD_MAX_BYTES: int = env_int("IMAGE_UPLOAD_MAX_BYTES", 10 * 1024 * 1024)
+    IMAGE_DERIVATIVE_SIZES: str = env_str("IMAGE_DERIVATIVE_SIZES", "64,256,512")
+    IMAGE_WORKERS: int = env_int("IMAGE_WORKERS", 2)
+    MEDIA_STAT_CACHE_SECONDS: int = env_int("MEDIA_STAT_CACHE_SECONDS", 2)
+    CACHE_CONTROL_IMAGES: str = env_str("CACHE_CONTROL_IMAGES", "private, max-age=86400")
+    CACHE_CONTROL_CATALOGUE: str = env_str("CACHE_CONTROL_CATALOGUE", "private, max-age=60")
+    AUDIO_UPLOAD_MAX_BYTES: int = env_int("AUDIO_UPLOAD_MAX_BYTES", 200 * 1024 * 1024)
+    AUDIO_STREAM_CHUNK_SIZE: int = env_int("AUDIO_STREAM_CHUNK_SIZE", 256 * 1024)
+    CACHE_CONTROL_AUDIO: str = env_str("CACHE_CONTROL_AUDIO", "private, max-age=86400")
+    IMPORT_BATCH_SIZE: int = env_int("IMPORT_BATCH_SIZE", 1000)
+    IMPORT_UPLOAD_MAX_BYTES: int = env_int("IMPORT_UPLOAD_MAX_BYTES", 1024 * 1024 * 1024)
+    REQUEST_MAX_BYTES: int = env_int("REQUEST_MAX_BYTES", 1024 * 1024)
+    SEARCH_SNAPSHOT_PATH: str = env_str("SEARCH_SNAPSHOT_PATH", "search_index.snapshot")
+    SEARCH_BUILD_CHUNK_SIZE: int = env_int("SEARCH_BUILD_CHUNK_SIZE", 5000)
+    RECOMMEND_SNAPSHOT_PATH: str = env_str("RECOMMEND_SNAPSHOT_PATH", "recommendations.snapshot")
+    RECOMMEND_NEIGHBORS: int = env_int("RECOMMEND_NEIGHBORS", 50)
+    RECOMMEND_MAX_USER_SONGS: int = env_int("RECOMMEND_MAX_USER_SONGS", 500)
+    RECOMMEND_SEED_SONGS: int = env_int("RECOMMEND_SEED_SONGS", 200)
+    RECOMMEND_BLOCK_SIZE: int = env_int("RECOMMEND_BLOCK_SIZE", 20000)
+    RECOMMEND_BUILD_CHUNK_SIZE: int = env_int("RECOMMEND_BUILD_CHUNK_SIZE", 100000)
+    RECOMMEND_REFRESH_SECONDS: int = env_int("RECOMMEND_REFRESH_SECONDS", 60)
+    RECOMMEND_REBUILD_SECONDS: int = env_int("RECOMMEND_REBUILD_SECONDS", 3600)
+    RATE_LIMIT_ENABLED: bool = env_bool("RATE_LIMIT_ENABLED", True)
+    RATE_LIMIT_BACKEND: str = env_str("RATE_LIMIT_BACKEND", "memory")
+    RATE_LIMIT_REDIS_URL: str = env_str("RATE_LIMIT_REDIS_URL", "redis://localhost:6379/0")
+    RATE_LIMIT_MAX_KEYS: int = env_int("RATE_LIMIT_MAX_KEYS", 100000)
+    RATE_LIMIT_GROUPS: str = env_str("RATE_LIMIT_GROUPS", "auth:5:20,search:20:40")
+    RATE_LIMIT_TRUST_FORWARDED: bool = env_bool("RATE_LIMIT_TRUST_FORWARDED", False)
+    LOGIN_IP_LIMIT: int = env_int("LOGIN_IP_LIMIT", 30)
+    LOGIN_IP_WINDOW_SECONDS: int = env_int("LOGIN_IP_WINDOW_SECONDS", 60)
+    LOGIN_USERNAME_FAILURE_LIMIT: int = env_int("LOGIN_USERNAME_FAILURE_LIMIT", 10)
+    LOGIN_USERNAME_WINDOW_SECONDS: int = env_int("LOGIN_USERNAME_WINDOW_SECONDS", 300)
+    LOGIN_ACCOUNT_FAILURE_LIMIT: int = env_int("LOGIN_ACCOUNT_FAILURE_LIMIT", 100)
+    LOGIN_ACCOUNT_WINDOW_SECONDS: int = env_int("LOGIN_ACCOUNT_WINDOW_SECONDS", 900)
+    COMPRESSION_ENABLED: bool = env_bool("COMPRESSION_ENABLED", True)
+    COMPRESSION_MIN_SIZE: int = env_int("COMPRESSION_MIN_SIZE", 1024)
+    COMPRESSION_TYPES: str = env_str("COMPRESSION_TYPES", "application/json,application/x-ndjson,text/,image/svg+xml")
+    COMPRESSION_ENCODINGS: str = env_str("COMPRESSION_ENCODINGS", "zstd,br,gzip")
+    COMPRESSION_GZIP_LEVEL: int = env_int("COMPRESSION_GZIP_LEVEL", 6)
+    COMPRESSION_BROTLI_QUALITY: int = env_int("COMPRESSION_BROTLI_QUALITY", 4)
+    COMPRESSION_ZSTD_LEVEL: int = env_int("COMPRESSION_ZSTD_LEVEL", 3)
+    JOB_WORKERS: int = env_int("JOB_WORKERS", 2)
+    JOB_POLL_SECONDS: int = env_int("JOB_POLL_SECONDS", 1)
+    JOB_LEASE_SECONDS: int = env_int("JOB_LEASE_SECONDS", 300)
+    JOB_MAX_ATTEMPTS: int = env_int("JOB_MAX_ATTEMPTS", 5)
+    JOB_RETRY_BASE_SECONDS: int = env_int("JOB_RETRY_BASE_SECONDS", 2)
+    JOB_RETRY_MAX_SECONDS: int = env_int("JOB_RETRY_MAX_SECONDS", 600)
+    JOB_BATCH_SIZE: int = env_int("JOB_BATCH_SIZE", 1000)
+    JOB_SHUTDOWN_SECONDS: int = env_int("JOB_SHUTDOWN_SECONDS", 10)
+    JOB_RETENTION_HOURS: int = env_int("JOB_RETENTION_HOURS", 24)
+    CATALOGUE_SYNC_SECONDS: int = env_int("CATALOGUE_SYNC_SECONDS", 1)
+    CATALOGUE_EVENT_RETENTION_HOURS: int = env_int("CATALOGUE_EVENT_RETENTION_HOURS", 24)
+    METRICS_ENABLED: bool = env_bool("METRICS_ENABLED", True)
+    METRICS_SLOW_QUERY_MS: int = env_int("METRICS_SLOW_QUERY_MS", 200)
+    METRICS_N_PLUS_ONE_THRESHOLD: int = env_int("METRICS_N_PLUS_ONE_THRESHOLD", 20)
+    METRICS_TOKEN: str = env_str("METRICS_TOKEN", "")
+    METRICS_REFRESH_SECONDS: int = env_int("METRICS_REFRESH_SECONDS", 15)
+    PROFILING_ENABLED: bool = env_bool("PROFILING_ENABLED", False)
+    PROFILE_SAMPLE_EVERY: int = env_int("PROFILE_SAMPLE_EVERY", 100)
+    PROFILE_INTERVAL_MS: int = env_int("PROFILE_INTERVAL_MS", 5)
+    PROFILE_SLOWEST_PER_ROUTE: int = env_int("PROFILE_SLOWEST_PER_ROUTE", 10)
+    PROFILE_KEEP_REQUESTED: int = env_int("PROFILE_KEEP_REQUESTED", 50)
+    PROFILE_MAX_ACTIVE: int = env_int("PROFILE_MAX_ACTIVE", 4)
+    PROFILE_SQL_LIMIT: int = env_int("PROFILE_SQL_LIMIT", 500)
 
-settings = Settings()
\ No newline at end of file
+settings = Settings()
@@ -0,0 +1,53 @@
+from collections import Counter
+from sqlalchemy import select, update, insert, delete, func, literal
+from sqlalchemy.orm import Session
+from ..models import Genre, Song, Album, Songs_owned, Song_stats
+
+# Browse aggregates: genres.song_count/album_count and song_stats.owner_count are adjusted by the writes
+# that change them, inside the same transaction, so genre pages never count rows at request time.
+# Every song has a song_stats row, created with the song and removed with it
+
+def genre_count_changes(column: str, changes: Counter) -> list:
+    return [update(Genre).where(Genre.id == genre_id).values({column: getattr(Genre, column) + delta}) for genre_id, delta in changes.items() if genre_id is not None and delta]
+
+# Counts of the given genres recomputed from the table, when the rows a write added are not known exactly
+def genre_count_recount(column: str, model, genre_ids):
+    counts = select(func.count(model.id)).where(model.genre == Genre.id).scalar_subquery()
+    return update(Genre).where(Genre.id.in_(genre_ids)).values({column: counts})
+
+def owner_count_change(song_ids, delta: int):
+    return update(Song_stats).where(Song_stats.song_fk.in_(song_ids)).values(owner_count=Song_stats.owner_count + delta)
+
+# Without RETURNING the changed rows are not known after the write: these single UPDATEs select them in the
+# database and run before the write, in its transaction (no read-then-write window)
+def genre_count_change_of(column: str, model, row_id: int, delta: int):
+    genre = select(model.genre).where(model.id == row_id).scalar_subquery()
+    return update(Genre).where(Genre.id == genre).values({column: getattr(Genre, column) + delta})
+
+def owner_count_change_of(delta: int, *criteria):
+    owned = select(Songs_owned.song_fk).where(*criteria)
+    return update(Song_stats).where(Song_stats.song_fk.in_(owned)).values(owner_count=Song_stats.owner_count + delta)
+
+# song_stats rows of newly inserted songs, selected back by the given criteria (id or unique titles)
+def song_stats_insert(*criteria):
+    return insert(Song_stats).from_select(["song_fk", "genre", "owner_count"], select(Song.id, Song.genre, literal(0)).where(*criteria))
+
+def song_genre_change(song_id: int, genre_id: int):
+    return update(Song_stats).where(Song_stats.song_fk == song_id).values(genre=genre_id)
+
+def song_stats_delete(song_id: int):
+    return delete(Song_stats).where(Song_stats.song_fk == song_id)
+
+async def apply_changes(db, statements: list):
+    for statement in statements:
+        await db.execute(statement, execution_options={"synchronize_session": False})
+
+# Full recount from the tables, for seeded or repaired databases (python -m Backend.cli recount-genre-stats)
+def recount_genre_stats(session: Session):
+    song_counts = select(func.count(Song.id)).where(Song.genre == Genre.id).scalar_subquery()
+    album_counts = select(func.count(Album.id)).where(Album.genre == Genre.id).scalar_subquery()
+    session.execute(update(Genre).values(song_count=song_counts, album_count=album_counts), execution_options={"synchronize_session": False})
+    session.execute(delete(Song_stats))
+    owners = select(func.count(Songs_owned.id)).where(Songs_owned.song_fk == Song.id).scalar_subquery()
+    session.execute(insert(Song_stats).from_select(["song_fk", "genre", "owner_count"], select(Song.id, Song.genre, owners)))
+    session.commit()
@@ -0,0 +1,58 @@
+import asyncio
+from time import perf_counter
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+from .config import settings
+from .metrics import password_hash_duration
+
+# Password hashing context
+bcrypt_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+# Runs bcrypt off the event loop on a bounded thread pool (bcrypt releases the GIL)
+class PasswordHasher:
+    def __init__(self, max_workers: int, queue_limit: int):
+        self.max_workers = max_workers
+        self.queue_limit = queue_limit
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bcrypt")
+        self._pending = 0
+        self._calls = 0
+        self._rejected = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+
+    async def hash(self, password: str) -> str:
+        return await self._submit(bcrypt_context.hash, password)
+
+    async def verify(self, password: str, password_hash: str) -> bool:
+        return await self._submit(bcrypt_context.verify, password, password_hash)
+
+    async def _submit(self, func, *args):
+        # Fail fast instead of queueing unbounded bcrypt work
+        if self._pending >= self.queue_limit:
+            self._rejected += 1
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Server busy, try again later", headers={"Retry-After": "1"})
+        self._pending += 1
+        start = perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            elapsed = perf_counter() - start
+            password_hash_duration.observe(elapsed)
+            self._pending -= 1
+            self._calls += 1
+            self._latency_total += elapsed
+            self._latency_max = max(self._latency_max, elapsed)
+
+    def metrics(self) -> dict:
+        return {
+            "queue_depth": self._pending,
+            "queue_limit": self.queue_limit,
+            "workers": self.max_workers,
+            "calls": self._calls,
+            "rejected": self._rejected,
+            "latency_avg_seconds": self._latency_total / self._calls if self._calls else 0.0,
+            "latency_max_seconds": self._latency_max,
+        }
+
+password_hasher = PasswordHasher(settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_QUEUE_LIMIT)
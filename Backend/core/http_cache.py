@@ -0,0 +1,62 @@
+import os
+import json
+import mimetypes
+import hashlib
+from pathlib import Path
+from email.utils import formatdate, parsedate_to_datetime
+from fastapi import Request, Response, status
+from fastapi.responses import FileResponse
+from .storage import stat_cache
+from .compression import precompressed_variant
+
+# Strong validator of a file, changes whenever the file is replaced or rewritten
+def file_etag(stat_result: os.stat_result) -> str:
+    return f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+
+# Strong validator of a serialized row
+def row_etag(row: dict) -> str:
+    return '"' + hashlib.sha1(json.dumps(row, sort_keys=True, default=str).encode()).hexdigest() + '"'
+
+def is_not_modified(request: Request, etag: str, last_modified: float | None = None) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match takes precedence over If-Modified-Since
+        # Weak comparison, compressed responses carry the weak form of the validator
+        return if_none_match.strip() == "*" or etag.removeprefix("W/") in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            return int(last_modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def not_modified_response(headers: dict) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+# FileResponse with validators, answered with 304 from the stat result alone when the client copy is current.
+# A fresh precompressed sibling (.zst/.br/.gz) is sent as is when the client accepts its coding
+def cached_file_response(request: Request, path: Path, stat_result: os.stat_result, cache_control: str, headers: dict | None = None) -> Response:
+    headers = {**(headers or {}), "ETag": file_etag(stat_result), "Last-Modified": formatdate(stat_result.st_mtime, usegmt=True), "Cache-Control": cache_control}
+    variant = precompressed_variant(path, stat_result, request.headers.get("accept-encoding"), stat_cache.stat)
+    if variant is not None:
+        variant_path, variant_stat, encoding = variant
+        vary = headers.get("Vary")
+        headers.update({"ETag": headers["ETag"][:-1] + f'-{encoding}"', "Content-Encoding": encoding, "Vary": f"{vary}, Accept-Encoding" if vary else "Accept-Encoding"})
+    if is_not_modified(request, headers["ETag"], stat_result.st_mtime):
+        return not_modified_response(headers)
+    if variant is not None:
+        # Media type of the original file, the body is the encoded variant
+        return FileResponse(variant_path, stat_result=variant_stat, headers=headers, media_type=mimetypes.guess_type(path.name)[0] or "application/octet-stream")
+    return FileResponse(path, stat_result=stat_result, headers=headers)
+
+# Seekable file response: conditional GET answered from the stat result, Range and If-Range are handled by
+# FileResponse (206, multipart for several ranges, 416 outside the file). Ranges are read in chunk_size pieces in the
+# threadpool, the whole file goes through pathsend when the server supports it
+def range_file_response(request: Request, path: Path, stat_result: os.stat_result, media_type: str, cache_control: str, chunk_size: int) -> Response:
+    headers = {"ETag": file_etag(stat_result), "Last-Modified": formatdate(stat_result.st_mtime, usegmt=True), "Cache-Control": cache_control}
+    if "range" not in request.headers and is_not_modified(request, headers["ETag"], stat_result.st_mtime):
+        return not_modified_response({**headers, "Accept-Ranges": "bytes"})
+    response = FileResponse(path, stat_result=stat_result, headers=headers, media_type=media_type)
+    response.chunk_size = chunk_size
+    return response
@@ -0,0 +1,111 @@
+import os
+import asyncio
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import UploadFile
+from .config import settings
+from .storage import stat_cache, sniff_file_type, find_file, save_upload, remove_files
+from .jobs import enqueue, job_handler
+
+IMAGES_DIR = Path(__file__).resolve().parent.parent / "images"
+
+# Image formats accepted on upload, detected from the file magic bytes
+IMAGE_SIGNATURES = {
+    b"\xff\xd8\xff": ".jpg",
+    b"\x89PNG\r\n\x1a\n": ".png",
+}
+IMAGE_EXTENSIONS = list(dict.fromkeys(IMAGE_SIGNATURES.values()))
+
+def sniff_image_type(head: bytes) -> str | None:
+    return sniff_file_type(head, IMAGE_SIGNATURES)
+
+# Stored image of a record (any accepted extension) or the directory default.jpg
+def find_image(directory: Path, name: str) -> Path:
+    return find_file(directory, name, IMAGE_EXTENSIONS) or directory / "default.jpg"
+
+async def save_image_upload(file: UploadFile, directory: Path, name: str) -> Path:
+    return await save_upload(file, directory, name, IMAGE_SIGNATURES, settings.IMAGE_UPLOAD_MAX_BYTES, "Invalid file content. Only JPEG and PNG images are allowed.")
+
+# Precomputed derivatives (resized JPEG and WebP variants) kept next to the originals
+DERIVATIVE_SIZES = sorted(int(size) for size in settings.IMAGE_DERIVATIVE_SIZES.split(","))
+DERIVATIVE_FORMATS = {".jpg": "JPEG", ".webp": "WEBP"}
+DERIVATIVES_DIR = "derived"
+
+# Resizing and encoding run on a dedicated pool, Pillow releases the GIL while doing it
+image_executor = ThreadPoolExecutor(max_workers=settings.IMAGE_WORKERS, thread_name_prefix="images")
+
+def closest_size(size: int) -> int:
+    for candidate in DERIVATIVE_SIZES:
+        if candidate >= size:
+            return candidate
+    return DERIVATIVE_SIZES[-1]
+
+def derivative_path(source: Path, size: int, extension: str) -> Path:
+    return source.parent / DERIVATIVES_DIR / f"{source.stem}_{size}{extension}"
+
+def is_fresh(derived: Path, source: Path) -> bool:
+    derived_stat = stat_cache.stat(derived)
+    source_stat = stat_cache.stat(source)
+    return derived_stat is not None and source_stat is not None and derived_stat.st_mtime >= source_stat.st_mtime
+
+# Resize and encode one variant, written through a temp file and renamed into place
+def render_derivative(source: Path, size: int, extension: str) -> Path:
+    # Pillow is imported on first use, workers that never resize do not pay for it at startup
+    from PIL import Image
+    derived = derivative_path(source, size, extension)
+    derived.parent.mkdir(exist_ok=True)
+    with Image.open(source) as image:
+        image.thumbnail((size, size))
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        with NamedTemporaryFile(dir=derived.parent, prefix=f".{derived.name}.", suffix=".tmp", delete=False) as temp:
+            image.save(temp, DERIVATIVE_FORMATS[extension], quality=85)
+    os.replace(temp.name, derived)
+    stat_cache.invalidate(derived)
+    return derived
+
+def render_all_derivatives(source: Path):
+    for size in DERIVATIVE_SIZES:
+        for extension in DERIVATIVE_FORMATS:
+            render_derivative(source, size, extension)
+
+def remove_derivatives(source: Path):
+    for derived in (source.parent / DERIVATIVES_DIR).glob(f"{source.stem}_*"):
+        derived.unlink(missing_ok=True)
+        stat_cache.invalidate(derived)
+
+# Remove the variants of a replaced image and queue the generation of the new ones, one job per upload
+# (the file modification time is part of the key), committed with the caller's transaction
+async def schedule_derivatives(db, source: Path):
+    await asyncio.get_running_loop().run_in_executor(image_executor, remove_derivatives, source)
+    relative = source.relative_to(IMAGES_DIR).as_posix()
+    await enqueue(db, "render_image_derivatives", {"path": relative}, f"derivatives:{relative}:{source.stat().st_mtime_ns}")
+
+@job_handler("render_image_derivatives")
+async def render_image_derivatives_job(db, payload: dict):
+    source = IMAGES_DIR / payload["path"]
+    if stat_cache.stat(source) is not None:
+        await asyncio.get_running_loop().run_in_executor(image_executor, render_all_derivatives, source)
+
+# Stored images of a deleted record and their derivatives
+@job_handler("remove_images")
+async def remove_images_job(db, payload: dict):
+    directory = IMAGES_DIR / payload["directory"]
+    await asyncio.get_running_loop().run_in_executor(image_executor, remove_derivatives, directory / payload["name"])
+    await remove_files(directory, payload["name"], IMAGE_EXTENSIONS)
+
+# Closest precomputed variant for ?size= and the Accept header, generated lazily when missing
+async def resolve_image(directory: Path, name: str, size: int | None, accept: str | None) -> Path:
+    source = find_image(directory, name)
+    if size is None:
+        return source
+    extension = ".webp" if accept and "image/webp" in accept else ".jpg"
+    derived = derivative_path(source, closest_size(size), extension)
+    if is_fresh(derived, source):
+        return derived
+    try:
+        return await asyncio.get_running_loop().run_in_executor(image_executor, render_derivative, source, closest_size(size), extension)
+    except OSError:
+        # Unreadable source image, fall back to the original file
+        return source
@@ -0,0 +1,210 @@
+import os
+import json
+import random
+import asyncio
+import logging
+import socket
+from datetime import datetime, timedelta, timezone
+from time import perf_counter, monotonic
+from sqlalchemy import select, update, delete, func, and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..models import Job
+from ..db.db import AsyncSessionLocal
+from .config import settings
+from .metrics import jobs_finished, job_queue_latency, job_duration
+from .catalogue_import import insert_ignore
+
+logger = logging.getLogger(__name__)
+
+# Handlers by job kind, async callables (db, payload). A job can run more than once (retries, a worker
+# dying after the work but before marking it done), so every handler must be idempotent
+JOB_HANDLERS = {}
+
+def job_handler(kind: str):
+    def register(handler):
+        JOB_HANDLERS[kind] = handler
+        return handler
+    return register
+
+# Naive UTC, DateTime columns are stored without a time zone on every backend
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+# Exponential backoff with jitter after the given number of failed attempts
+def retry_delay(attempts: int) -> float:
+    delay = min(settings.JOB_RETRY_BASE_SECONDS * 2 ** (attempts - 1), settings.JOB_RETRY_MAX_SECONDS)
+    return delay * random.uniform(0.5, 1.0)
+
+# Add a job in the caller's transaction: it exists exactly when the caller's writes commit.
+# A pending job with the same dedupe_key makes this a no-op (repeated requests, double clicks)
+async def enqueue(db: AsyncSession, kind: str, payload: dict, dedupe_key: str | None = None, delay: float = 0):
+    now = utcnow()
+    values = {"kind": kind, "payload": json.dumps(payload), "dedupe_key": dedupe_key, "status": "queued", "attempts": 0, "run_after": now + timedelta(seconds=delay), "created_at": now}
+    await db.execute(insert_ignore(db, Job, "dedupe_key").values(**values))
+
+# Claimable jobs: due queued jobs and running jobs whose worker lost its lease (crashed or hung)
+def claimable(now: datetime):
+    return or_(and_(Job.status == "queued", Job.run_after <= now), and_(Job.status == "running", Job.locked_until < now))
+
+class JobQueue:
+    def __init__(self, session_factory, lease_seconds: int, max_attempts: int, poll_seconds: float, retention_hours: int):
+        self.session_factory = session_factory
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.poll_seconds = poll_seconds
+        self.retention_hours = retention_hours
+        self._next_prune = 0.0
+        # Last queue depth read by refresh_metrics, served by /metrics without a query per scrape
+        self.depth = {"queued": 0, "running": 0, "done": 0, "failed": 0, "oldest_due_seconds": 0.0}
+        self._wakeup = None
+        self._stopping = None
+        self._tasks = []
+
+    # Wake idle workers of this process after a commit that enqueued jobs, others find them at their next poll
+    def notify(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    # Claim one job with a conditional UPDATE (no SELECT ... FOR UPDATE SKIP LOCKED, which SQLite lacks):
+    # exactly one worker sees a row count of 1 for a candidate, the others move on to the next one.
+    # Attempts are counted at claim time, a job whose lease expired JOB_MAX_ATTEMPTS times (it kills or hangs
+    # every worker running it) is marked failed instead of being claimed again
+    async def claim(self, worker: str) -> Job | None:
+        async with self.session_factory() as db:
+            now = utcnow()
+            candidates = (await db.execute(select(Job.id, Job.kind, Job.attempts).where(claimable(now)).order_by(Job.run_after).limit(10))).all()
+            for job_id, kind, attempts in candidates:
+                if attempts >= self.max_attempts:
+                    result = await db.execute(
+                        update(Job).where(Job.id == job_id, claimable(now), Job.attempts >= self.max_attempts).values(status="failed", locked_by=None, locked_until=None, finished_at=now, dedupe_key=None, last_error=f"Lease expired on all {attempts} attempts"),
+                        execution_options={"synchronize_session": False},
+                    )
+                    await db.commit()
+                    if result.rowcount == 1:
+                        jobs_finished.inc(kind, "failed")
+                        logger.error("Job %s (%s) failed: lease expired on all %d attempts", job_id, kind, attempts)
+                    continue
+                result = await db.execute(
+                    update(Job).where(Job.id == job_id, claimable(now), Job.attempts < self.max_attempts).values(status="running", locked_by=worker, locked_until=now + timedelta(seconds=self.lease_seconds), attempts=Job.attempts + 1, started_at=now),
+                    execution_options={"synchronize_session": False},
+                )
+                await db.commit()
+                if result.rowcount == 1:
+                    return await db.scalar(select(Job).where(Job.id == job_id))
+            return None
+
+    # Outcome of a run, only recorded while this worker still holds the job (its lease was not taken over)
+    async def finish(self, job: Job, worker: str, error: Exception | None):
+        now = utcnow()
+        if error is None:
+            outcome, values = "done", {"status": "done", "finished_at": now, "dedupe_key": None, "last_error": None}
+        elif job.attempts >= self.max_attempts or job.kind not in JOB_HANDLERS:
+            outcome, values = "failed", {"status": "failed", "finished_at": now, "dedupe_key": None, "last_error": repr(error)[:2000]}
+        else:
+            outcome, values = "retry", {"status": "queued", "run_after": now + timedelta(seconds=retry_delay(job.attempts)), "last_error": repr(error)[:2000]}
+        async with self.session_factory() as db:
+            await db.execute(update(Job).where(Job.id == job.id, Job.locked_by == worker, Job.status == "running").values(locked_by=None, locked_until=None, **values), execution_options={"synchronize_session": False})
+            await db.commit()
+        jobs_finished.inc(job.kind, outcome)
+        if error is not None:
+            logger.warning("Job %s (%s) attempt %d: %r", job.id, job.kind, job.attempts, error)
+
+    # Lease heartbeat while the handler runs: locked_until is pushed forward every third of the lease, so a job
+    # running longer than JOB_LEASE_SECONDS is not claimed by a second worker. Only a dead (or hung) worker stops
+    # renewing and loses the job
+    async def heartbeat(self, job: Job, worker: str):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                async with self.session_factory() as db:
+                    result = await db.execute(update(Job).where(Job.id == job.id, Job.locked_by == worker, Job.status == "running").values(locked_until=utcnow() + timedelta(seconds=self.lease_seconds)), execution_options={"synchronize_session": False})
+                    await db.commit()
+                if result.rowcount == 0:
+                    logger.warning("Job %s (%s) lease lost by %s", job.id, job.kind, worker)
+                    return
+            except Exception:
+                logger.exception("Job %s (%s) lease renewal failed", job.id, job.kind)
+
+    async def run(self, job: Job, worker: str):
+        job_queue_latency.observe(max((job.started_at - job.run_after).total_seconds(), 0.0), job.kind)
+        start = perf_counter()
+        error = None
+        lease = asyncio.create_task(self.heartbeat(job, worker))
+        try:
+            handler = JOB_HANDLERS.get(job.kind)
+            if handler is None:
+                raise LookupError(f"No handler for job kind {job.kind!r}")
+            async with self.session_factory() as db:
+                await handler(db, json.loads(job.payload))
+        except Exception as exception:
+            error = exception
+        finally:
+            lease.cancel()
+        job_duration.observe(perf_counter() - start, job.kind)
+        await self.finish(job, worker, error)
+
+    # Finished jobs are kept JOB_RETENTION_HOURS for inspection, pruned by idle workers at most once a minute
+    async def prune(self):
+        if monotonic() < self._next_prune:
+            return
+        self._next_prune = monotonic() + 60
+        async with self.session_factory() as db:
+            await db.execute(delete(Job).where(Job.status.in_(["done", "failed"]), Job.finished_at < utcnow() - timedelta(hours=self.retention_hours)), execution_options={"synchronize_session": False})
+            await db.commit()
+
+    async def work(self, worker: str):
+        while not self._stopping.is_set():
+            try:
+                job = await self.claim(worker)
+                if job is None:
+                    await self.prune()
+            except Exception:
+                logger.exception("Job queue access failed")
+                job = None
+            if job is not None:
+                await self.run(job, worker)
+                continue
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    # Worker tasks in the running event loop, named after host and process so leases show who holds a job
+    def start(self, workers: int):
+        self._wakeup = asyncio.Event()
+        self._stopping = asyncio.Event()
+        prefix = f"{socket.gethostname()}:{os.getpid()}"
+        self._tasks = [asyncio.create_task(self.work(f"{prefix}:{number}")) for number in range(workers)]
+
+    # Running jobs get JOB_SHUTDOWN_SECONDS to finish, cancelled ones are claimed again after their lease
+    async def stop(self, timeout: float):
+        if not self._tasks:
+            return
+        self._stopping.set()
+        self._wakeup.set()
+        done, pending = await asyncio.wait(self._tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        self._tasks = []
+
+    # Queue depth by status and the age of the oldest due job, for /metrics
+    async def metrics(self, db: AsyncSession) -> dict:
+        now = utcnow()
+        counts = dict((await db.execute(select(Job.status, func.count(Job.id)).group_by(Job.status))).all())
+        oldest = await db.scalar(select(func.min(Job.run_after)).where(Job.status == "queued", Job.run_after <= now))
+        return {
+            "queued": counts.get("queued", 0),
+            "running": counts.get("running", 0),
+            "done": counts.get("done", 0),
+            "failed": counts.get("failed", 0),
+            "oldest_due_seconds": (now - oldest).total_seconds() if oldest is not None else 0.0,
+        }
+
+    # Queue depth covering the workers of every process, read every METRICS_REFRESH_SECONDS in the background
+    async def refresh_metrics(self):
+        async with self.session_factory() as db:
+            self.depth = await self.metrics(db)
+
+job_queue = JobQueue(AsyncSessionLocal, settings.JOB_LEASE_SECONDS, settings.JOB_MAX_ATTEMPTS, settings.JOB_POLL_SECONDS, settings.JOB_RETENTION_HOURS)
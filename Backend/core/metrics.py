@@ -0,0 +1,208 @@
+import logging
+from bisect import bisect_left
+from contextvars import ContextVar
+from threading import Lock
+from time import perf_counter
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+JOB_LATENCY_BUCKETS = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0)
+
+def escape_label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+# Minimal Prometheus metric types rendered in the text exposition format (no client library needed)
+class Counter:
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values: dict[tuple, float] = {}
+        self._lock = Lock()
+
+    def inc(self, *labels, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, format_labels(self.labelnames, labels), value) for labels, value in self._values.items()]
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, *labels, amount: float = 1.0):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels, value: float):
+        with self._lock:
+            self._values[labels] = value
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # labels -> [per bucket counts, sum, count]
+        self._series: dict[tuple, list] = {}
+        self._lock = Lock()
+
+    def observe(self, value: float, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for labels, (counts, total, count) in self._series.items():
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    samples.append((f"{self.name}_bucket", format_labels(self.labelnames, labels, f'le="{bound}"'), cumulative))
+                samples.append((f"{self.name}_bucket", format_labels(self.labelnames, labels, 'le="+Inf"'), count))
+                samples.append((f"{self.name}_sum", format_labels(self.labelnames, labels), total))
+                samples.append((f"{self.name}_count", format_labels(self.labelnames, labels), count))
+        return samples
+
+http_requests = Counter("http_requests_total", "HTTP requests by method, route and status code", ("method", "route", "status"))
+http_request_duration = Histogram("http_request_duration_seconds", "HTTP request latency by route", ("method", "route"))
+http_requests_in_flight = Gauge("http_requests_in_flight", "HTTP requests currently being served")
+db_queries = Counter("db_queries_total", "SQL statements executed by statement type", ("statement",))
+db_query_duration = Histogram("db_query_duration_seconds", "SQL statement execution time by statement type", ("statement",))
+db_queries_per_request = Histogram("db_queries_per_request", "SQL statements executed per HTTP request", ("route",), QUERY_COUNT_BUCKETS)
+db_time_per_request = Histogram("db_time_per_request_seconds", "Time spent in SQL per HTTP request", ("route",))
+db_slow_queries = Counter("db_slow_queries_total", "SQL statements slower than METRICS_SLOW_QUERY_MS", ("statement",))
+db_n_plus_one_requests = Counter("db_n_plus_one_requests_total", "Requests executing more than METRICS_N_PLUS_ONE_THRESHOLD statements", ("method", "route"))
+token_decode_duration = Histogram("auth_token_decode_seconds", "JWT signature verification time (token cache misses)")
+password_hash_duration = Histogram("password_hash_duration_seconds", "bcrypt hash/verify time including the pool queue wait")
+jobs_finished = Counter("jobs_total", "Background job runs by kind and outcome (done, retry, failed)", ("kind", "outcome"))
+job_queue_latency = Histogram("job_queue_latency_seconds", "Time from a job becoming due to a worker starting it", ("kind",), JOB_LATENCY_BUCKETS)
+job_duration = Histogram("job_duration_seconds", "Background job run time by kind", ("kind",), JOB_LATENCY_BUCKETS)
+
+METRICS = [
+    http_requests, http_request_duration, http_requests_in_flight,
+    db_queries, db_query_duration, db_queries_per_request, db_time_per_request, db_slow_queries, db_n_plus_one_requests,
+    token_decode_duration, password_hash_duration,
+    jobs_finished, job_queue_latency, job_duration,
+]
+
+# SQL statements executed while serving the current request, set by the middleware
+class RequestStats:
+    __slots__ = ("queries", "query_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.query_seconds = 0.0
+
+current_request: ContextVar[RequestStats | None] = ContextVar("current_request", default=None)
+
+# Engine event hooks timing every statement, only installed when metrics are enabled
+def install_sql_hooks(sync_engine):
+    from sqlalchemy import event
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        record_query(statement, perf_counter() - conn.info["query_start"].pop())
+
+    # A failing statement gets no after_cursor_execute: its start is popped here (the list would otherwise grow
+    # on the pooled connection) and it is counted like any other statement
+    @event.listens_for(sync_engine, "handle_error")
+    def handle_error(context):
+        conn = context.connection
+        if context.execution_context is not None and conn is not None and conn.info.get("query_start"):
+            record_query(context.statement or "", perf_counter() - conn.info["query_start"].pop())
+
+def record_query(statement: str, elapsed: float):
+    kind = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+    db_queries.inc(kind)
+    db_query_duration.observe(elapsed, kind)
+    stats = current_request.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.query_seconds += elapsed
+    if elapsed * 1000 >= settings.METRICS_SLOW_QUERY_MS:
+        db_slow_queries.inc(kind)
+        logger.warning("Slow query (%.1f ms): %s", elapsed * 1000, statement[:1000])
+
+# Pure ASGI middleware: route latency, status codes, in-flight requests and per-request SQL counts
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        http_requests_in_flight.inc()
+        start = perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = perf_counter() - start
+            http_requests_in_flight.dec()
+            current_request.reset(token)
+            # Route template (/song/{song_id}), never the raw path, keeps the label set bounded
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            method = scope["method"]
+            http_requests.inc(method, path, str(status_code))
+            http_request_duration.observe(elapsed, method, path)
+            db_queries_per_request.observe(stats.queries, path)
+            db_time_per_request.observe(stats.query_seconds, path)
+            if stats.queries > settings.METRICS_N_PLUS_ONE_THRESHOLD:
+                db_n_plus_one_requests.inc(method, path)
+                logger.warning("Possible N+1: %s %s executed %d queries", method, path, stats.queries)
+
+# Flatten the metrics() dicts of the pools, hasher and caches into gauges
+def gauge_samples(prefix: str, values: dict, labels: dict | None = None):
+    label_text = format_labels(tuple(labels), tuple(labels.values())) if labels else ""
+    return [(f"{prefix}_{name}", label_text, float(value)) for name, value in values.items()]
+
+def render_metrics(collected: list | None = None) -> str:
+    lines = []
+    for metric in METRICS:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        lines.extend(f"{name}{labels} {value}" for name, labels, value in metric.samples())
+    seen = set()
+    # Samples of one metric must be contiguous in the exposition
+    for name, labels, value in sorted(collected or [], key=lambda sample: sample[0]):
+        if name not in seen:
+            seen.add(name)
+            lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name}{labels} {value}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,265 @@
+import os
+import sys
+import heapq
+import itertools
+import threading
+from time import perf_counter, sleep, time
+from collections import Counter, deque
+from contextvars import ContextVar
+from urllib.parse import parse_qs
+from .config import settings
+
+# Opt-in request profiling, the middleware and SQL hooks are only installed with PROFILING_ENABLED.
+# A sampler thread records the stack of the event loop thread every PROFILE_INTERVAL_MS while a profiled
+# request runs, and the SQL hooks record its statements. Samples cover everything the loop executes meanwhile
+# (other requests included), sync routes running in the threadpool are not sampled
+
+# Per request profile: collapsed stacks ("outer;inner" -> samples) and the SQL statements with their time
+class RequestProfile:
+    def __init__(self, profile_id: int, method: str, path: str, requested: bool):
+        self.id = profile_id
+        self.method = method
+        self.path = path
+        self.route = "unmatched"
+        self.requested = requested
+        self.status = 500
+        self.started = time()
+        self.duration = 0.0
+        self.thread_id = threading.get_ident()
+        self.stacks = Counter()
+        self.sql = []
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+
+    def record_sql(self, statement: str, elapsed: float):
+        self.sql_count += 1
+        self.sql_seconds += elapsed
+        if len(self.sql) < settings.PROFILE_SQL_LIMIT:
+            self.sql.append({"statement": statement[:2000], "ms": round(elapsed * 1000, 3)})
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "route": self.route,
+            "path": self.path,
+            "status": self.status,
+            "requested": self.requested,
+            "started": self.started,
+            "duration_ms": round(self.duration * 1000, 3),
+            "samples": sum(self.stacks.values()),
+            "sql_count": self.sql_count,
+            "sql_ms": round(self.sql_seconds * 1000, 3),
+        }
+
+    # Call tree of the samples, children sorted by sample count
+    def call_tree(self) -> dict:
+        root = {"name": "all", "samples": 0, "children": {}}
+        for stack, count in self.stacks.items():
+            root["samples"] += count
+            node = root
+            for name in stack.split(";"):
+                node = node["children"].setdefault(name, {"name": name, "samples": 0, "children": {}})
+                node["samples"] += count
+
+        def ordered(node: dict) -> dict:
+            return {"name": node["name"], "samples": node["samples"], "children": [ordered(child) for child in sorted(node["children"].values(), key=lambda child: -child["samples"])]}
+
+        return ordered(root)
+
+    def details(self) -> dict:
+        return {**self.summary(), "interval_ms": settings.PROFILE_INTERVAL_MS, "call_tree": self.call_tree(), "sql": self.sql}
+
+current_profile: ContextVar[RequestProfile | None] = ContextVar("current_profile", default=None)
+
+# Collapsed stack lines (Brendan Gregg's flamegraph.pl, speedscope, inferno): "frame;frame;frame count"
+def collapsed_stacks(profiles) -> str:
+    merged = Counter()
+    for profile in profiles:
+        merged.update(profile.stacks)
+    return "".join(f"{stack} {count}\n" for stack, count in merged.most_common())
+
+# One sampler thread for the process, running only while at least one profile is active
+class StackSampler:
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._profiles = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._names = {}
+
+    def active(self) -> int:
+        return len(self._profiles)
+
+    def add(self, profile: RequestProfile):
+        with self._lock:
+            self._profiles.add(profile)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+                self._thread.start()
+
+    # Once this returns the sampler never touches the profile's stacks again, handlers read them without a lock
+    def remove(self, profile: RequestProfile):
+        with self._lock:
+            self._profiles.discard(profile)
+
+    def frame_name(self, code) -> str:
+        name = self._names.get(code)
+        if name is None:
+            filename = code.co_filename
+            short = os.path.join(os.path.basename(os.path.dirname(filename)), os.path.basename(filename))
+            # ';' separates frames and ' ' precedes the count in the collapsed format
+            name = self._names[code] = f"{getattr(code, 'co_qualname', code.co_name)} ({short}:{code.co_firstlineno})".replace(";", ":")
+        return name
+
+    def collapse(self, frame) -> str:
+        # Loop waiting in the selector: the profiled request is awaiting I/O (database, client)
+        if frame.f_code.co_name == "select" and frame.f_code.co_filename.endswith("selectors.py"):
+            return "[event loop idle]"
+        names = []
+        while frame is not None:
+            names.append(self.frame_name(frame.f_code))
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._profiles:
+                    self._thread = None
+                    return
+                profiles = list(self._profiles)
+            frames = sys._current_frames()
+            stacks = {}
+            for profile in profiles:
+                frame = frames.get(profile.thread_id)
+                if frame is not None and profile.thread_id not in stacks:
+                    stacks[profile.thread_id] = self.collapse(frame)
+            del frames
+            # Stacks are collapsed outside the lock, counted under it and only for profiles still active: a
+            # profile removed meanwhile is being summarized or kept by its request
+            with self._lock:
+                for profile in profiles:
+                    if profile in self._profiles and profile.thread_id in stacks:
+                        profile.stacks[stacks[profile.thread_id]] += 1
+            sleep(self.interval)
+
+# Requested profiles (most recent PROFILE_KEEP_REQUESTED) and the slowest PROFILE_SLOWEST_PER_ROUTE sampled
+# profiles of every route, a min-heap per route so a slower profile replaces the fastest kept one
+class ProfileStore:
+    def __init__(self, keep_requested: int, slowest_per_route: int):
+        self.slowest_per_route = slowest_per_route
+        self._requested = deque(maxlen=keep_requested)
+        self._slowest: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def keep(self, profile: RequestProfile):
+        with self._lock:
+            if profile.requested:
+                self._requested.append(profile)
+                return
+            heap = self._slowest.setdefault((profile.method, profile.route), [])
+            entry = (profile.duration, profile.id, profile)
+            if len(heap) < self.slowest_per_route:
+                heapq.heappush(heap, entry)
+            elif entry[0] > heap[0][0]:
+                heapq.heapreplace(heap, entry)
+
+    def profiles(self) -> list:
+        with self._lock:
+            return list(self._requested) + [entry[2] for heap in self._slowest.values() for entry in heap]
+
+    def get(self, profile_id: int) -> RequestProfile | None:
+        return next((profile for profile in self.profiles() if profile.id == profile_id), None)
+
+    def slowest(self) -> list:
+        with self._lock:
+            return [
+                {"method": method, "route": route, "profiles": [entry[2].summary() for entry in sorted(heap, reverse=True)]}
+                for (method, route), heap in sorted(self._slowest.items())
+            ]
+
+    def route_profiles(self, route: str | None) -> list:
+        with self._lock:
+            return [entry[2] for (method, kept_route), heap in self._slowest.items() if route is None or kept_route == route for entry in heap]
+
+    def clear(self):
+        with self._lock:
+            self._requested.clear()
+            self._slowest.clear()
+
+sampler = StackSampler(settings.PROFILE_INTERVAL_MS / 1000)
+profile_store = ProfileStore(settings.PROFILE_KEEP_REQUESTED, settings.PROFILE_SLOWEST_PER_ROUTE)
+
+# Statements of the profiled request, installed next to the metrics hooks when profiling is enabled
+def install_profile_sql_hooks(sync_engine):
+    from sqlalchemy import event
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if current_profile.get() is not None:
+            conn.info.setdefault("profile_start", []).append(perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        profile = current_profile.get()
+        if profile is not None and conn.info.get("profile_start"):
+            profile.record_sql(statement, perf_counter() - conn.info["profile_start"].pop())
+
+    # Failing statements get no after_cursor_execute, their start is popped (and recorded) here
+    @event.listens_for(sync_engine, "handle_error")
+    def handle_error(context):
+        conn = context.connection
+        if context.execution_context is not None and conn is not None and conn.info.get("profile_start"):
+            elapsed = perf_counter() - conn.info["profile_start"].pop()
+            profile = current_profile.get()
+            if profile is not None:
+                profile.record_sql(context.statement or "", elapsed)
+
+def profile_requested(scope) -> bool:
+    for key, value in scope["headers"]:
+        if key == b"x-profile":
+            return value.strip() in (b"1", b"true")
+    if b"profile=" in scope["query_string"]:
+        return parse_qs(scope["query_string"].decode("latin-1")).get("profile", [""])[-1] in ("1", "true")
+    return False
+
+# Pure ASGI middleware: profiles the requests of admins asking for it (X-Profile: 1 or ?profile=1, the profile id
+# comes back in X-Profile-Id) and every PROFILE_SAMPLE_EVERY-th request for the slowest per route buffer.
+# authorize gets the Authorization header value and tells whether it belongs to an admin
+class ProfilingMiddleware:
+    def __init__(self, app, authorize, sample_every: int = settings.PROFILE_SAMPLE_EVERY, max_active: int = settings.PROFILE_MAX_ACTIVE):
+        self.app = app
+        self.authorize = authorize
+        self.sample_every = sample_every
+        self.max_active = max_active
+        self._requests = itertools.count(1)
+        self._ids = itertools.count(1)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        requested = profile_requested(scope) and await self.authorize(next((value.decode("latin-1") for key, value in scope["headers"] if key == b"authorization"), None))
+        sampled = not requested and self.sample_every > 0 and next(self._requests) % self.sample_every == 0 and sampler.active() < self.max_active
+        if not (requested or sampled):
+            return await self.app(scope, receive, send)
+        profile = RequestProfile(next(self._ids), scope["method"], scope["path"], requested)
+
+        async def send_with_profile(message):
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                if requested:
+                    message = {**message, "headers": [*message.get("headers", []), (b"x-profile-id", str(profile.id).encode())]}
+            await send(message)
+
+        token = current_profile.set(profile)
+        sampler.add(profile)
+        start = perf_counter()
+        try:
+            await self.app(scope, receive, send_with_profile)
+        finally:
+            profile.duration = perf_counter() - start
+            sampler.remove(profile)
+            current_profile.reset(token)
+            profile.route = getattr(scope.get("route"), "path", "unmatched")
+            profile_store.keep(profile)
@@ -0,0 +1,190 @@
+import math
+from time import time, monotonic
+from collections import OrderedDict
+from fastapi import HTTPException, status
+from .config import settings
+
+def too_many_requests(retry_after: float) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="Too many requests, try again later", headers={"Retry-After": str(max(1, math.ceil(retry_after)))})
+
+# Sliding window counter: the previous fixed window is weighted by how much of it still overlaps the sliding window
+def sliding_estimate(previous: int, current: int, window: float, elapsed: float) -> float:
+    return previous * (window - elapsed) / window + current
+
+# In-process counters, bounded LRU of identities (one worker)
+class MemoryRateLimitBackend:
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        # key -> [window index, current count, previous count]
+        self._windows: OrderedDict[str, list] = OrderedDict()
+        # key -> (value, expiry)
+        self._values: dict[str, tuple[float, float]] = {}
+
+    def _window(self, key: str, index: int) -> list:
+        entry = self._windows.get(key)
+        if entry is None:
+            entry = self._windows[key] = [index, 0, 0]
+            while len(self._windows) > self.max_keys:
+                self._windows.popitem(last=False)
+        elif entry[0] != index:
+            # Roll forward, the old current window becomes the previous one only if adjacent
+            entry[2] = entry[1] if entry[0] == index - 1 else 0
+            entry[0], entry[1] = index, 0
+        self._windows.move_to_end(key)
+        return entry
+
+    async def increment(self, key: str, window: float) -> float:
+        now = time()
+        entry = self._window(key, int(now // window))
+        entry[1] += 1
+        return sliding_estimate(entry[2], entry[1], window, now % window)
+
+    async def count(self, key: str, window: float) -> float:
+        now = time()
+        entry = self._window(key, int(now // window))
+        return sliding_estimate(entry[2], entry[1], window, now % window)
+
+    # Expiring values (token denylist), only seen by this worker
+    async def set_value(self, key: str, value: float, ttl: float):
+        self._values[key] = (value, monotonic() + ttl)
+        if len(self._values) > self.max_keys:
+            now = monotonic()
+            for expired in [name for name, entry in self._values.items() if entry[1] <= now]:
+                del self._values[expired]
+
+    async def get_values(self, *keys: str) -> list:
+        now = monotonic()
+        entries = [self._values.get(key) for key in keys]
+        return [entry[0] if entry is not None and entry[1] > now else None for entry in entries]
+
+# Counters shared by every worker, works with redis.asyncio.Redis or any client exposing async incr/expire/get
+class SharedRateLimitBackend:
+    def __init__(self, client, prefix: str = "ratelimit:"):
+        self.client = client
+        self.prefix = prefix
+
+    async def increment(self, key: str, window: float) -> float:
+        now = time()
+        index = int(now // window)
+        current_key = f"{self.prefix}{key}:{index}"
+        current = int(await self.client.incr(current_key))
+        if current == 1:
+            await self.client.expire(current_key, math.ceil(window * 2))
+        previous = int(await self.client.get(f"{self.prefix}{key}:{index - 1}") or 0)
+        return sliding_estimate(previous, current, window, now % window)
+
+    async def count(self, key: str, window: float) -> float:
+        now = time()
+        index = int(now // window)
+        current = int(await self.client.get(f"{self.prefix}{key}:{index}") or 0)
+        previous = int(await self.client.get(f"{self.prefix}{key}:{index - 1}") or 0)
+        return sliding_estimate(previous, current, window, now % window)
+
+    # Expiring values shared by every worker, fetched in one round trip
+    async def set_value(self, key: str, value: float, ttl: float):
+        await self.client.set(f"{self.prefix}{key}", repr(value), ex=max(1, math.ceil(ttl)))
+
+    async def get_values(self, *keys: str) -> list:
+        values = await self.client.mget([f"{self.prefix}{key}" for key in keys])
+        return [None if value is None else float(value) for value in values]
+
+# Local stand-in for the shared store (development and benchmarks), same commands as the redis client
+class FakeRedisClient:
+    def __init__(self):
+        self._values: dict[str, tuple[int, float]] = {}
+
+    def _live(self, key: str):
+        entry = self._values.get(key)
+        if entry is not None and entry[1] <= monotonic():
+            del self._values[key]
+            return None
+        return entry
+
+    async def incr(self, key: str) -> int:
+        entry = self._live(key)
+        value = (entry[0] if entry else 0) + 1
+        self._values[key] = (value, entry[1] if entry else math.inf)
+        return value
+
+    async def expire(self, key: str, seconds: int):
+        entry = self._live(key)
+        if entry is not None:
+            self._values[key] = (entry[0], monotonic() + seconds)
+
+    async def get(self, key: str):
+        entry = self._live(key)
+        return None if entry is None else str(entry[0]).encode()
+
+    async def set(self, key: str, value: str, ex: int | None = None):
+        self._values[key] = (value, monotonic() + ex if ex is not None else math.inf)
+
+    async def mget(self, keys: list) -> list:
+        return [await self.get(key) for key in keys]
+
+# Limit of events per identity over a sliding window
+class SlidingWindowLimiter:
+    def __init__(self, backend, name: str, limit: int, window: float):
+        self.backend = backend
+        self.name = name
+        self.limit = limit
+        self.window = window
+
+    # Count the attempt and reject once the estimate is above the limit
+    async def hit(self, identity: str):
+        if await self.backend.increment(f"{self.name}:{identity}", self.window) > self.limit:
+            raise too_many_requests(self.window)
+
+    # Reject without counting, for limits on outcomes (failed logins) recorded afterwards
+    async def check(self, identity: str):
+        if await self.backend.count(f"{self.name}:{identity}", self.window) >= self.limit:
+            raise too_many_requests(self.window)
+
+    async def record(self, identity: str):
+        await self.backend.increment(f"{self.name}:{identity}", self.window)
+
+# Token buckets of one route group (rate per second with a burst), local to the worker like the capacity they protect
+class TokenBuckets:
+    def __init__(self, rate: float, burst: int, max_keys: int):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        # key -> [tokens, last refill]
+        self._buckets: OrderedDict[str, list] = OrderedDict()
+
+    def take(self, key: str):
+        now = monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [float(self.burst), now]
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            self._buckets.move_to_end(key)
+        if bucket[0] < 1:
+            raise too_many_requests((1 - bucket[0]) / self.rate)
+        bucket[0] -= 1
+
+# "group:rate:burst" entries, e.g. "auth:5:20,search:20:40"
+def parse_route_groups(value: str) -> dict[str, TokenBuckets]:
+    groups = {}
+    for entry in filter(None, (part.strip() for part in value.split(","))):
+        name, rate, burst = entry.split(":")
+        groups[name] = TokenBuckets(float(rate), int(burst), settings.RATE_LIMIT_MAX_KEYS)
+    return groups
+
+def create_rate_limit_backend():
+    if settings.RATE_LIMIT_BACKEND == "redis":
+        # Optional dependency, only needed when the redis backend is selected
+        from redis.asyncio import Redis
+        return SharedRateLimitBackend(Redis.from_url(settings.RATE_LIMIT_REDIS_URL))
+    if settings.RATE_LIMIT_BACKEND == "fake":
+        return SharedRateLimitBackend(FakeRedisClient())
+    return MemoryRateLimitBackend(settings.RATE_LIMIT_MAX_KEYS)
+
+rate_limit_backend = create_rate_limit_backend()
+login_ip_limiter = SlidingWindowLimiter(rate_limit_backend, "login:ip", settings.LOGIN_IP_LIMIT, settings.LOGIN_IP_WINDOW_SECONDS)
+login_failure_limiter = SlidingWindowLimiter(rate_limit_backend, "login:failed", settings.LOGIN_USERNAME_FAILURE_LIMIT, settings.LOGIN_USERNAME_WINDOW_SECONDS)
+login_account_limiter = SlidingWindowLimiter(rate_limit_backend, "login:account", settings.LOGIN_ACCOUNT_FAILURE_LIMIT, settings.LOGIN_ACCOUNT_WINDOW_SECONDS)
+route_group_buckets = parse_route_groups(settings.RATE_LIMIT_GROUPS)
@@ -0,0 +1,355 @@
+import os
+import json
+import threading
+from time import time, perf_counter
+from pathlib import Path
+from contextlib import contextmanager
+from collections import Counter
+import numpy as np
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session
+from .config import settings
+
+SNAPSHOT_MAGIC = b"BSRECS01"
+# Arrays start on 64 byte boundaries so every memory map is aligned
+ALIGNMENT = 64
+POPULAR_SONGS = 1000
+
+# Item-item cosine neighbours from the user x song ownership matrix, computed in blocks of songs so only
+# one block of the co-occurrence matrix is in memory at a time. Users owning more than max_user_songs songs
+# are left out of the co-occurrence (their pairs grow quadratically and carry little signal) but keep their library.
+# owned_user and owned_song are parallel arrays, newest ownership first
+def build_arrays(owned_user: np.ndarray, owned_song: np.ndarray, neighbors: int, max_user_songs: int, block_size: int) -> dict:
+    from scipy.sparse import csr_matrix
+    song_ids, song_index = np.unique(owned_song, return_inverse=True)
+    user_ids, user_index = np.unique(owned_user, return_inverse=True)
+    song_count, user_count = len(song_ids), len(user_ids)
+    # Library of every user (CSR by user), the stable sort keeps the newest songs first
+    order = np.argsort(user_index, kind="stable")
+    user_songs = song_index[order].astype(np.int32)
+    user_indptr = np.zeros(user_count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(user_index, minlength=user_count), out=user_indptr[1:])
+    owned = csr_matrix((np.ones(len(user_songs), dtype=np.float32), user_songs, user_indptr), shape=(user_count, song_count))
+    signal = owned[np.diff(user_indptr) <= max_user_songs]
+    popularity = np.asarray(signal.sum(axis=0)).ravel().astype(np.int32)
+    by_song = signal.T.tocsr()
+    neighbor_index = np.full((song_count, neighbors), -1, dtype=np.int32)
+    neighbor_counts = np.zeros((song_count, neighbors), dtype=np.int32)
+    neighbor_scores = np.zeros((song_count, neighbors), dtype=np.float32)
+    for start in range(0, song_count, block_size):
+        # Co-occurrence counts of this block of songs with every song
+        block = (by_song[start:start + block_size] @ signal).tocsr()
+        rows = np.repeat(np.arange(block.shape[0]), np.diff(block.indptr))
+        columns, counts = block.indices, block.data
+        keep = columns != rows + start
+        rows, columns, counts = rows[keep], columns[keep], counts[keep]
+        scores = counts / np.sqrt(popularity[rows + start].astype(np.float64) * popularity[columns])
+        # Top-K per row: sort by row then descending score, the rank is the position within the row
+        order = np.lexsort((-scores, rows))
+        rows, columns, counts, scores = rows[order], columns[order], counts[order], scores[order]
+        rank = np.arange(len(rows)) - np.searchsorted(rows, rows)
+        top = rank < neighbors
+        neighbor_index[rows[top] + start, rank[top]] = columns[top]
+        neighbor_counts[rows[top] + start, rank[top]] = counts[top]
+        neighbor_scores[rows[top] + start, rank[top]] = scores[top]
+    return {
+        "song_ids": song_ids.astype(np.int64),
+        "popularity": popularity,
+        "popular": np.argsort(-popularity, kind="stable")[:POPULAR_SONGS].astype(np.int32),
+        "neighbors": neighbor_index,
+        "counts": neighbor_counts,
+        "scores": neighbor_scores,
+        "user_ids": user_ids.astype(np.int64),
+        "user_indptr": user_indptr,
+        "user_songs": user_songs,
+    }
+
+# Single file snapshot: magic, header length, JSON header (metadata and array layout), aligned raw arrays.
+# Written to a temporary file and renamed, workers that still map the previous file keep reading it
+def write_snapshot(path: Path, arrays: dict, metadata: dict):
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        offset = -(-offset // ALIGNMENT) * ALIGNMENT
+        layout[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset += array.nbytes
+    header = json.dumps({**metadata, "arrays": layout}).encode()
+    data_start = -(-(len(SNAPSHOT_MAGIC) + 8 + len(header)) // ALIGNMENT) * ALIGNMENT
+    temp_path = path.with_suffix(path.suffix + f".{os.getpid()}.tmp")
+    with open(temp_path, "wb") as f:
+        f.write(SNAPSHOT_MAGIC + len(header).to_bytes(8, "little") + header)
+        for name, array in arrays.items():
+            f.seek(data_start + layout[name]["offset"])
+            f.write(np.ascontiguousarray(array).tobytes())
+    os.replace(temp_path, path)
+
+def read_snapshot(path: Path) -> tuple[dict, dict] | None:
+    try:
+        with open(path, "rb") as f:
+            if f.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+                return None
+            header_length = int.from_bytes(f.read(8), "little")
+            metadata = json.loads(f.read(header_length))
+    except (OSError, ValueError):
+        return None
+    data_start = -(-(len(SNAPSHOT_MAGIC) + 8 + header_length) // ALIGNMENT) * ALIGNMENT
+    arrays = {}
+    for name, layout in metadata.pop("arrays").items():
+        shape = tuple(layout["shape"])
+        if 0 in shape:
+            arrays[name] = np.zeros(shape, dtype=layout["dtype"])
+        else:
+            arrays[name] = np.memmap(path, dtype=layout["dtype"], mode="r", offset=data_start + layout["offset"], shape=shape)
+    return arrays, metadata
+
+# One consistent view of the index: the mapped snapshot arrays and the ownership rows added since it was built
+# (overlay). Never modified once published, apply() publishes a new one
+class IndexState:
+    def __init__(self, arrays: dict | None, metadata: dict, pairs: dict[int, Counter], popularity: Counter, library: dict[int, list[int]], last_owned_id: int):
+        self.arrays = arrays
+        self.metadata = metadata
+        self.pairs = pairs
+        self.popularity = popularity
+        self.library = library
+        self.last_owned_id = last_owned_id
+
+    def __len__(self):
+        return 0 if self.arrays is None else len(self.arrays["song_ids"])
+
+    def song_positions(self, song_ids: np.ndarray) -> np.ndarray:
+        known = self.arrays["song_ids"]
+        positions = np.searchsorted(known, song_ids)
+        positions[positions >= len(known)] = 0
+        return np.where(known[positions] == song_ids, positions, -1) if len(known) else np.full(len(song_ids), -1)
+
+    def snapshot_library(self, user_id: int) -> np.ndarray:
+        user_ids = self.arrays["user_ids"]
+        position = np.searchsorted(user_ids, user_id)
+        if position < len(user_ids) and user_ids[position] == user_id:
+            indptr = self.arrays["user_indptr"]
+            return self.arrays["song_ids"][self.arrays["user_songs"][indptr[position]:indptr[position + 1]]]
+        return np.zeros(0, dtype=np.int64)
+
+    def song_popularity(self, song_ids: np.ndarray) -> np.ndarray:
+        positions = self.song_positions(song_ids)
+        popularity = np.zeros(len(song_ids), dtype=np.float64)
+        if len(self):
+            popularity = np.where(positions >= 0, self.arrays["popularity"][np.maximum(positions, 0)], 0).astype(np.float64)
+        if self.popularity:
+            popularity += np.fromiter((self.popularity.get(int(song_id), 0) for song_id in song_ids), dtype=np.float64, count=len(song_ids))
+        return popularity
+
+    # Neighbour ids and scores of one song, best first
+    def neighbors(self, song_id: int, limit: int) -> tuple[np.ndarray, np.ndarray]:
+        position = self.song_positions(np.array([song_id]))[0]
+        added = self.pairs.get(song_id)
+        if position >= 0 and not added:
+            # No new pairs for this song: scores computed at build time
+            neighbors = self.arrays["neighbors"][position][:limit]
+            valid = neighbors >= 0
+            return self.arrays["song_ids"][neighbors[valid]], self.arrays["scores"][position][:limit][valid].astype(np.float64)
+        # Snapshot counts merged with the overlay counts, cosine recomputed on the merged popularity
+        counts = Counter()
+        if position >= 0:
+            neighbors = self.arrays["neighbors"][position]
+            valid = neighbors >= 0
+            counts.update(dict(zip(self.arrays["song_ids"][neighbors[valid]].tolist(), self.arrays["counts"][position][valid].tolist())))
+        if added:
+            counts.update(added)
+        candidates = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        values = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+        own = self.song_popularity(np.array([song_id]))[0]
+        scores = values / np.sqrt(np.maximum(own * self.song_popularity(candidates), 1))
+        top = np.argsort(-scores, kind="stable")[:limit]
+        return candidates[top], scores[top]
+
+# Memory mapped neighbour index plus the ownership rows added since it was built (per worker overlay),
+# lookups only read arrays and dicts, no database access. Lookups read the current IndexState without a lock:
+# load() and apply() (refresh thread) build the next state aside and swap it in with one assignment
+class RecommendationIndex:
+    def __init__(self, seed_songs: int, max_user_songs: int):
+        self.seed_songs = seed_songs
+        self.max_user_songs = max_user_songs
+        # Serializes the writers only
+        self._lock = threading.Lock()
+        self._state = IndexState(None, {}, {}, Counter(), {}, 0)
+
+    @property
+    def metadata(self) -> dict:
+        return self._state.metadata
+
+    @property
+    def last_owned_id(self) -> int:
+        return self._state.last_owned_id
+
+    def __len__(self):
+        return len(self._state)
+
+    def load(self, path: Path) -> bool:
+        snapshot = read_snapshot(path)
+        if snapshot is None:
+            return False
+        arrays, metadata = snapshot
+        with self._lock:
+            self._state = IndexState(arrays, metadata, {}, Counter(), {}, metadata.get("max_owned_id", 0))
+        return True
+
+    # New ownership rows (user, song), newest last: the song pairs with the rest of the user's library.
+    # Copy on write: the overlay dicts are copied, and so is every Counter or library list that changes
+    def apply(self, rows: list[tuple[int, int, int]]):
+        with self._lock:
+            state = self._state
+            if state.arrays is None or not rows:
+                return
+            pairs, popularity, libraries = dict(state.pairs), Counter(state.popularity), dict(state.library)
+            copied_songs, copied_users = set(), set()
+
+            def song_pairs(song_id: int) -> Counter:
+                if song_id not in copied_songs:
+                    pairs[song_id] = Counter(pairs.get(song_id, ()))
+                    copied_songs.add(song_id)
+                return pairs[song_id]
+            last_owned_id = state.last_owned_id
+            for owned_id, user_id, song_id in rows:
+                if user_id not in copied_users:
+                    libraries[user_id] = list(libraries.get(user_id, ()))
+                    copied_users.add(user_id)
+                library = libraries[user_id]
+                existing = state.snapshot_library(user_id)
+                if len(existing) + len(library) < self.max_user_songs:
+                    for other in (*existing.tolist(), *library):
+                        song_pairs(song_id)[other] += 1
+                        song_pairs(other)[song_id] += 1
+                    popularity[song_id] += 1
+                library.append(song_id)
+                last_owned_id = max(last_owned_id, owned_id)
+            self._state = IndexState(state.arrays, state.metadata, pairs, popularity, libraries, last_owned_id)
+
+    def similar(self, song_id: int, limit: int) -> list[dict]:
+        state = self._state
+        if state.arrays is None:
+            return []
+        ids, scores = state.neighbors(song_id, limit)
+        return [{"id": int(i), "score": round(float(score), 4)} for i, score in zip(ids, scores)]
+
+    # Sum of the neighbour scores of the user's most recent songs, owned songs excluded,
+    # most popular songs when the user owns nothing yet
+    def recommend(self, user_id: int, limit: int) -> list[dict]:
+        state = self._state
+        if state.arrays is None:
+            return []
+        arrays = state.arrays
+        added = state.library.get(user_id, [])
+        library = np.concatenate([np.array(added[::-1], dtype=np.int64), state.snapshot_library(user_id)])
+        seeds = library[:self.seed_songs]
+        positions = state.song_positions(seeds)
+        updated = np.fromiter((song_id in state.pairs for song_id in seeds.tolist()), dtype=bool, count=len(seeds)) if state.pairs else np.zeros(len(seeds), dtype=bool)
+        # Snapshot rows gathered in one go, songs with new pairs go through the merged lookup
+        plain = positions[(positions >= 0) & ~updated]
+        neighbors = arrays["neighbors"][plain].ravel()
+        valid = neighbors >= 0
+        candidate_ids = [arrays["song_ids"][neighbors[valid]]]
+        candidate_scores = [arrays["scores"][plain].ravel()[valid].astype(np.float64)]
+        for song_id in seeds[updated].tolist():
+            ids, scores = state.neighbors(song_id, arrays["neighbors"].shape[1])
+            candidate_ids.append(ids)
+            candidate_scores.append(scores)
+        candidate_ids = np.concatenate(candidate_ids)
+        if not len(candidate_ids):
+            popular = arrays["song_ids"][arrays["popular"]]
+            popular = popular[~np.isin(popular, library)][:limit]
+            return [{"id": int(song_id), "score": 0.0} for song_id in popular]
+        candidate_ids, inverse = np.unique(candidate_ids, return_inverse=True)
+        totals = np.bincount(inverse, weights=np.concatenate(candidate_scores))
+        totals[np.isin(candidate_ids, library)] = -1
+        count = min(limit, int((totals > 0).sum()))
+        if count == 0:
+            return []
+        top = np.argpartition(-totals, count - 1)[:count]
+        top = top[np.argsort(-totals[top], kind="stable")]
+        return [{"id": int(candidate_ids[i]), "score": round(float(totals[i]), 4)} for i in top]
+
+    def metrics(self) -> dict:
+        state = self._state
+        return {
+            "songs": len(state),
+            "users": 0 if state.arrays is None else len(state.arrays["user_ids"]),
+            "build_seconds": state.metadata.get("build_seconds", 0.0),
+            "age_seconds": time() - state.metadata["built_at"] if "built_at" in state.metadata else 0.0,
+            "overlay_songs": len(state.pairs),
+            "overlay_users": len(state.library),
+        }
+
+# Ownership rows newest first, read in chunks straight into arrays
+def read_ownership(session: Session) -> tuple[np.ndarray, np.ndarray, int]:
+    from ..models import Songs_owned
+    query = select(Songs_owned.id, Songs_owned.user_fk, Songs_owned.song_fk).order_by(Songs_owned.id.desc()).execution_options(yield_per=settings.RECOMMEND_BUILD_CHUNK_SIZE)
+    chunks = [np.array(partition, dtype=np.int64).reshape(-1, 3) for partition in session.execute(query).partitions()]
+    rows = np.concatenate(chunks) if chunks else np.zeros((0, 3), dtype=np.int64)
+    return rows[:, 1], rows[:, 2], int(rows[0, 0]) if len(rows) else 0
+
+def build_snapshot(session: Session, path: Path) -> dict:
+    start = perf_counter()
+    owned_user, owned_song, max_owned_id = read_ownership(session)
+    arrays = build_arrays(owned_user, owned_song, settings.RECOMMEND_NEIGHBORS, settings.RECOMMEND_MAX_USER_SONGS, settings.RECOMMEND_BLOCK_SIZE)
+    metadata = {"max_owned_id": max_owned_id, "rows": len(owned_user), "built_at": time(), "build_seconds": round(perf_counter() - start, 3)}
+    write_snapshot(path, arrays, metadata)
+    return metadata
+
+# Ownership rows added since the index was built or last refreshed
+def refresh_from_database(session: Session, index: RecommendationIndex):
+    from ..models import Songs_owned
+    rows = session.execute(select(Songs_owned.id, Songs_owned.user_fk, Songs_owned.song_fk).where(Songs_owned.id > index.last_owned_id).order_by(Songs_owned.id)).all()
+    index.apply([tuple(row) for row in rows])
+
+# The snapshot is still valid while no ownership row it covers was deleted, newer rows go to the overlay
+def snapshot_is_current(session: Session, metadata: dict) -> bool:
+    from ..models import Songs_owned
+    return session.scalar(select(func.count(Songs_owned.id)).where(Songs_owned.id <= metadata["max_owned_id"])) == metadata["rows"]
+
+# Exclusive advisory lock next to the snapshot, held while it is built so one process builds and the others
+# load its result. Yields False when blocking is off and another process holds it. Without fcntl (Windows)
+# every process builds on its own
+@contextmanager
+def build_lock(snapshot_path: Path, blocking: bool = True):
+    try:
+        import fcntl
+    except ImportError:
+        yield True
+        return
+    snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(snapshot_path.with_suffix(snapshot_path.suffix + ".lock"), "a") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def load_current(session: Session, index: RecommendationIndex, snapshot_path: Path, max_age: float | None) -> bool:
+    return index.load(snapshot_path) and snapshot_is_current(session, index.metadata) and (max_age is None or time() - index.metadata["built_at"] < max_age)
+
+# Startup and periodic rebuilds: a current snapshot (possibly written by another worker) is loaded, otherwise the
+# worker holding build_lock rebuilds it. Workers waiting for the lock load the rebuilt snapshot, with wait off
+# (periodic refresh) they keep their index and pick the new snapshot up at a later tick
+def load_or_build(session: Session, index: RecommendationIndex, snapshot_path: Path, max_age: float | None = None, wait: bool = True):
+    if not load_current(session, index, snapshot_path, max_age):
+        with build_lock(snapshot_path, wait) as owner:
+            # Rebuilt by another worker while this one waited for the lock
+            if owner and not load_current(session, index, snapshot_path, max_age):
+                build_snapshot(session, snapshot_path)
+                index.load(snapshot_path)
+    refresh_from_database(session, index)
+
+# Periodic task: overlay refresh, full rebuild once the snapshot is older than rebuild_after
+def refresh(session: Session, index: RecommendationIndex, snapshot_path: Path, rebuild_after: float):
+    if time() - index.metadata.get("built_at", 0) >= rebuild_after:
+        load_or_build(session, index, snapshot_path, rebuild_after, wait=False)
+    else:
+        refresh_from_database(session, index)
+
+recommendation_index = RecommendationIndex(settings.RECOMMEND_SEED_SONGS, settings.RECOMMEND_MAX_USER_SONGS)
+SNAPSHOT_PATH = Path(settings.RECOMMEND_SNAPSHOT_PATH)
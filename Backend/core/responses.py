@@ -0,0 +1,10 @@
+import orjson
+from fastapi.responses import JSONResponse
+
+# JSON rendered by orjson, for payloads that are already plain dicts (no pydantic validation pass)
+class ORJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+def orjson_line(row: dict) -> bytes:
+    return orjson.dumps(row, default=str) + b"\n"
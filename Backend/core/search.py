@@ -0,0 +1,249 @@
+import os
+import re
+import math
+import heapq
+import threading
+import orjson
+from tempfile import NamedTemporaryFile
+from bisect import bisect_left
+from pathlib import Path
+from collections import Counter, defaultdict
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session
+from .config import settings
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+# Title terms count more than description terms
+TITLE_WEIGHT = 2
+PREFIX_WEIGHT = 0.8
+FUZZY_WEIGHT = 0.6
+MAX_EXPANSIONS = 50
+SNAPSHOT_VERSION = 3
+
+def tokenize(text: str | None) -> list[str]:
+    return TOKEN_PATTERN.findall(text.casefold()) if text else []
+
+# Edit distance counting adjacent transpositions as one typo (optimal string alignment),
+# gives up (returns max_distance + 1) once the bound is exceeded
+def bounded_distance(a: str, b: str, max_distance: int) -> int:
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    before_previous = None
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, start=1):
+        current = [i]
+        for j, char_b in enumerate(b, start=1):
+            cost = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b))
+            if before_previous is not None and j > 1 and char_a == b[j - 2] and a[i - 2] == char_b:
+                cost = min(cost, before_previous[j - 2] + 1)
+            current.append(cost)
+        if min(current) > max_distance:
+            return max_distance + 1
+        before_previous, previous = previous, current
+    return previous[-1]
+
+def allowed_typos(term: str) -> int:
+    if len(term) >= 8:
+        return 2
+    if len(term) >= 4:
+        return 1
+    return 0
+
+# Inverted index over song and album titles/descriptions with BM25 ranking
+class SearchIndex:
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._postings: dict[str, dict[tuple, int]] = defaultdict(dict)
+        self._documents: dict[tuple, tuple[str, int, tuple]] = {}
+        self._total_length = 0
+        self._terms: list[str] = []
+        self._terms_dirty = False
+        self.signature = None
+
+    def __len__(self):
+        return len(self._documents)
+
+    def add(self, kind: str, doc_id: int, title: str | None, description: str | None):
+        key = (kind, doc_id)
+        counts = Counter(tokenize(title) * TITLE_WEIGHT + tokenize(description))
+        with self._lock:
+            self._remove(key)
+            for term, count in counts.items():
+                postings = self._postings[term]
+                if not postings:
+                    self._terms_dirty = True
+                postings[key] = count
+            length = sum(counts.values())
+            self._documents[key] = (title or "", length, tuple(counts))
+            self._total_length += length
+
+    def remove(self, kind: str, doc_id: int):
+        with self._lock:
+            self._remove((kind, doc_id))
+
+    def _remove(self, key: tuple):
+        document = self._documents.pop(key, None)
+        if document is None:
+            return
+        _, length, terms = document
+        self._total_length -= length
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(key, None)
+                if not postings:
+                    del self._postings[term]
+                    self._terms_dirty = True
+
+    # Sorted vocabulary for prefix lookups, rebuilt lazily after the vocabulary changed
+    def _vocabulary(self) -> list[str]:
+        if self._terms_dirty:
+            self._terms = sorted(self._postings)
+            self._terms_dirty = False
+        return self._terms
+
+    def _prefix_terms(self, prefix: str) -> list[str]:
+        terms = self._vocabulary()
+        matches = []
+        for index in range(bisect_left(terms, prefix), len(terms)):
+            if not terms[index].startswith(prefix) or len(matches) >= MAX_EXPANSIONS:
+                break
+            matches.append(terms[index])
+        return matches
+
+    def _fuzzy_terms(self, term: str) -> list[str]:
+        max_distance = allowed_typos(term)
+        if not max_distance:
+            return []
+        # Candidates share the first character, typos in the first letter are not corrected
+        terms = self._vocabulary()
+        matches = []
+        for index in range(bisect_left(terms, term[0]), len(terms)):
+            candidate = terms[index]
+            if candidate[0] != term[0] or len(matches) >= MAX_EXPANSIONS:
+                break
+            if bounded_distance(term, candidate, max_distance) <= max_distance:
+                matches.append(candidate)
+        return matches
+
+    # Index terms matched by a query term with their weight: exact, prefix (last term) or typo corrected
+    def _expand(self, term: str, is_last: bool) -> dict[str, float]:
+        expanded = {}
+        if term in self._postings:
+            expanded[term] = 1.0
+        if is_last:
+            for candidate in self._prefix_terms(term):
+                expanded.setdefault(candidate, PREFIX_WEIGHT)
+        if not expanded:
+            for candidate in self._fuzzy_terms(term):
+                expanded.setdefault(candidate, FUZZY_WEIGHT)
+        return expanded
+
+    def search(self, query: str, limit: int = 20, kind: str | None = None) -> list[dict]:
+        query_terms = list(dict.fromkeys(tokenize(query)))
+        with self._lock:
+            total = len(self._documents)
+            if not total or not query_terms:
+                return []
+            average_length = self._total_length / total
+            scores: dict[tuple, float] = defaultdict(float)
+            for position, query_term in enumerate(query_terms):
+                best: dict[tuple, float] = {}
+                for term, weight in self._expand(query_term, position == len(query_terms) - 1).items():
+                    postings = self._postings[term]
+                    idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+                    for key, frequency in postings.items():
+                        if kind is not None and key[0] != kind:
+                            continue
+                        length = self._documents[key][1]
+                        score = weight * idf * frequency * (self.k1 + 1) / (frequency + self.k1 * (1 - self.b + self.b * length / average_length))
+                        # A query term contributes once per document, through its best matching index term
+                        if score > best.get(key, 0.0):
+                            best[key] = score
+                for key, score in best.items():
+                    scores[key] += score
+            ranked = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+            return [{"type": key[0], "id": key[1], "title": self._documents[key][0], "score": round(score, 4)} for key, score in ranked]
+
+    def clear(self):
+        with self._lock:
+            self._postings.clear()
+            self._documents.clear()
+            self._total_length = 0
+            self._terms = []
+            self._terms_dirty = False
+
+    # JSON snapshot (no pickle: a writable snapshot directory must not mean code execution at startup). A header
+    # line with the version and table signature, checked before the body is parsed, then documents and postings
+    # (flat kind, id, frequency triples per term). Written to a temp file of its own (several workers can save at
+    # once) and renamed into place
+    def save(self, path: Path):
+        with self._lock:
+            header = orjson.dumps({"version": SNAPSHOT_VERSION, "signature": self.signature, "total_length": self._total_length})
+            body = orjson.dumps({
+                "documents": [[kind, doc_id, title, length, list(terms)] for (kind, doc_id), (title, length, terms) in self._documents.items()],
+                "postings": {term: [value for (kind, doc_id), frequency in postings.items() for value in (kind, doc_id, frequency)] for term, postings in self._postings.items()},
+            })
+        with NamedTemporaryFile(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp", delete=False) as f:
+            try:
+                f.write(header + b"\n")
+                f.write(body)
+            except BaseException:
+                f.close()
+                os.unlink(f.name)
+                raise
+        os.replace(f.name, path)
+
+    # Loads a snapshot written by save(), only used when it matches the current table signature
+    def load(self, path: Path, signature) -> bool:
+        try:
+            with open(path, "rb") as f:
+                header = orjson.loads(f.readline())
+                # Signatures compare in their JSON form (tuples as lists, datetimes as ISO strings)
+                if not isinstance(header, dict) or header.get("version") != SNAPSHOT_VERSION or header.get("signature") != orjson.loads(orjson.dumps(signature)):
+                    return False
+                body = orjson.loads(f.read())
+            documents = {(kind, doc_id): (title, length, tuple(terms)) for kind, doc_id, title, length, terms in body["documents"]}
+            postings = {term: dict(zip(zip(values[0::3], values[1::3]), values[2::3])) for term, values in body["postings"].items()}
+            total_length = int(header["total_length"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return False
+        with self._lock:
+            self._postings = defaultdict(dict, postings)
+            self._documents = documents
+            self._total_length = total_length
+            self._terms_dirty = True
+            self.signature = signature
+        return True
+
+# Cheap fingerprint of the indexed tables: row count, highest id and the updated_at high-water mark of each.
+# Inserts, deletes and every update (title or description edits included) change it
+def table_signature(session: Session) -> tuple:
+    from ..models import Album, Song
+    return tuple(tuple(session.execute(select(func.count(model.id), func.max(model.id), func.max(model.updated_at))).one()) for model in (Song, Album))
+
+# The signature is taken before the rows are read, a write racing the build makes the snapshot look stale (rebuilt
+# at the next start) rather than current
+def build_from_database(session: Session, index: "SearchIndex"):
+    from ..models import Album, Song
+    signature = table_signature(session)
+    index.clear()
+    for kind, model in (("song", Song), ("album", Album)):
+        rows = session.execute(select(model.id, model.title, model.description).execution_options(yield_per=settings.SEARCH_BUILD_CHUNK_SIZE))
+        for doc_id, title, description in rows:
+            index.add(kind, doc_id, title, description)
+    index.signature = signature
+
+# Startup: snapshot when it is still current, otherwise a full build (and a fresh snapshot). The snapshot is only
+# written here, never at shutdown: a worker's index holds its own writes but not the ones other workers made
+def load_or_build(session: Session, index: "SearchIndex", snapshot_path: Path):
+    signature = table_signature(session)
+    if snapshot_path.is_file() and index.load(snapshot_path, signature):
+        return
+    build_from_database(session, index)
+    index.save(snapshot_path)
+
+search_index = SearchIndex()
+SNAPSHOT_PATH = Path(settings.SEARCH_SNAPSHOT_PATH)
@@ -1,18 +1,15 @@
-from passlib.context import CryptContext
 from datetime import timedelta
 from ..api.dependencies.auth import create_access_token, authenticate_user
 from fastapi import HTTPException, status
 from .config import settings
+from .hashing import bcrypt_context
 
 # Settings and constants
 minutes = settings.ACCESS_TOKEN_EXPIRE_MINUTES
 
-# Password hashing context
-bcrypt_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 # Dependency for authenticating user and creating an access token
-def authenticate_and_create_token(username: str, password: str, db):
-    user = authenticate_user(username, password, db)
+async def authenticate_and_create_token(username: str, password: str, db):
+    user = await authenticate_user(username, password, db)
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
     
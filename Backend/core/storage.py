@@ -0,0 +1,87 @@
+import os
+import stat
+import anyio
+from time import monotonic
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+from fastapi import HTTPException, status, UploadFile
+from .config import settings
+
+# Short lived cache of os.stat results for the media directories (None = missing file)
+class StatCache:
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._entries: dict[Path, tuple[float, os.stat_result | None]] = {}
+
+    def stat(self, path: Path) -> os.stat_result | None:
+        entry = self._entries.get(path)
+        now = monotonic()
+        if entry is not None and entry[0] > now:
+            return entry[1]
+        try:
+            result = path.stat()
+            if not stat.S_ISREG(result.st_mode):
+                result = None
+        except OSError:
+            result = None
+        self._entries[path] = (now + self.ttl, result)
+        return result
+
+    def invalidate(self, *paths: Path):
+        for path in paths:
+            self._entries.pop(path, None)
+
+stat_cache = StatCache(settings.MEDIA_STAT_CACHE_SECONDS)
+
+# File extension detected from the magic bytes, signatures map a byte prefix (or a callable check) to an extension
+def sniff_file_type(head: bytes, signatures: dict) -> str | None:
+    for signature, extension in signatures.items():
+        if signature(head) if callable(signature) else head.startswith(signature):
+            return extension
+    return None
+
+# Stored file of a record under any of the accepted extensions
+def find_file(directory: Path, name: str, extensions: list[str]) -> Path | None:
+    for extension in extensions:
+        path = directory / f"{name}{extension}"
+        if stat_cache.stat(path) is not None:
+            return path
+    return None
+
+# Stream the upload to a temp file in fixed size chunks and atomically rename it into place
+async def save_upload(file: UploadFile, directory: Path, name: str, signatures: dict, max_bytes: int, invalid_detail: str) -> Path:
+    chunk_size = settings.UPLOAD_CHUNK_SIZE
+    chunk = await file.read(chunk_size)
+    extension = sniff_file_type(chunk, signatures)
+    if extension is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=invalid_detail)
+    await anyio.to_thread.run_sync(lambda: directory.mkdir(parents=True, exist_ok=True))
+    temp = await anyio.to_thread.run_sync(lambda: NamedTemporaryFile(dir=directory, prefix=f".{name}.", suffix=".tmp", delete=False))
+    temp_path = Path(temp.name)
+    try:
+        size = 0
+        async with anyio.wrap_file(temp) as f:
+            while chunk:
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(status_code=413, detail=f"File too large. Maximum size is {max_bytes} bytes.")
+                await f.write(chunk)
+                chunk = await file.read(chunk_size)
+        path = directory / f"{name}{extension}"
+        await anyio.to_thread.run_sync(os.replace, temp_path, path)
+        stat_cache.invalidate(path)
+    except HTTPException:
+        await anyio.to_thread.run_sync(lambda: temp_path.unlink(missing_ok=True))
+        raise
+    except OSError:
+        await anyio.to_thread.run_sync(lambda: temp_path.unlink(missing_ok=True))
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="File failed to create")
+    # Drop the file stored under another extension so lookups stay unambiguous
+    await remove_files(directory, name, [other for other in dict.fromkeys(signatures.values()) if other != extension])
+    return path
+
+async def remove_files(directory: Path, name: str, extensions: list[str]):
+    for extension in extensions:
+        path = directory / f"{name}{extension}"
+        await anyio.to_thread.run_sync(lambda: path.unlink(missing_ok=True))
+        stat_cache.invalidate(path)
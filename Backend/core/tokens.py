@@ -0,0 +1,65 @@
+import hashlib
+from time import time
+from collections import OrderedDict
+from .config import settings
+from .rate_limit import rate_limit_backend
+
+def token_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+# Bounded LRU of verified JWT claims, entries expire together with the token ('exp')
+class TokenCache:
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: OrderedDict[str, dict] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> dict | None:
+        claims = self._entries.get(key)
+        if claims is None:
+            self.misses += 1
+            return None
+        if claims["exp"] <= time():
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return claims
+
+    def set(self, key: str, claims: dict):
+        self._entries[key] = claims
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def discard(self, key: str):
+        self._entries.pop(key, None)
+
+    def discard_user(self, user_id: int):
+        for key in [key for key, claims in self._entries.items() if claims["id"] == user_id]:
+            del self._entries[key]
+
+# Denylist of logged out tokens and force invalidated users, kept in the rate limit backend so a revocation
+# made on one worker holds on every worker with the shared (redis) backend. Only the verified claims stay local
+class TokenRevocations:
+    def __init__(self, backend, token_lifetime: float):
+        self.backend = backend
+        # Every token issued before a user revocation has expired once this has passed
+        self.token_lifetime = token_lifetime
+
+    async def revoke_token(self, key: str, expires: float):
+        if expires > time():
+            await self.backend.set_value(f"revoked:token:{key}", expires, expires - time())
+
+    async def revoke_user(self, user_id: int):
+        # Every token of the user issued up to now becomes invalid
+        await self.backend.set_value(f"revoked:user:{user_id}", time(), self.token_lifetime)
+
+    async def is_revoked(self, key: str, claims: dict) -> bool:
+        token_revoked, revoked_at = await self.backend.get_values(f"revoked:token:{key}", f"revoked:user:{claims['id']}")
+        return token_revoked is not None or (revoked_at is not None and claims.get("iat", 0) <= revoked_at)
+
+token_cache = TokenCache(settings.TOKEN_CACHE_SIZE)
+token_revocations = TokenRevocations(rate_limit_backend, settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60 + 60)
@@ -1 +1 @@
-from .db import engine, Base
\ No newline at end of file
+from .db import engine, async_engine, Base, ChangeStamp, utcnow
\ No newline at end of file
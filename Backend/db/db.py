@@ -1,12 +1,133 @@
-from sqlalchemy import create_engine
+from time import perf_counter
+from datetime import datetime, timezone
+from sqlalchemy import create_engine, event, DateTime
+from sqlalchemy.dialects import mysql
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from ..core.config import settings
 
 URL_DATABASE = settings.DATABASE_URL
+ASYNC_URL_DATABASE = settings.ASYNC_DATABASE_URL
+ASYNC_READ_URL_DATABASE = settings.ASYNC_READ_DATABASE_URL or ASYNC_URL_DATABASE
 
-engine = create_engine(URL_DATABASE)
+# Pragmas applied to every SQLite connection (local and benchmark runs). SQLite ignores foreign keys unless
+# asked to, without them a job deleting a parent row before its children would go unnoticed locally
+SQLITE_PRAGMAS = {
+    "foreign_keys": "ON",
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -64000,
+    "temp_store": "MEMORY",
+    "mmap_size": 268435456,
+    "busy_timeout": 5000,
+}
+
+def engine_options(url: str) -> dict:
+    options = {"pool_pre_ping": settings.DB_POOL_PRE_PING, "pool_recycle": settings.DB_POOL_RECYCLE}
+    if url.startswith("sqlite") and ":memory:" in url:
+        return options
+    return {**options, "pool_size": settings.DB_POOL_SIZE, "max_overflow": settings.DB_MAX_OVERFLOW, "pool_timeout": settings.DB_POOL_TIMEOUT}
+
+# Per connection setup: SQLite pragmas and the server side statement timeout
+def configure_connection(sync_engine):
+    dialect = sync_engine.dialect.name
+
+    @event.listens_for(sync_engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        statements = []
+        if dialect == "sqlite":
+            statements += [f"PRAGMA {name}={value}" for name, value in SQLITE_PRAGMAS.items()]
+        if settings.DB_STATEMENT_TIMEOUT_MS:
+            if dialect == "mysql":
+                statements.append(f"SET SESSION max_execution_time={settings.DB_STATEMENT_TIMEOUT_MS}")
+            elif dialect == "postgresql":
+                statements.append(f"SET statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}")
+        if statements:
+            cursor = dbapi_connection.cursor()
+            for statement in statements:
+                cursor.execute(statement)
+            cursor.close()
+
+# Pool checkout wait time and saturation, recorded when a session first acquires its connection
+class PoolMetrics:
+    def __init__(self, name: str, sync_engine):
+        self.name = name
+        self.pool = sync_engine.pool
+        self.checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record(self, waited: float):
+        self.checkouts += 1
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+
+    def metrics(self) -> dict:
+        capacity = settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW
+        checked_out = self.pool.checkedout() if hasattr(self.pool, "checkedout") else 0
+        return {
+            "checked_out": checked_out,
+            "capacity": capacity,
+            "saturation": checked_out / capacity if capacity else 0.0,
+            "checkouts": self.checkouts,
+            "wait_avg_seconds": self.wait_total / self.checkouts if self.checkouts else 0.0,
+            "wait_max_seconds": self.wait_max,
+        }
+
+# Synchronous engine (schema creation and scripts)
+engine = create_engine(URL_DATABASE, **engine_options(URL_DATABASE))
+configure_connection(engine)
 
 SessionLocal = sessionmaker(autocommit=False ,autoflush=False, bind=engine)
 
-Base = declarative_base()
\ No newline at end of file
+# Asynchronous engine used by the API request handlers
+async_engine = create_async_engine(ASYNC_URL_DATABASE, **engine_options(ASYNC_URL_DATABASE))
+configure_connection(async_engine.sync_engine)
+
+# Read replica engine for GET handlers, falls back to the primary when no replica is configured
+if ASYNC_READ_URL_DATABASE != ASYNC_URL_DATABASE:
+    async_read_engine = create_async_engine(ASYNC_READ_URL_DATABASE, **engine_options(ASYNC_READ_URL_DATABASE))
+    configure_connection(async_read_engine.sync_engine)
+else:
+    async_read_engine = async_engine
+
+primary_pool_metrics = PoolMetrics("primary", async_engine.sync_engine)
+replica_pool_metrics = PoolMetrics("replica", async_read_engine.sync_engine) if async_read_engine is not async_engine else primary_pool_metrics
+
+AsyncSessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False, bind=async_engine, class_=AsyncSession, info={"pool_metrics": primary_pool_metrics})
+
+ReadAsyncSessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False, bind=async_read_engine, class_=AsyncSession, info={"pool_metrics": replica_pool_metrics})
+
+# Sessions only check out a connection on their first statement (cache hits never do),
+# the wait is measured from that statement to the transaction begin
+@event.listens_for(Session, "do_orm_execute")
+def mark_checkout_start(orm_execute_state):
+    session = orm_execute_state.session
+    if "pool_metrics" in session.info and session.get_transaction() is None:
+        session.info["checkout_start"] = perf_counter()
+
+@event.listens_for(Session, "after_begin")
+def record_checkout_wait(session, transaction, connection):
+    start = session.info.pop("checkout_start", None)
+    if start is not None:
+        session.info["pool_metrics"].record(perf_counter() - start)
+
+# Open the first pool connections once at startup (connect hooks and dialect initialization),
+# so the first requests of every worker do not pay for them
+async def warm_up_pools(connections: int = settings.DB_POOL_WARMUP):
+    for warm_engine in {async_engine, async_read_engine}:
+        opened = [await warm_engine.connect() for _ in range(min(connections, settings.DB_POOL_SIZE))]
+        for connection in opened:
+            await connection.close()
+
+def pool_metrics() -> dict:
+    return {metrics.name: metrics.metrics() for metrics in (primary_pool_metrics, replica_pool_metrics)}
+
+Base = declarative_base()
+
+# Change stamps of catalogue rows, naive UTC with microseconds (MySQL DATETIME drops them unless fsp=6)
+ChangeStamp = DateTime().with_variant(mysql.DATETIME(fsp=6), "mysql")
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
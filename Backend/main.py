@@ -1,18 +1,107 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from Backend.api.routes import auth_router, user_router, album_router, song_router
-from Backend.db import engine, Base
+from fastapi.concurrency import run_in_threadpool
+from Backend.api.routes import auth_router, user_router, album_router, song_router, import_router, search_router, library_router, genre_router, metrics_router, profiling_router
+from Backend.db import engine
+from Backend.db.db import SessionLocal, async_engine, async_read_engine, warm_up_pools
+from Backend.core.config import settings
+from Backend.core.metrics import MetricsMiddleware, install_sql_hooks
+from Backend.core.compression import CompressionMiddleware
+from Backend.core.body_limit import BodySizeLimitMiddleware
+from Backend.core.profiling import ProfilingMiddleware, install_profile_sql_hooks
+from Backend.api.dependencies import is_admin_authorization
+from Backend.core.search import search_index, load_or_build, SNAPSHOT_PATH
+from Backend.core import recommendations
+from Backend.core.jobs import job_queue
+from Backend.core.catalogue_sync import catalogue_sync
+
+logger = logging.getLogger(__name__)
+
+# Recommendations: new ownership rows are applied every RECOMMEND_REFRESH_SECONDS, the snapshot is rebuilt
+# (or reloaded when another worker already rebuilt it) once it is older than RECOMMEND_REBUILD_SECONDS.
+# A failed refresh (database unavailable, unreadable snapshot) is logged and retried on the next tick
+async def refresh_recommendations():
+    def refresh():
+        with SessionLocal() as session:
+            recommendations.refresh(session, recommendations.recommendation_index, recommendations.SNAPSHOT_PATH, settings.RECOMMEND_REBUILD_SECONDS)
+    while True:
+        await asyncio.sleep(settings.RECOMMEND_REFRESH_SECONDS)
+        try:
+            await run_in_threadpool(refresh)
+        except Exception:
+            logger.exception("Recommendation refresh failed")
+
+# Job queue depth for /metrics, read from the database in the background so scrapes run no query
+async def refresh_job_metrics():
+    while True:
+        try:
+            await job_queue.refresh_metrics()
+        except Exception:
+            logger.exception("Job queue metrics refresh failed")
+        await asyncio.sleep(settings.METRICS_REFRESH_SECONDS)
+
+# Startup warms the connection pools, loads the search index from its snapshot (or builds it from the tables)
+# and maps the recommendation snapshot, then starts the catalogue change polling (deletions made by job workers
+# of any process), the job queue depth refresh for /metrics and the JOB_WORKERS background job workers. At shutdown the workers get JOB_SHUTDOWN_SECONDS
+# to finish their jobs and the async pools are closed.
+# The schema is managed by migrations (python -m Backend.cli init-db)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    def load_index():
+        with SessionLocal() as session:
+            load_or_build(session, search_index, SNAPSHOT_PATH)
+            recommendations.load_or_build(session, recommendations.recommendation_index, recommendations.SNAPSHOT_PATH)
+    await warm_up_pools()
+    await catalogue_sync.start_position()
+    await run_in_threadpool(load_index)
+    refresh_task = asyncio.create_task(refresh_recommendations()) if settings.RECOMMEND_REFRESH_SECONDS > 0 else None
+    sync_task = asyncio.create_task(catalogue_sync.run()) if settings.CATALOGUE_SYNC_SECONDS > 0 else None
+    metrics_task = asyncio.create_task(refresh_job_metrics()) if settings.METRICS_ENABLED and settings.METRICS_REFRESH_SECONDS > 0 else None
+    job_queue.start(settings.JOB_WORKERS)
+    yield
+    for task in (refresh_task, sync_task, metrics_task):
+        if task is not None:
+            task.cancel()
+    await job_queue.stop(settings.JOB_SHUTDOWN_SECONDS)
+    # Pooled connections belong to this event loop, close them with it
+    await async_engine.dispose()
+    await async_read_engine.dispose()
 
 # Create instance of an FastApi app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Include API routers
 app.include_router(user_router)
 app.include_router(album_router)
 app.include_router(song_router)
 app.include_router(auth_router)
+app.include_router(import_router)
+app.include_router(search_router)
+app.include_router(library_router)
+app.include_router(genre_router)
+
+# Request bodies capped per route (upload limits, REQUEST_MAX_BYTES otherwise) before they are parsed or spooled
+app.add_middleware(BodySizeLimitMiddleware)
+
+# Negotiated gzip/br/zstd compression of JSON, NDJSON and text bodies above COMPRESSION_MIN_SIZE
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
+
+# Request and SQL instrumentation, nothing is installed when metrics are disabled
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    for instrumented_engine in {engine, async_engine.sync_engine, async_read_engine.sync_engine}:
+        install_sql_hooks(instrumented_engine)
+    app.include_router(metrics_router)
 
-# Initialize and create the database tables
-Base.metadata.create_all(bind=engine)
+# Opt-in profiling (admin X-Profile requests and the slowest sampled requests per route), nothing is installed when disabled
+if settings.PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware, authorize=is_admin_authorization)
+    for profiled_engine in {engine, async_engine.sync_engine, async_read_engine.sync_engine}:
+        install_profile_sql_hooks(profiled_engine)
+    app.include_router(profiling_router)
 
 # Default route
 @app.get("/")
@@ -0,0 +1,31 @@
+from logging.config import fileConfig
+from alembic import context
+from sqlalchemy import create_engine
+from Backend.core.config import settings
+from Backend.db import Base
+from Backend import models
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+# Emit SQL without a database connection (alembic upgrade head --sql)
+def run_migrations_offline():
+    context.configure(url=settings.DATABASE_URL, target_metadata=target_metadata, literal_binds=True, render_as_batch=True)
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online():
+    connectable = create_engine(settings.DATABASE_URL)
+    with connectable.connect() as connection:
+        # Batch mode lets SQLite recreate tables for constraint changes
+        context.configure(connection=connection, target_metadata=target_metadata, render_as_batch=True)
+        with context.begin_transaction():
+            context.run_migrations()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
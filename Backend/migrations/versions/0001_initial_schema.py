@@ -0,0 +1,66 @@
+"""Initial schema (tables as created by Base.metadata.create_all before migrations)
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        'users',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('username', sa.String(50), unique=True),
+        sa.Column('first_name', sa.String(50)),
+        sa.Column('last_name', sa.String(50)),
+        sa.Column('email', sa.String(100), unique=True),
+        sa.Column('gender', sa.Enum('Male', 'Female', 'Other', name='gender'), nullable=False),
+        sa.Column('password_hash', sa.String(128)),
+        sa.Column('wallet', sa.String(50), nullable=True),
+        sa.Column('is_admin', sa.Boolean()),
+    )
+    op.create_index('ix_users_id', 'users', ['id'])
+    op.create_table(
+        'genres',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('genre', sa.String(50), unique=True),
+    )
+    op.create_index('ix_genres_id', 'genres', ['id'])
+    op.create_table(
+        'albums',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('title', sa.String(50), unique=True),
+        sa.Column('description', sa.String(500)),
+        sa.Column('genre', sa.Integer(), sa.ForeignKey('genres.id')),
+    )
+    op.create_index('ix_albums_id', 'albums', ['id'])
+    op.create_table(
+        'songs',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('title', sa.String(50), unique=True),
+        sa.Column('description', sa.String(500)),
+        sa.Column('genre', sa.Integer(), sa.ForeignKey('genres.id')),
+        sa.Column('album_fk', sa.Integer(), sa.ForeignKey('albums.id')),
+    )
+    op.create_index('ix_songs_id', 'songs', ['id'])
+    op.create_table(
+        'songs_owned',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('song_fk', sa.Integer(), sa.ForeignKey('songs.id')),
+        sa.Column('user_fk', sa.Integer(), sa.ForeignKey('users.id')),
+        sa.Column('create_date', sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index('ix_songs_owned_id', 'songs_owned', ['id'])
+
+def downgrade():
+    op.drop_table('songs_owned')
+    op.drop_table('songs')
+    op.drop_table('albums')
+    op.drop_table('genres')
+    op.drop_table('users')
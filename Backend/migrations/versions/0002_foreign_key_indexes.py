@@ -0,0 +1,34 @@
+"""Foreign key indexes and unique (user_fk, song_fk) on songs_owned
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_index('ix_songs_album_fk', 'songs', ['album_fk'])
+    op.create_index('ix_songs_genre', 'songs', ['genre'])
+    op.create_index('ix_albums_genre', 'albums', ['genre'])
+    op.create_index('ix_songs_owned_song_fk', 'songs_owned', ['song_fk'])
+    # Keep the oldest row of every duplicated ownership before adding the constraint
+    op.execute(
+        "DELETE FROM songs_owned WHERE id NOT IN ("
+        "SELECT keep_id FROM (SELECT MIN(id) AS keep_id FROM songs_owned GROUP BY user_fk, song_fk) AS keep)"
+    )
+    with op.batch_alter_table('songs_owned') as batch_op:
+        batch_op.create_unique_constraint('uq_songs_owned_user_song', ['user_fk', 'song_fk'])
+
+def downgrade():
+    with op.batch_alter_table('songs_owned') as batch_op:
+        batch_op.drop_constraint('uq_songs_owned_user_song', type_='unique')
+    op.drop_index('ix_songs_owned_song_fk', table_name='songs_owned')
+    op.drop_index('ix_albums_genre', table_name='albums')
+    op.drop_index('ix_songs_genre', table_name='songs')
+    op.drop_index('ix_songs_album_fk', table_name='songs')
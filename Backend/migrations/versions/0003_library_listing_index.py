@@ -0,0 +1,19 @@
+"""Index for the per-user library listing ordered by create_date
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_index('ix_songs_owned_user_created', 'songs_owned', ['user_fk', 'create_date', 'id'])
+
+def downgrade():
+    op.drop_index('ix_songs_owned_user_created', table_name='songs_owned')
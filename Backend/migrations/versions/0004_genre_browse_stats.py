@@ -0,0 +1,43 @@
+"""Precomputed genre counts and per song owner counts for genre browsing
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    with op.batch_alter_table('genres') as batch_op:
+        batch_op.add_column(sa.Column('song_count', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('album_count', sa.Integer(), nullable=False, server_default='0'))
+    op.create_table(
+        'song_stats',
+        sa.Column('song_fk', sa.Integer(), sa.ForeignKey('songs.id'), primary_key=True),
+        sa.Column('genre', sa.Integer(), sa.ForeignKey('genres.id')),
+        sa.Column('owner_count', sa.Integer(), nullable=False, server_default='0'),
+    )
+    op.create_index('ix_song_stats_genre_owners', 'song_stats', ['genre', 'owner_count', 'song_fk'])
+    # One time backfill from the existing rows, afterwards the writes keep the counts current
+    op.execute(
+        "UPDATE genres SET "
+        "song_count = (SELECT COUNT(*) FROM songs WHERE songs.genre = genres.id), "
+        "album_count = (SELECT COUNT(*) FROM albums WHERE albums.genre = genres.id)"
+    )
+    op.execute(
+        "INSERT INTO song_stats (song_fk, genre, owner_count) "
+        "SELECT songs.id, songs.genre, COUNT(songs_owned.id) FROM songs LEFT JOIN songs_owned ON songs_owned.song_fk = songs.id "
+        "GROUP BY songs.id, songs.genre"
+    )
+
+def downgrade():
+    op.drop_index('ix_song_stats_genre_owners', table_name='song_stats')
+    op.drop_table('song_stats')
+    with op.batch_alter_table('genres') as batch_op:
+        batch_op.drop_column('album_count')
+        batch_op.drop_column('song_count')
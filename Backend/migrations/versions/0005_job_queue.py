@@ -0,0 +1,38 @@
+"""Durable background job queue
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        'jobs',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('kind', sa.String(50), nullable=False),
+        sa.Column('payload', sa.Text(), nullable=False),
+        sa.Column('dedupe_key', sa.String(200), unique=True, nullable=True),
+        sa.Column('status', sa.String(20), nullable=False, server_default='queued'),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('run_after', sa.DateTime(), nullable=False),
+        sa.Column('locked_by', sa.String(100), nullable=True),
+        sa.Column('locked_until', sa.DateTime(), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+    )
+    op.create_index('ix_jobs_id', 'jobs', ['id'])
+    op.create_index('ix_jobs_status_run_after', 'jobs', ['status', 'run_after'])
+
+def downgrade():
+    op.drop_index('ix_jobs_status_run_after', table_name='jobs')
+    op.drop_index('ix_jobs_id', table_name='jobs')
+    op.drop_table('jobs')
@@ -0,0 +1,29 @@
+"""Change stamps on songs and albums for the search snapshot
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+CHANGE_STAMP = sa.DateTime().with_variant(mysql.DATETIME(fsp=6), 'mysql')
+
+def upgrade():
+    # Existing rows keep a NULL stamp, the first snapshot after the upgrade is rebuilt anyway (new format)
+    for table in ('songs', 'albums'):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.add_column(sa.Column('updated_at', CHANGE_STAMP, nullable=True))
+        op.create_index(f'ix_{table}_updated_at', table, ['updated_at'])
+
+def downgrade():
+    for table in ('albums', 'songs'):
+        op.drop_index(f'ix_{table}_updated_at', table_name=table)
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('updated_at')
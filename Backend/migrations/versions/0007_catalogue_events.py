@@ -0,0 +1,28 @@
+"""Catalogue change feed for the caches and search indexes of every worker
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        'catalogue_events',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('kind', sa.String(20), nullable=False),
+        sa.Column('row_id', sa.Integer(), nullable=False),
+        sa.Column('action', sa.String(10), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+    )
+    op.create_index('ix_catalogue_events_created_at', 'catalogue_events', ['created_at'])
+
+def downgrade():
+    op.drop_index('ix_catalogue_events_created_at', table_name='catalogue_events')
+    op.drop_table('catalogue_events')
@@ -2,4 +2,7 @@ from .user import User
 from .song import Song
 from .album import Album
 from .genre import Genre
-from .songs_owned import Songs_owned
\ No newline at end of file
+from .songs_owned import Songs_owned
+from .song_stats import Song_stats
+from .job import Job
+from .catalogue_event import CatalogueEvent
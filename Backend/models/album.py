@@ -1,7 +1,7 @@
 from sqlalchemy import Column, Integer, String, ForeignKey
 from sqlalchemy.orm import relationship
 
-from ..db import Base
+from ..db import Base, ChangeStamp, utcnow
 
 class Album(Base):
     __tablename__ = 'albums'
@@ -9,4 +9,6 @@ class Album(Base):
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(50), unique=True)
     description = Column(String(500), unique=False)
-    genre = Column(Integer, ForeignKey('genres.id'))
\ No newline at end of file
+    genre = Column(Integer, ForeignKey('genres.id'), index=True)
+    # Last insert or update, the search index snapshot is only reused while the high-water mark is unchanged
+    updated_at = Column(ChangeStamp, default=utcnow, onupdate=utcnow, index=True)
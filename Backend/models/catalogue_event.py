@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, String, DateTime, Index
+from ..db import Base
+
+class CatalogueEvent(Base):
+    __tablename__ = 'catalogue_events'
+    # Catalogue rows deleted ("deleted") or changed ("changed") by background jobs in any process, polled by every
+    # API worker in id order to drop them from its read-through cache (and deleted ones from its search index).
+    # Pruned after CATALOGUE_EVENT_RETENTION_HOURS
+    __table_args__ = (
+        Index('ix_catalogue_events_created_at', 'created_at'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(20), nullable=False)
+    row_id = Column(Integer, nullable=False)
+    action = Column(String(10), nullable=False)
+    created_at = Column(DateTime, nullable=False)
@@ -5,4 +5,7 @@ class Genre(Base):
     __tablename__ = 'genres'
 
     id = Column(Integer, primary_key=True, index=True)
-    genre = Column(String(50), unique=True)
\ No newline at end of file
+    genre = Column(String(50), unique=True)
+    # Precomputed counts for genre browsing, adjusted by the song and album writes
+    song_count = Column(Integer, nullable=False, default=0, server_default="0")
+    album_count = Column(Integer, nullable=False, default=0, server_default="0")
@@ -0,0 +1,25 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index
+from ..db import Base
+
+class Job(Base):
+    __tablename__ = 'jobs'
+    # Durable queue of deferred work (cascading deletes, file work). Workers claim due jobs by
+    # (status, run_after), a running job whose lease (locked_until) expired is claimed again.
+    # dedupe_key is unique while the job is pending and released when it finishes
+    __table_args__ = (
+        Index('ix_jobs_status_run_after', 'status', 'run_after'),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String(50), nullable=False)
+    payload = Column(Text, nullable=False)
+    dedupe_key = Column(String(200), unique=True, nullable=True)
+    status = Column(String(20), nullable=False, default="queued", server_default="queued")
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    run_after = Column(DateTime, nullable=False)
+    locked_by = Column(String(100), nullable=True)
+    locked_until = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
@@ -1,5 +1,5 @@
 from sqlalchemy import Column, Integer, String, ForeignKey
-from ..db import Base
+from ..db import Base, ChangeStamp, utcnow
 
 class Song(Base):
     __tablename__ = 'songs'
@@ -7,5 +7,7 @@ class Song(Base):
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(50), unique=True)
     description = Column(String(500), unique=False)
-    genre = Column(Integer, ForeignKey('genres.id'))
-    album_fk = Column(Integer, ForeignKey('albums.id'))
\ No newline at end of file
+    genre = Column(Integer, ForeignKey('genres.id'), index=True)
+    album_fk = Column(Integer, ForeignKey('albums.id'), index=True)
+    # Last insert or update, the search index snapshot is only reused while the high-water mark is unchanged
+    updated_at = Column(ChangeStamp, default=utcnow, onupdate=utcnow, index=True)
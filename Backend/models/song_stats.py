@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, ForeignKey, Index
+from ..db import Base
+
+class Song_stats(Base):
+    __tablename__ = 'song_stats'
+    # Owner count per song, adjusted by library writes. The most owned in genre ranking
+    # walks (genre, owner_count, song_fk) instead of grouping songs_owned
+    __table_args__ = (
+        Index('ix_song_stats_genre_owners', 'genre', 'owner_count', 'song_fk'),
+    )
+
+    song_fk = Column(Integer, ForeignKey('songs.id'), primary_key=True)
+    genre = Column(Integer, ForeignKey('genres.id'))
+    owner_count = Column(Integer, nullable=False, default=0, server_default="0")
@@ -1,11 +1,17 @@
-from sqlalchemy import Column, Integer, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, UniqueConstraint, Index
 from sqlalchemy.sql import func
 from ..db import Base
 
 class Songs_owned(Base):
     __tablename__ = 'songs_owned'
-      
+    # A song is owned at most once per user, the constraint also indexes lookups by user_fk.
+    # The library listing walks (user_fk, create_date, id) newest first
+    __table_args__ = (
+        UniqueConstraint('user_fk', 'song_fk', name='uq_songs_owned_user_song'),
+        Index('ix_songs_owned_user_created', 'user_fk', 'create_date', 'id'),
+    )
+
     id = Column(Integer, primary_key=True, index=True)
-    song_fk = Column(Integer, ForeignKey('songs.id'))
+    song_fk = Column(Integer, ForeignKey('songs.id'), index=True)
     user_fk = Column(Integer, ForeignKey('users.id'))
     create_date = Column(DateTime(timezone=True), server_default=func.now())
@@ -1,5 +1,8 @@
-from .user import UpdateUserBase, UserBase, CreateUserBase, Config
-from .album import AlbumBase, UpdateAlbumBase, Config
-from .response import SuccessResponse
-from .song import SongBase, UpdateSongBase
-from .token import Token
\ No newline at end of file
+from .user import UpdateUserBase, UserBase, CreateUserBase, UserRead
+from .album import AlbumBase, UpdateAlbumBase, AlbumRead
+from .response import SuccessResponse, Page, Batch
+from .song import SongBase, UpdateSongBase, SongRead
+from .token import Token
+from .library import LibrarySongsBase, LibraryChangeResponse, OwnershipResponse
+from .recommendation import ScoredSong, SongRecommendations
+from .genre import GenreRead
@@ -0,0 +1,9 @@
+from pydantic import BaseModel, ConfigDict
+
+class GenreRead(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    genre: str | None = None
+    song_count: int = 0
+    album_count: int = 0
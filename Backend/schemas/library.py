@@ -0,0 +1,13 @@
+from pydantic import BaseModel, Field
+from typing import List
+
+class LibrarySongsBase(BaseModel):
+    song_ids: List[int] = Field(min_length=1, max_length=1000)
+
+class LibraryChangeResponse(BaseModel):
+    detail: str
+    count: int
+
+class OwnershipResponse(BaseModel):
+    owned: List[int]
+    not_owned: List[int]
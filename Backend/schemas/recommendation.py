@@ -0,0 +1,9 @@
+from pydantic import BaseModel
+from typing import List
+
+class ScoredSong(BaseModel):
+    id: int
+    score: float
+
+class SongRecommendations(BaseModel):
+    items: List[ScoredSong]
@@ -1,4 +1,13 @@
 from pydantic import BaseModel
+from typing import List
 
 class SuccessResponse(BaseModel):
-    detail: str
\ No newline at end of file
+    detail: str
+
+class Page(BaseModel):
+    items: List[dict]
+    next_after: int | None = None
+
+class Batch(BaseModel):
+    items: List[dict | None]
+    missing: List[int]
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 
 class SongBase(BaseModel):
     title: str
@@ -10,6 +10,11 @@ class UpdateSongBase(BaseModel):
     description: str | None = None
     genre: int | None = None
 
-class Config:
-    orm_mode = True
-    use_enum_values = True
\ No newline at end of file
+class SongRead(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    title: str | None = None
+    description: str | None = None
+    genre: int | None = None
+    album_fk: int | None = None
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from typing import Optional
 from ..models.user import Gender
 
@@ -28,6 +28,14 @@ class UpdateUserBase(BaseModel):
     password_hash: str | None = None
     is_admin: bool = Optional[False]
 
-class Config:
-    orm_mode = True
-    use_enum_values = True
\ No newline at end of file
+# Single user read, the private fields are cleared for other users without admin permisions
+class UserRead(BaseModel):
+    model_config = ConfigDict(from_attributes=True, use_enum_values=True)
+
+    username: str | None = None
+    first_name: str | None = None
+    last_name: str | None = None
+    email: str | None = None
+    gender: Gender | None = None
+    password_hash: str | None = None
+    is_admin: bool | None = False
@@ -0,0 +1,63 @@
+import os
+import shutil
+import tempfile
+from pathlib import Path
+import pytest
+
+# Settings are read from the environment at import: a throwaway SQLite database and snapshots, metrics on
+# (statement counts), no background work (job workers, recommendation refresh, catalogue sync) and no rate limits
+TEST_DIR = Path(tempfile.mkdtemp(prefix="betterspotify_tests_"))
+os.environ.update({
+    "SELECTED_DB": "SQLite",
+    "DB_SQLITE_PATH": str(TEST_DIR / "tests.db"),
+    "SEARCH_SNAPSHOT_PATH": str(TEST_DIR / "search.snapshot"),
+    "RECOMMEND_SNAPSHOT_PATH": str(TEST_DIR / "recommendations.snapshot"),
+    "METRICS_ENABLED": "true",
+    "JOB_WORKERS": "0",
+    "RECOMMEND_REFRESH_SECONDS": "0",
+    "CATALOGUE_SYNC_SECONDS": "0",
+    "RATE_LIMIT_ENABLED": "false",
+})
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(TEST_DIR, ignore_errors=True)
+
+# Small deterministic catalogue from the benchmark seeder: user 1 is the admin, user 2 owns 30 songs
+TEST_SCALE = {"users": 10, "genres": 3, "albums": 5, "songs": 50, "owned_per_user": 5, "heavy_user_songs": 30}
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    from Backend.db import engine
+    from Backend.benchmarks.seed import seed_database
+    from Backend.main import app
+    seed_database(engine, TEST_SCALE, 1)
+    with TestClient(app) as test_client:
+        yield test_client
+
+def login(client, username: str) -> dict:
+    from Backend.benchmarks.seed import PASSWORD
+    response = client.post("/auth/token", data={"username": username, "password": PASSWORD})
+    assert response.status_code == 201
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+@pytest.fixture(scope="session")
+def admin_headers(client) -> dict:
+    return login(client, "admin")
+
+@pytest.fixture(scope="session")
+def user_headers(client) -> dict:
+    return login(client, "user3")
+
+# SQL statements of the next requests, as counted by the metrics middleware (RequestStats of the request)
+@pytest.fixture
+def statements(monkeypatch):
+    from Backend.core import metrics
+    counts = []
+    observe = metrics.db_queries_per_request.observe
+
+    def record(value, *labels):
+        counts.append(value)
+        observe(value, *labels)
+    monkeypatch.setattr(metrics.db_queries_per_request, "observe", record)
+    return counts
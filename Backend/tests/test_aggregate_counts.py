@@ -0,0 +1,104 @@
+import pytest
+from sqlalchemy import select, func, text
+
+# Browse aggregates after library and delete writes, with RETURNING and with the single UPDATE fallback of
+# backends without it (MySQL)
+@pytest.fixture(params=[True, False], ids=["returning", "no_returning"])
+def returning(request, monkeypatch):
+    from Backend.db.db import async_engine
+    for flag in ("insert_returning", "delete_returning"):
+        monkeypatch.setattr(async_engine.dialect, flag, request.param)
+    return request.param
+
+def owner_count(song_id: int) -> int:
+    from Backend.db.db import SessionLocal
+    from Backend import models
+    with SessionLocal() as session:
+        return session.scalar(select(models.Song_stats.owner_count).where(models.Song_stats.song_fk == song_id))
+
+def genre_song_count(genre_id: int) -> tuple[int, int]:
+    from Backend.db.db import SessionLocal
+    from Backend import models
+    with SessionLocal() as session:
+        stored = session.scalar(select(models.Genre.song_count).where(models.Genre.id == genre_id))
+        return stored, session.scalar(select(func.count(models.Song.id)).where(models.Song.genre == genre_id))
+
+# copies > 1 runs the job concurrently, as two workers do when a lease is taken over from a live worker
+def run_job(client, kind: str, payload: dict, copies: int = 1):
+    import asyncio
+    from Backend.core.jobs import JOB_HANDLERS
+    from Backend.db.db import AsyncSessionLocal
+
+    async def run_one():
+        async with AsyncSessionLocal() as db:
+            await JOB_HANDLERS[kind](db, payload)
+
+    async def run():
+        await asyncio.gather(*(run_one() for _ in range(copies)))
+    client.portal.call(run)
+
+def test_library_owner_counts(client, user_headers, returning):
+    before = {song_id: owner_count(song_id) for song_id in (44, 45)}
+    response = client.post("/library/me/songs", json={"song_ids": [44, 45, 999999]}, headers=user_headers)
+    assert response.json()["count"] == 2
+    # Already owned songs are neither inserted nor counted again
+    response = client.post("/library/me/songs", json={"song_ids": [44, 45]}, headers=user_headers)
+    assert response.json()["count"] == 0
+    assert {song_id: owner_count(song_id) for song_id in (44, 45)} == {song_id: count + 1 for song_id, count in before.items()}
+    response = client.request("DELETE", "/library/me/songs", json={"song_ids": [44, 45]}, headers=user_headers)
+    assert response.json()["count"] == 2
+    response = client.request("DELETE", "/library/me/songs", json={"song_ids": [44, 45]}, headers=user_headers)
+    assert response.json()["count"] == 0
+    assert {song_id: owner_count(song_id) for song_id in (44, 45)} == before
+
+def test_delete_song_genre_count(client, admin_headers, returning):
+    title = f"aggregate song {returning}"
+    assert client.post("/song/api/album/1/song", json={"title": title, "description": "d", "genre": 2}, headers=admin_headers).status_code == 201
+    song_id = client.get("/song/all?limit=1000", headers=admin_headers).json()["items"][-1]["id"]
+    stored, actual = genre_song_count(2)
+    assert stored == actual
+    run_job(client, "delete_song", {"song_id": song_id})
+    # A retried job finds no row and changes no count
+    run_job(client, "delete_song", {"song_id": song_id})
+    assert genre_song_count(2) == (stored - 1, actual - 1)
+
+def drifted_owner_counts() -> int:
+    from Backend.db.db import SessionLocal
+    from Backend import models
+    owners = select(models.Songs_owned.song_fk, func.count(models.Songs_owned.id).label("owners")).group_by(models.Songs_owned.song_fk).subquery()
+    with SessionLocal() as session:
+        return session.scalar(select(func.count()).select_from(models.Song_stats).outerjoin(owners, owners.c.song_fk == models.Song_stats.song_fk).where(models.Song_stats.owner_count != func.coalesce(owners.c.owners, 0)))
+
+# Batches decrement the rows they deleted: a second worker running the same batches (lease takeover) or a retried
+# job finds the rows gone and changes no count
+def test_delete_user_owner_counts(client, returning, monkeypatch):
+    from Backend.core.config import settings
+    monkeypatch.setattr(settings, "JOB_BATCH_SIZE", 2)
+    user_id = 5 if returning else 6
+    assert drifted_owner_counts() == 0
+    run_job(client, "delete_user", {"user_id": user_id}, copies=2)
+    run_job(client, "delete_user", {"user_id": user_id})
+    assert drifted_owner_counts() == 0
+
+def album_row(album_title: str):
+    from Backend.db.db import SessionLocal
+    from Backend import models
+    with SessionLocal() as session:
+        return session.scalar(select(models.Album.id).where(models.Album.title == album_title))
+
+# Foreign keys are enforced on SQLite too: the job detaches the songs before deleting the album, they stay in the
+# catalogue without an album
+def test_delete_album_with_songs(client, admin_headers, returning):
+    from Backend.db.db import SessionLocal
+    from Backend import models
+    title = f"aggregate album {returning}"
+    assert client.post("/album/", json={"title": title, "description": "d", "genre": 1}, headers=admin_headers).status_code == 201
+    album_id = album_row(title)
+    for number in range(3):
+        assert client.post(f"/song/api/album/{album_id}/song", json={"title": f"{title} song {number}", "description": "d", "genre": 1}, headers=admin_headers).status_code == 201
+    run_job(client, "delete_album", {"album_id": album_id})
+    assert album_row(title) is None
+    with SessionLocal() as session:
+        albums = session.scalars(select(models.Song.album_fk).where(models.Song.title.startswith(f"{title} song"))).all()
+        assert session.execute(text("PRAGMA foreign_key_check")).all() == []
+    assert albums == [None, None, None]
@@ -0,0 +1,28 @@
+import random
+
+AUDIO = b"ID3" + random.Random(7).randbytes(300 * 1024)
+
+def upload(client, admin_headers, song_id: int):
+    response = client.post(f"/song/{song_id}/audio", files={"file": ("ranges.mp3", AUDIO, "audio/mpeg")}, headers=admin_headers)
+    assert response.status_code == 200, response.text
+
+# Seeking and resuming: single ranges, open ended ranges, If-Range with a stale validator and unsatisfiable ranges
+def test_audio_ranges(client, admin_headers, user_headers):
+    upload(client, admin_headers, 40)
+    whole = client.get("/song/40/stream", headers=user_headers)
+    assert whole.status_code == 200 and whole.content == AUDIO
+    assert whole.headers["accept-ranges"] == "bytes"
+    etag = whole.headers["etag"]
+    assert client.get("/song/40/stream", headers={**user_headers, "If-None-Match": etag}).status_code == 304
+
+    seek = client.get("/song/40/stream", headers={**user_headers, "Range": "bytes=1000-70999"})
+    assert seek.status_code == 206 and seek.content == AUDIO[1000:71000]
+    assert seek.headers["content-range"] == f"bytes 1000-70999/{len(AUDIO)}"
+    resume = client.get("/song/40/stream", headers={**user_headers, "Range": "bytes=200000-", "If-Range": etag})
+    assert resume.status_code == 206 and resume.content == AUDIO[200000:]
+    stale = client.get("/song/40/stream", headers={**user_headers, "Range": "bytes=200000-", "If-Range": '"outdated"'})
+    assert stale.status_code == 200 and stale.content == AUDIO
+
+    beyond = client.get("/song/40/stream", headers={**user_headers, "Range": f"bytes={len(AUDIO)}-"})
+    assert beyond.status_code == 416
+    assert beyond.headers["content-range"] == f"bytes */{len(AUDIO)}"
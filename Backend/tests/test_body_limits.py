@@ -0,0 +1,34 @@
+import pytest
+
+@pytest.fixture
+def small_image_limit(monkeypatch):
+    from Backend.core.config import settings
+    monkeypatch.setattr(settings, "IMAGE_UPLOAD_MAX_BYTES", 100 * 1024)
+
+def multipart(size: int) -> tuple[bytes, str]:
+    boundary = "limitboundary"
+    body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"big.jpg\"\r\nContent-Type: image/jpeg\r\n\r\n").encode() + b"\xff\xd8\xff" + b"\0" * size + f"\r\n--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+# Rejected from the Content-Length alone, before the multipart body is read or spooled
+def test_declared_oversized_upload_is_rejected_up_front(client, user_headers, small_image_limit):
+    body, content_type = multipart(1024 * 1024)
+    response = client.post("/user/me/profile-image/", content=body, headers={**user_headers, "Content-Type": content_type})
+    assert response.status_code == 413
+    assert response.json()["detail"].startswith("Request body too large")
+
+# Without a Content-Length (chunked) the body is cut off once it passes the limit
+def test_streamed_oversized_upload_is_cut_off(client, user_headers, small_image_limit):
+    body, content_type = multipart(1024 * 1024)
+
+    def chunks():
+        for start in range(0, len(body), 16 * 1024):
+            yield body[start:start + 16 * 1024]
+    response = client.post("/user/me/profile-image/", content=chunks(), headers={**user_headers, "Content-Type": content_type})
+    assert response.status_code == 413
+    assert response.json()["detail"].startswith("Request body too large")
+
+def test_json_body_limit(client, user_headers):
+    from Backend.core.config import settings
+    response = client.post("/library/me/songs", content=b'{"song_ids": [' + b"1," * settings.REQUEST_MAX_BYTES + b'1]}', headers={**user_headers, "Content-Type": "application/json"})
+    assert response.status_code == 413
@@ -0,0 +1,26 @@
+# A deletion made by a job in another process reaches this worker through catalogue_events: the cached row and
+# the search document are dropped at the next poll
+def test_job_deletion_reaches_other_workers(client, admin_headers):
+    from sqlalchemy import delete
+    from Backend import models
+    from Backend.db.db import AsyncSessionLocal
+    from Backend.core.catalogue_sync import catalogue_sync, record_changes
+
+    response = client.post("/song/api/album/1/song", json={"title": "zyxwv sync song", "description": "d", "genre": 1}, headers=admin_headers)
+    assert response.status_code == 201
+    song_id = client.get("/search?q=zyxwv", headers=admin_headers).json()["results"][0]["id"]
+    assert client.get(f"/song/{song_id}", headers=admin_headers).status_code == 200
+
+    # What delete_song_job commits when it runs elsewhere (no local invalidation in this process)
+    async def delete_elsewhere():
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(models.Song_stats).where(models.Song_stats.song_fk == song_id))
+            await db.execute(delete(models.Song).where(models.Song.id == song_id))
+            await record_changes(db, "song", [song_id], "deleted")
+            await db.commit()
+    client.portal.call(delete_elsewhere)
+    # Until the poll the cached row is still served
+    assert client.get(f"/song/{song_id}", headers=admin_headers).status_code == 200
+    assert client.portal.call(catalogue_sync.poll) >= 1
+    assert client.get(f"/song/{song_id}", headers=admin_headers).status_code == 404
+    assert client.get("/search?q=zyxwv", headers=admin_headers).json()["results"] == []
@@ -0,0 +1,110 @@
+import os
+import sys
+import time
+import signal
+import subprocess
+from pathlib import Path
+from sqlalchemy import select
+
+REPO_ROOT = Path(__file__).resolve().parent.parent.parent
+
+# Worker process with a test job kind: the first attempt hangs (the worker is killed during it), later ones return
+WORKER = """
+import sys
+import asyncio
+from pathlib import Path
+from Backend.core.jobs import job_handler, job_queue
+
+attempts = Path(sys.argv[1])
+
+@job_handler("crash_test")
+async def crash_test(db, payload):
+    first = not attempts.exists()
+    with attempts.open("a") as file:
+        file.write("started\\n")
+    if first:
+        await asyncio.sleep(600)
+
+async def main():
+    job_queue.start(int(sys.argv[2]))
+    await asyncio.Event().wait()
+
+asyncio.run(main())
+"""
+
+LEASE_SECONDS = 1
+
+def start_workers(attempts: Path, workers: int) -> subprocess.Popen:
+    environment = {**os.environ, "JOB_LEASE_SECONDS": str(LEASE_SECONDS), "JOB_POLL_SECONDS": "1"}
+    return subprocess.Popen([sys.executable, "-c", WORKER, str(attempts), str(workers)], cwd=REPO_ROOT, env=environment)
+
+def started(attempts: Path) -> int:
+    return len(attempts.read_text().splitlines()) if attempts.exists() else 0
+
+def wait_for(condition, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.1)
+
+def job_row(job_id: int):
+    from Backend.db.db import SessionLocal
+    from Backend.models import Job
+    with SessionLocal() as session:
+        return session.execute(select(Job.status, Job.attempts, Job.locked_by).where(Job.id == job_id)).one()
+
+def enqueue_job() -> int:
+    from Backend.db.db import SessionLocal
+    from Backend.models import Job
+    from Backend.core.jobs import utcnow
+    with SessionLocal() as session:
+        job = Job(kind="crash_test", payload="{}", status="queued", attempts=0, run_after=utcnow(), created_at=utcnow())
+        session.add(job)
+        session.commit()
+        return job.id
+
+# A worker killed mid-job: while it lives its heartbeat keeps other workers off the job (it runs far longer than
+# the lease), once it is dead the lease expires and exactly one of the other workers claims the job again
+def test_killed_worker_job_is_claimed_again_once(client, tmp_path):
+    attempts = tmp_path / "attempts"
+    job_id = enqueue_job()
+    first = start_workers(attempts, 1)
+    others = None
+    try:
+        wait_for(lambda: started(attempts) == 1)
+        others = start_workers(attempts, 3)
+        time.sleep(LEASE_SECONDS * 4)
+        status, claims, _ = job_row(job_id)
+        assert (status, claims, started(attempts)) == ("running", 1, 1)
+        first.send_signal(signal.SIGKILL)
+        first.wait()
+        wait_for(lambda: job_row(job_id).status == "done")
+        time.sleep(LEASE_SECONDS * 2)
+        assert job_row(job_id).attempts == 2
+        assert started(attempts) == 2
+    finally:
+        for process in (first, others):
+            if process is not None and process.poll() is None:
+                process.kill()
+                process.wait()
+
+# A job whose lease expired on every attempt (it kills or hangs each worker running it) is failed, not claimed again
+def test_job_losing_every_lease_is_failed(client):
+    from datetime import timedelta
+    from sqlalchemy import update
+    from Backend.db.db import SessionLocal
+    from Backend.models import Job
+    from Backend.core.jobs import job_queue, utcnow
+    job_id = enqueue_job()
+    expired = utcnow() - timedelta(days=1)
+    with SessionLocal() as session:
+        session.execute(update(Job).where(Job.id == job_id).values(status="running", attempts=job_queue.max_attempts, locked_by="dead:1:0", locked_until=expired, run_after=expired - timedelta(days=1)))
+        session.commit()
+    claimed = client.portal.call(job_queue.claim, "test:0:0")
+    if claimed is not None:
+        # Another due job of the suite, handed back untouched
+        with SessionLocal() as session:
+            session.execute(update(Job).where(Job.id == claimed.id).values(status="queued", attempts=Job.attempts - 1, locked_by=None, locked_until=None))
+            session.commit()
+        assert claimed.id != job_id
+    assert tuple(job_row(job_id)) == ("failed", job_queue.max_attempts, None)
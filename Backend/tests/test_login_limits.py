@@ -0,0 +1,31 @@
+import pytest
+from Backend.benchmarks.seed import PASSWORD
+
+@pytest.fixture
+def limits(monkeypatch):
+    from Backend.core.config import settings
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(settings, "RATE_LIMIT_TRUST_FORWARDED", True)
+    return settings
+
+def attempt(client, password: str, address: str, username: str = "user4"):
+    return client.post("/auth/token", data={"username": username, "password": password}, headers={"X-Forwarded-For": address})
+
+# Wrong passwords for a username get the attacking address rejected, never the owner logging in from elsewhere
+def test_failed_logins_do_not_lock_out_the_owner(client, limits):
+    for _ in range(limits.LOGIN_USERNAME_FAILURE_LIMIT):
+        assert attempt(client, "wrong", "203.0.113.50").status_code == 401
+    rejected = attempt(client, PASSWORD, "203.0.113.50")
+    assert rejected.status_code == 429
+    assert "retry-after" in rejected.headers
+    assert attempt(client, PASSWORD, "198.51.100.7").status_code == 201
+
+# Guessing spread over many addresses stays under every (username, address) window, the per username window stops it
+def test_distributed_guessing_is_capped_per_account(client, limits, monkeypatch):
+    from Backend.core.rate_limit import login_account_limiter
+    monkeypatch.setattr(login_account_limiter, "limit", limits.LOGIN_USERNAME_FAILURE_LIMIT + 2)
+    for number in range(login_account_limiter.limit):
+        assert attempt(client, "wrong", f"198.51.100.{100 + number}", "user7").status_code == 401
+    rejected = attempt(client, PASSWORD, "198.51.100.250", "user7")
+    assert rejected.status_code == 429
+    assert "retry-after" in rejected.headers
@@ -0,0 +1,29 @@
+import asyncio
+from starlette.requests import Request
+
+def scrape_request(host: str, headers: dict | None = None) -> Request:
+    raw_headers = [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()]
+    return Request({"type": "http", "method": "GET", "path": "/metrics", "headers": raw_headers, "client": (host, 50000)})
+
+# Without METRICS_TOKEN only direct local scrapes are answered, the test client is neither local nor an admin
+def test_metrics_requires_local_scrape_or_admin(client, admin_headers, user_headers, statements):
+    from Backend.api.routes.metrics import can_scrape
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers=user_headers).status_code == 401
+    response = client.get("/metrics", headers=admin_headers)
+    assert response.status_code == 200
+    assert "jobs_queued" in response.text
+    # Gauges come from memory and the background refresh, a scrape runs no statement
+    assert statements[-1] == 0
+    assert asyncio.run(can_scrape(scrape_request("127.0.0.1")))
+    # Through a proxy on the same host
+    assert not asyncio.run(can_scrape(scrape_request("127.0.0.1", {"X-Forwarded-For": "203.0.113.9"})))
+
+def test_metrics_token(client, monkeypatch):
+    from Backend.core.config import settings
+    from Backend.api.routes.metrics import can_scrape
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "scrape-secret")
+    assert client.get("/metrics", headers={"Authorization": "Bearer scrape-secret"}).status_code == 200
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    # A configured token is required from this host too
+    assert not asyncio.run(can_scrape(scrape_request("127.0.0.1")))
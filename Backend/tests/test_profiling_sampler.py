@@ -0,0 +1,24 @@
+import threading
+
+# A profile removed while the sampler is collapsing a stack gets no sample: after remove() the request reads its
+# stacks (summary, call tree) without the sampler changing them
+def test_removed_profile_is_not_sampled():
+    from Backend.core.profiling import StackSampler, RequestProfile
+    sampler = StackSampler(0.001)
+    profile = RequestProfile(1, "GET", "/removed", False)
+    collapsing, removed = threading.Event(), threading.Event()
+    collapse = sampler.collapse
+
+    def blocking_collapse(frame):
+        collapsing.set()
+        removed.wait(5)
+        return collapse(frame)
+    sampler.collapse = blocking_collapse
+    sampler.add(profile)
+    thread = sampler._thread
+    assert collapsing.wait(5)
+    sampler.remove(profile)
+    removed.set()
+    thread.join(5)
+    assert not profile.stacks
+    assert profile.summary()["samples"] == 0
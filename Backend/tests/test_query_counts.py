@@ -0,0 +1,108 @@
+import pytest
+
+# Every test starts with an empty catalogue cache, counts do not depend on the tests that ran before
+@pytest.fixture(autouse=True)
+def cold_cache(monkeypatch):
+    from Backend.core.cache import catalogue_cache, MemoryCacheBackend
+    from Backend.core.config import settings
+    monkeypatch.setattr(catalogue_cache, "backend", MemoryCacheBackend(settings.CACHE_SIZE, settings.CACHE_TTL_SECONDS))
+
+# Statements per request of the list, detail and write routes. A change in these numbers is either an
+# intended query change (update the expectation) or an N+1 / redundant round trip slipping in
+READ_ROUTES = [
+    ("/album/all?limit=3", 200, 1),
+    # Streamed page: one query, the rows are fetched from its cursor in partitions
+    ("/album/all?format=ndjson", 200, 1),
+    ("/album?ids=1,2,3,99", 200, 1),
+    ("/album/1", 200, 1),
+    ("/song/all?limit=20", 200, 1),
+    ("/song/all?limit=20&after=20&fields=title", 200, 1),
+    ("/song?ids=1,2,3,4,5,6,7,8,9,10", 200, 1),
+    ("/song/1", 200, 1),
+    ("/song/999999", 404, 1),
+    ("/user/all?limit=5", 200, 1),
+    ("/user?ids=1,2,3", 200, 1),
+    ("/user/3", 200, 1),
+    ("/genre/all", 200, 1),
+    ("/genre/1", 200, 1),
+    # Genre existence check (cached row) and the page
+    ("/genre/1/songs?limit=10", 200, 2),
+    ("/genre/1/albums?limit=10", 200, 2),
+    ("/genre/1/top-songs?limit=10", 200, 2),
+    ("/library/2/songs?limit=10", 200, 1),
+    ("/library/2/owned?ids=1,2,3,40,41", 200, 1),
+    ("/search?q=midnight", 200, 0),
+]
+
+@pytest.mark.parametrize("url, status, expected", READ_ROUTES)
+def test_read_route_statements(client, admin_headers, statements, url, status, expected):
+    response = client.get(url, headers=admin_headers)
+    assert response.status_code == status
+    if "format=ndjson" in url:
+        assert response.headers["content-type"] == "application/x-ndjson"
+        assert len(response.text.splitlines()) > 1
+    assert statements == [expected]
+
+# Single rows come from the read-through cache once loaded, the second request runs no SQL
+@pytest.mark.parametrize("url", ["/album/2", "/song/2"])
+def test_cached_detail_runs_no_statement(client, admin_headers, statements, url):
+    assert client.get(url, headers=admin_headers).status_code == 200
+    assert client.get(url, headers=admin_headers).status_code == 200
+    assert statements == [1, 0]
+
+def test_library_scales_without_extra_statements(client, admin_headers, statements):
+    # The heavy user owns 30 songs, a full page is still one keyset query
+    client.get("/library/2/songs?limit=5", headers=admin_headers)
+    client.get("/library/2/songs?limit=100", headers=admin_headers)
+    assert statements[0] == statements[1]
+
+def test_create_user_statements(client, statements):
+    user = {"username": "fresh", "first_name": "F", "last_name": "U", "email": "fresh@example.com", "gender": 1, "password_hash": "secret"}
+    assert client.post("/user/", json=user).status_code == 201
+    # Duplicates are rejected by the unique constraints, no check-then-insert (the failed INSERT is counted)
+    assert client.post("/user/", json=user).status_code == 409
+    assert statements == [1, 1]
+
+def test_create_album_and_song_statements(client, admin_headers, statements):
+    response = client.post("/album/", json={"title": "query count album", "description": "d", "genre": 1}, headers=admin_headers)
+    assert response.status_code == 201
+    album_id = client.get("/album/all?limit=1000", headers=admin_headers).json()["items"][-1]["id"]
+    response = client.post(f"/song/api/album/{album_id}/song", json={"title": "query count song", "description": "d", "genre": 1}, headers=admin_headers)
+    assert response.status_code == 201
+    assert client.post("/album/", json={"title": "query count album", "description": "d", "genre": 1}, headers=admin_headers).status_code == 409
+    assert statements == [2, 1, 4, 2]
+
+def test_patch_and_delete_statements(client, admin_headers, statements):
+    assert client.patch("/song/3", json={"description": "patched"}, headers=admin_headers).status_code == 200
+    assert client.patch("/album/3", json={"description": "patched"}, headers=admin_headers).status_code == 200
+    # The cascade runs in a background job, the request checks the row and queues the job
+    assert client.delete("/album/4", headers=admin_headers).status_code == 202
+    assert statements == [2, 2, 2]
+
+def test_library_write_statements(client, user_headers, statements):
+    assert client.post("/library/me/songs", json={"song_ids": [41, 42, 43]}, headers=user_headers).status_code == 200
+    assert client.request("DELETE", "/library/me/songs", json={"song_ids": [41, 42, 43]}, headers=user_headers).status_code == 200
+    assert statements == [2, 2]
+
+def test_failed_statement_releases_its_start(client):
+    from sqlalchemy import text
+    from sqlalchemy.exc import OperationalError
+    from Backend.db import engine
+    with engine.connect() as connection:
+        with pytest.raises(OperationalError):
+            connection.execute(text("SELECT * FROM missing_table"))
+        assert connection.info["query_start"] == []
+
+# A genre that does not exist fails the foreign key, reported apart from a taken title
+def test_unknown_genre_is_not_a_duplicate_title(client, admin_headers):
+    album = {"title": "unknown genre album", "description": "d", "genre": 999999}
+    response = client.post("/album/", json=album, headers=admin_headers)
+    assert (response.status_code, response.json()["detail"]) == (400, "Invalid genre type")
+    response = client.post("/song/api/album/1/song", json={**album, "title": "unknown genre song"}, headers=admin_headers)
+    assert (response.status_code, response.json()["detail"]) == (400, "Invalid genre type")
+    for url in ("/album/3", "/song/3"):
+        response = client.patch(url, json={"genre": 999999}, headers=admin_headers)
+        assert (response.status_code, response.json()["detail"]) == (400, "Invalid genre type")
+    song_title = client.get("/song/4", headers=admin_headers).json()["title"]
+    response = client.patch("/song/3", json={"title": song_title}, headers=admin_headers)
+    assert (response.status_code, response.json()["detail"]) == (409, "Title already exists")
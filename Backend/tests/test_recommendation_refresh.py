@@ -0,0 +1,74 @@
+import asyncio
+import pytest
+
+# The refresh loop outlives failing ticks: the error is logged and the next tick refreshes again
+def test_refresh_loop_survives_errors(monkeypatch, caplog):
+    from Backend import main
+    calls = []
+
+    def refresh(*args):
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("database unavailable")
+    monkeypatch.setattr(main.recommendations, "refresh", refresh)
+    monkeypatch.setattr(main.settings, "RECOMMEND_REFRESH_SECONDS", 0.01)
+
+    async def run():
+        task = asyncio.create_task(main.refresh_recommendations())
+        while len(calls) < 3 and not task.done():
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+    asyncio.run(asyncio.wait_for(run(), 10))
+    assert len(calls) >= 3
+    assert "Recommendation refresh failed" in caplog.text
+
+# Lookups read the published state without a lock: apply() builds the next overlay aside, a lookup that started
+# on the previous state sees none of the new rows
+def test_apply_publishes_a_new_state(tmp_path):
+    import numpy as np
+    from Backend.core.recommendations import RecommendationIndex, build_arrays, write_snapshot
+    arrays = build_arrays(np.array([1, 1, 2, 2, 3]), np.array([10, 11, 10, 12, 11]), 5, 50, 100)
+    write_snapshot(tmp_path / "recommendations.snapshot", arrays, {"max_owned_id": 5, "rows": 5, "built_at": 0})
+    index = RecommendationIndex(10, 50)
+    assert index.load(tmp_path / "recommendations.snapshot")
+    previous = index._state
+    before = index.similar(10, 5)
+    index.apply([(6, 3, 10), (7, 3, 12)])
+    assert index._state is not previous
+    assert not previous.pairs and not previous.library
+    assert index.last_owned_id == 7
+    assert index.similar(10, 5) != before
+    assert 12 not in [item["id"] for item in index.recommend(3, 5)]
+
+# Worker processes starting on a missing snapshot: one builds it under the lock, the others load its result
+WORKER = """
+import sys
+from pathlib import Path
+from Backend.db.db import SessionLocal
+from Backend.core import recommendations
+
+path = Path(sys.argv[1])
+build_snapshot = recommendations.build_snapshot
+
+def counted_build(session, snapshot_path):
+    with open(sys.argv[2], "a") as builds:
+        builds.write("built\\n")
+    return build_snapshot(session, snapshot_path)
+recommendations.build_snapshot = counted_build
+index = recommendations.RecommendationIndex(10, 50)
+with SessionLocal() as session:
+    recommendations.load_or_build(session, index, path)
+assert len(index) > 0
+"""
+
+def test_one_worker_builds_the_snapshot(client, tmp_path):
+    import os
+    import sys
+    import subprocess
+    from pathlib import Path
+    builds = tmp_path / "builds"
+    processes = [subprocess.Popen([sys.executable, "-c", WORKER, str(tmp_path / "recommendations.snapshot"), str(builds)], cwd=Path(__file__).resolve().parent.parent.parent, env=dict(os.environ)) for _ in range(4)]
+    assert [process.wait(60) for process in processes] == [0] * 4
+    assert builds.read_text().splitlines() == ["built"]
@@ -0,0 +1,39 @@
+import pickle
+from datetime import datetime
+from Backend.core.search import SearchIndex
+
+SIGNATURE = ((50, 50, datetime(2026, 1, 2, 3, 4, 5)), (5, 5, None))
+
+def built_index() -> SearchIndex:
+    index = SearchIndex()
+    index.add("song", 1, "Midnight City", "neon drive")
+    index.add("song", 2, "City Lights", None)
+    index.add("album", 1, "Midnight", "night drive album")
+    index.signature = SIGNATURE
+    return index
+
+def test_snapshot_round_trip(tmp_path):
+    index = built_index()
+    index.save(tmp_path / "search.snapshot")
+    loaded = SearchIndex()
+    assert loaded.load(tmp_path / "search.snapshot", SIGNATURE)
+    for query in ("midnight", "cit", "drvie"):
+        assert loaded.search(query) == index.search(query)
+    # Documents keep their terms, removal still works on a loaded index
+    loaded.remove("song", 1)
+    assert [hit["id"] for hit in loaded.search("midnight")] == [1]
+
+def test_stale_snapshot_is_not_loaded(tmp_path):
+    built_index().save(tmp_path / "search.snapshot")
+    changed = ((51, 51, datetime(2026, 1, 2, 3, 4, 6)), (5, 5, None))
+    assert not SearchIndex().load(tmp_path / "search.snapshot", changed)
+
+# Snapshots are plain data: a pickle (older versions, or planted in the directory) is rejected without unpickling
+class Exploit:
+    def __reduce__(self):
+        return (exec, ("raise SystemExit('unpickled')",))
+
+def test_pickle_snapshot_is_rejected(tmp_path):
+    path = tmp_path / "search.snapshot"
+    path.write_bytes(pickle.dumps((3, SIGNATURE, Exploit(), {}, 0)))
+    assert not SearchIndex().load(path, SIGNATURE)
@@ -0,0 +1,27 @@
+import os
+import sys
+import subprocess
+
+# Cold import of the app as a uvicorn worker does it, the suite fails when the median exceeds the budget
+# (STARTUP_BUDGET_MS, default 1000 ms as python -m Backend.benchmarks startup)
+STARTUP_BUDGET_MS = float(os.environ.get("STARTUP_BUDGET_MS", "1000"))
+
+def test_cold_import_within_budget():
+    from Backend.benchmarks.startup import startup_benchmark
+    result = startup_benchmark("Backend.main", 3, dict(os.environ), 10)
+    assert result["import_ms"]["median"] <= STARTUP_BUDGET_MS, f"cold import {result['import_ms']} over {STARTUP_BUDGET_MS} ms, slowest modules: {result['slowest_self_ms']}"
+
+def test_import_opens_no_connection_and_defers_pillow():
+    # Schema creation moved to init-db and pools are warmed in the lifespan: importing the app must not connect
+    check = (
+        "import sys\n"
+        "from sqlalchemy import event\n"
+        "from sqlalchemy.pool import Pool\n"
+        "connects = []\n"
+        "event.listen(Pool, 'connect', lambda *args: connects.append(1))\n"
+        "import Backend.main\n"
+        "assert not connects, 'connected at import'\n"
+        "assert 'PIL.Image' not in sys.modules, 'Pillow imported at startup'\n"
+    )
+    completed = subprocess.run([sys.executable, "-c", check], env=dict(os.environ), capture_output=True, text=True)
+    assert completed.returncode == 0, completed.stderr[-2000:]